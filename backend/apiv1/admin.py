@@ -1,3 +1,6 @@
 from django.contrib import admin
-
+from .models import RevokedToken, Task
 # Register your models here.
+
+admin.site.register(RevokedToken)
+admin.site.register(Task)
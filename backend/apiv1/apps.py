@@ -1,6 +1,14 @@
 from django.apps import AppConfig
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_migrate
 
 
 class Apiv1Config(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apiv1'
+
+    def ready(self):
+        from . import signals
+        from config.db import apply_sqlite_pragmas
+        connection_created.connect(apply_sqlite_pragmas, dispatch_uid='apply_sqlite_pragmas')
+        post_migrate.connect(signals.index_user_email, sender=self)
@@ -0,0 +1,12 @@
+from django.urls import path
+from . import async_views
+
+
+urlpatterns = [
+
+    path('profile/', async_views.profile_list, name='async-profile-list'),
+    path('profile/<str:pk>/', async_views.profile_detail, name='async-profile-detail'),
+
+    path('search', async_views.student_search, name='async-student-search'),
+
+]
@@ -0,0 +1,166 @@
+"""
+Native async versions of the public directory reads
+
+Mounted under /api/v1/async/ (see async_urls.py). Under config.asgi these
+run on the event loop with the async ORM (aget / afirst / async for), so a
+single worker keeps many concurrent reads in flight instead of handing
+every request to a thread like the DRF views in views.py do.
+
+Responses are the same bytes as their DRF counterparts and share the same
+response cache entries and ETags (see cache.acached_read; profile detail
+uses the per-profile revision ETags of apiv1.conditional instead).
+
+GET /api/v1/async/profile/       - Same as GET /api/v1/profile/
+GET /api/v1/async/profile/{pk}/  - Same as GET /api/v1/profile/{pk}/
+GET /api/v1/async/search?q=...   - Same as GET /api/v1/search
+"""
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import AnonymousUser
+from django.http import HttpResponseNotModified
+from django.views.decorators.http import require_GET
+from rest_framework import status
+from rest_framework.exceptions import APIException
+from rest_framework.request import Request
+
+from config.authentication import AsyncJWTAuthentication
+from config.db_router import replica_reads
+from student.facets import list_facets
+from student.filters import afilter_profiles
+from student.models import StudentProfile
+from student.search import asearch_profiles
+from student.serializers import StudentProfileReadSerializer
+from .cache import acached_read, json_response
+from .conditional import profile_etag, none_match
+from .pagination import StudentProfileCursorPagination
+
+
+def jwt_authenticated(view):
+    """
+    Authenticate the (optional) bearer token like DRF would before running
+    the view: anonymous without a token, 401 for a bad one.
+    """
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        authenticator = AsyncJWTAuthentication()
+        try:
+            result = await authenticator.aauthenticate(request)
+        except APIException as exc:
+            data = exc.detail if isinstance(exc.detail, (list, dict)) else {'detail': exc.detail}
+            return json_response(
+                data,
+                status=exc.status_code,
+                headers={'WWW-Authenticate': authenticator.authenticate_header(request)}
+            )
+
+        request.user, request.auth = result or (AnonymousUser(), None)
+        return await view(request, *args, **kwargs)
+    return wrapper
+
+
+@require_GET
+@jwt_authenticated
+@replica_reads
+@acached_read('profile-list')
+async def profile_list(request):
+    """Handles GET /async/profile/ with the filters of StudentProfileDetailView.list"""
+    profiles, filters = await afilter_profiles(StudentProfile.objects.all(), request.GET)
+    serializer = StudentProfileReadSerializer.from_request(request)
+
+    # Facet aggregation is sync only (GROUP BYs / summary table), one thread hop
+    facet_data = None
+    if 'facets' in request.GET:
+        facet_data = await sync_to_async(list_facets)(request.GET, profiles, filters)
+
+    paginator = StudentProfileCursorPagination()
+    drf_request = Request(request)
+    if paginator.is_requested(drf_request):
+        # DRF's cursor pagination is sync only; the page query runs in a thread
+        page = await sync_to_async(paginator.paginate_queryset)(serializer.values(profiles), drf_request)
+        data = {
+            'count': await profiles.acount(),
+            'filters': filters,
+            'next': paginator.get_next_link(),
+            'previous': paginator.get_previous_link(),
+            'results': serializer.serialize(page)
+        }
+    else:
+        # Order by most relevant: CR first, then by name
+        profiles = profiles.order_by('-id', '-is_cr', 'first_name', 'last_name')
+        results = serializer.serialize([row async for row in serializer.values(profiles)])
+        data = {
+            'count': len(results),
+            'filters': filters,
+            'results': results
+        }
+
+    if facet_data is not None:
+        data['facets'] = facet_data
+    return json_response(data)
+
+
+@require_GET
+@jwt_authenticated
+@replica_reads
+async def profile_detail(request, pk):
+    """Handles GET /async/profile/{pk}/, with the ETag / If-None-Match of the sync view"""
+    if not pk.isdigit():
+        return _profile_not_found()
+
+    profiles = StudentProfile.objects.filter(pk=pk)
+    if 'HTTP_IF_NONE_MATCH' in request.META:
+        current = await profiles.values_list('id', 'revision').afirst()
+        if current is not None and none_match(request, profile_etag(*current)):
+            response = HttpResponseNotModified()
+            response['ETag'] = profile_etag(*current)
+            return response
+
+    serializer = StudentProfileReadSerializer()
+    row = await serializer.values(profiles, 'revision').afirst()
+    if row is None:
+        return _profile_not_found()
+
+    return json_response(
+        serializer.serialize([row])[0],
+        headers={'ETag': profile_etag(row['id'], row['revision'])}
+    )
+
+
+def _profile_not_found():
+    return json_response(
+        {'message': 'Profile not found'},
+        status=status.HTTP_404_NOT_FOUND
+    )
+
+
+@require_GET
+@jwt_authenticated
+@replica_reads
+@acached_read('search')
+async def student_search(request):
+    """Handles GET /async/search?q=keyword, ranked like views.student_search"""
+    query = request.GET.get('q', '').strip()
+
+    if not query:
+        return json_response({
+            'message': 'Please provide a search query',
+            'results': []
+        })
+
+    # Minimum length check to prevent very short queries
+    if len(query) < 2:
+        return json_response({
+            'message': 'Search query must be at least 2 characters',
+            'results': []
+        })
+
+    profiles = await asearch_profiles(query, limit=50)
+    serializer = StudentProfileReadSerializer.from_request(request)
+    results = serializer.serialize([row async for row in serializer.values(profiles)])
+
+    return json_response({
+        'query': query,
+        'count': len(results),
+        'results': results
+    })
@@ -0,0 +1,184 @@
+"""
+Response cache for anonymous directory reads
+
+GET /profile/, /profile/{pk} and /search are public and change only on
+registration, profile edits and verification. Anonymous responses are
+cached under the normalized query parameters plus a directory "generation"
+counter; bumping the generation (StudentProfile / Batch signals, bulk
+updates) makes every cached entry unreachable at once.
+
+Responses carry an ETag and Last-Modified, so clients revalidating with
+If-None-Match / If-Modified-Since get a 304 without touching the database.
+
+Use a shared backend (file or redis, see CACHE_BACKEND) when running more
+than one worker process, otherwise each worker only sees its own bumps.
+
+cached_read() wraps the DRF views, acached_read() the native async views in
+apiv1.async_views; both share the same cache entries and ETags.
+"""
+import hashlib
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse
+from django.utils.http import http_date, parse_http_date_safe
+from rest_framework import status
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.response import Response
+
+
+GENERATION_KEY = 'directory:generation'
+LAST_MODIFIED_KEY = 'directory:last-modified'
+
+
+def _cache():
+    return caches[settings.DIRECTORY_CACHE_ALIAS]
+
+
+def get_generation():
+    """Current (generation, last-modified timestamp) of the directory"""
+    cache = _cache()
+    values = cache.get_many([GENERATION_KEY, LAST_MODIFIED_KEY])
+    if GENERATION_KEY not in values:
+        now = int(time.time())
+        cache.add(GENERATION_KEY, 1, timeout=None)
+        cache.add(LAST_MODIFIED_KEY, now, timeout=None)
+        return cache.get(GENERATION_KEY, 1), cache.get(LAST_MODIFIED_KEY, now)
+    return values[GENERATION_KEY], values.get(LAST_MODIFIED_KEY, 0)
+
+
+async def aget_generation():
+    """get_generation() through the cache's async API"""
+    cache = _cache()
+    values = await cache.aget_many([GENERATION_KEY, LAST_MODIFIED_KEY])
+    if GENERATION_KEY not in values:
+        now = int(time.time())
+        await cache.aadd(GENERATION_KEY, 1, timeout=None)
+        await cache.aadd(LAST_MODIFIED_KEY, now, timeout=None)
+        return await cache.aget(GENERATION_KEY, 1), await cache.aget(LAST_MODIFIED_KEY, now)
+    return values[GENERATION_KEY], values.get(LAST_MODIFIED_KEY, 0)
+
+
+def bump_generation():
+    """Invalidate every cached directory response"""
+    cache = _cache()
+    try:
+        cache.incr(GENERATION_KEY)
+    except ValueError:
+        cache.add(GENERATION_KEY, 1, timeout=None)
+    cache.set(LAST_MODIFIED_KEY, int(time.time()), timeout=None)
+
+
+def cache_key(request, prefix, generation, **kwargs):
+    """Key for `request` that ignores parameter order and empty values"""
+    params = sorted(
+        (key, sorted(value for value in values if value != ''))
+        for key, values in request.GET.lists()
+    )
+    raw = repr((prefix, sorted(kwargs.items()), [item for item in params if item[1]]))
+    return f'directory:{prefix}:{generation}:{hashlib.md5(raw.encode()).hexdigest()}'
+
+
+def _not_modified(request, etag, last_modified):
+    if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+    if if_none_match is not None:
+        return etag in [tag.strip() for tag in if_none_match.split(',')] or if_none_match.strip() == '*'
+
+    if_modified_since = parse_http_date_safe(request.META.get('HTTP_IF_MODIFIED_SINCE', ''))
+    return if_modified_since is not None and last_modified <= if_modified_since
+
+
+def _validators(request, prefix, generation, last_modified, kwargs):
+    """Cache key and the validator headers of a cacheable read"""
+    key = cache_key(request, prefix, generation, **kwargs)
+    etag = f'"{key.rsplit(":", 1)[-1][:16]}-{generation}"'
+    headers = {
+        'ETag': etag,
+        'Last-Modified': http_date(last_modified),
+        'Cache-Control': f'public, max-age={settings.DIRECTORY_CACHE_MAX_AGE}',
+        'Vary': 'Authorization',
+    }
+    return key, etag, headers
+
+
+def _bypass(request):
+    return not settings.DIRECTORY_CACHE_ENABLED or 'HTTP_AUTHORIZATION' in request.META
+
+
+def cached_read(prefix):
+    """
+    Cache the 200 responses of a read view for anonymous clients.
+
+    Works on viewset methods and @api_view functions. Requests carrying an
+    Authorization header always go to the view.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            request = next(arg for arg in args if isinstance(arg, Request))
+            if _bypass(request):
+                return view(*args, **kwargs)
+
+            generation, last_modified = get_generation()
+            key, etag, headers = _validators(request, prefix, generation, last_modified, kwargs)
+
+            if _not_modified(request, etag, last_modified):
+                return Response(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+            cache = _cache()
+            data = cache.get(key)
+            if data is None:
+                response = view(*args, **kwargs)
+                if response.status_code != status.HTTP_200_OK:
+                    return response
+                data = response.data
+                cache.set(key, data, settings.DIRECTORY_CACHE_TIMEOUT)
+
+            return Response(data, headers=headers)
+        return wrapper
+    return decorator
+
+
+def json_response(data, status=status.HTTP_200_OK, headers=None):
+    """
+    An HttpResponse rendered the way DRF's Response would render `data`
+    (for the async views, which don't go through DRF). Keeps `data` on the
+    response like DRF does so acached_read can store it.
+    """
+    response = HttpResponse(
+        JSONRenderer().render(data) if data is not None else b'',
+        status=status, headers=headers, content_type='application/json'
+    )
+    response.data = data
+    return response
+
+
+def acached_read(prefix):
+    """cached_read() for async views taking a Django HttpRequest"""
+    def decorator(view):
+        @wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            if _bypass(request):
+                return await view(request, *args, **kwargs)
+
+            generation, last_modified = await aget_generation()
+            key, etag, headers = _validators(request, prefix, generation, last_modified, kwargs)
+
+            if _not_modified(request, etag, last_modified):
+                return json_response(None, status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+            cache = _cache()
+            data = await cache.aget(key)
+            if data is None:
+                response = await view(request, *args, **kwargs)
+                if response.status_code != status.HTTP_200_OK:
+                    return response
+                data = response.data
+                await cache.aset(key, data, settings.DIRECTORY_CACHE_TIMEOUT)
+
+            return json_response(data, headers=headers)
+        return wrapper
+    return decorator
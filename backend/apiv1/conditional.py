@@ -0,0 +1,40 @@
+"""
+Per-profile validators for GET / PUT / PATCH /profile/{pk}
+
+Every StudentProfile carries a `revision` counter that changes with each
+write, exposed as the strong ETag "<pk>.<revision>".
+
+- GET with If-None-Match costs one primary key lookup of the revision and
+  answers 304 when the client's copy is current.
+- PUT / PATCH must send If-Match (428 otherwise). The write is a single
+  UPDATE ... WHERE revision = <current> touching only the changed columns,
+  so a concurrent edit makes it fail with 412 instead of being silently
+  overwritten, without holding a row lock.
+"""
+
+
+def profile_etag(pk, revision):
+    return f'"{pk}.{revision}"'
+
+
+def _tags(header):
+    return [tag.strip() for tag in header.split(',') if tag.strip()]
+
+
+def none_match(request, etag):
+    """True when If-None-Match lists `etag` (weak comparison) or is '*'"""
+    header = request.META.get('HTTP_IF_NONE_MATCH')
+    if header is None:
+        return False
+    tags = _tags(header)
+    return '*' in tags or etag in [tag[2:] if tag.startswith('W/') else tag for tag in tags]
+
+
+def if_match(header, pk, revision):
+    """
+    True when an If-Match header accepts profile `pk` at `revision`: '*' or
+    its strong ETag (strong comparison, so weak tags and the ETags of other
+    profiles never match)
+    """
+    tags = _tags(header)
+    return '*' in tags or profile_etag(pk, revision) in tags
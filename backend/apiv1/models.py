@@ -1,3 +1,58 @@
 from django.db import models
+from django.db.models import Q
+from django.utils import timezone
 
-# Create your models here.
+
+class RevokedToken(models.Model):
+    """
+    A JWT revoked before its expiry (logout), by jti. Authentication checks
+    the in-memory copy in config.revocation; rows past `expires_at` are
+    deleted as new revocations come in.
+    """
+    jti = models.CharField(max_length=255, unique=True)
+    token_type = models.CharField(max_length=20)
+    expires_at = models.DateTimeField(db_index=True)
+    revoked_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.token_type} {self.jti}"
+
+
+class Task(models.Model):
+    """
+    A queued background task (config.tasks): handler `name` called with
+    `payload`. Deleted once it has run; kept as 'failed' after its last
+    attempt.
+    """
+    PENDING = 'pending'
+    RUNNING = 'running'
+    FAILED = 'failed'
+    STATUSES = [(PENDING, 'Pending'), (RUNNING, 'Running'), (FAILED, 'Failed')]
+
+    name = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict)
+    # At most one pending task per key
+    dedupe_key = models.CharField(max_length=200, blank=True, null=True)
+    status = models.CharField(max_length=10, choices=STATUSES, default=PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=5)
+    run_after = models.DateTimeField(default=timezone.now)
+    # Lease of the worker running it; expired leases are taken over
+    locked_until = models.DateTimeField(blank=True, null=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['dedupe_key'], condition=Q(status='pending'), name='task_pending_dedupe_uniq'
+            ),
+        ]
+        indexes = [
+            # The queue: due pending tasks in order
+            models.Index(fields=['run_after', 'id'], condition=Q(status='pending'), name='task_due_idx'),
+            models.Index(fields=['locked_until'], condition=Q(status='running'), name='task_lease_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.name} ({self.status})"
@@ -0,0 +1,26 @@
+from django.conf import settings
+from rest_framework.pagination import CursorPagination
+
+
+class StudentProfileCursorPagination(CursorPagination):
+    """
+    Keyset pagination over the profile directory
+
+    Pages are keyed on `-id`, so every page is a single indexed range scan
+    no matter how deep the client has scrolled. Cursors are opaque tokens
+    handed back in `next` / `previous`.
+
+    ?cursor=<token>  - Continue from a previous page
+    ?page_size=50    - Rows per page (capped at PROFILE_MAX_PAGE_SIZE)
+    """
+    ordering = '-id'
+    page_size = settings.PROFILE_PAGE_SIZE
+    page_size_query_param = 'page_size'
+    max_page_size = settings.PROFILE_MAX_PAGE_SIZE
+
+    def is_requested(self, request):
+        """Cursor mode is opt-in so existing clients keep the full listing"""
+        return (
+            self.cursor_query_param in request.query_params
+            or self.page_size_query_param in request.query_params
+        )
@@ -0,0 +1,31 @@
+from django.contrib.auth.models import User
+from django.db import connections, models
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from student.models import Batch, StudentProfile
+from .cache import bump_generation
+
+
+@receiver(post_save, sender=StudentProfile)
+@receiver(post_delete, sender=StudentProfile)
+@receiver(post_save, sender=Batch)
+@receiver(post_delete, sender=Batch)
+def invalidate_directory_cache(sender, raw=False, **kwargs):
+    if raw:
+        return
+    bump_generation()
+
+
+# contrib.auth doesn't index User.email; MultiFieldAuthBackend looks logins up by it
+USER_EMAIL_INDEX = 'auth_user_email_idx'
+
+
+def index_user_email(sender, using='default', **kwargs):
+    """post_migrate hook: create USER_EMAIL_INDEX if it's missing"""
+    connection = connections[using]
+    with connection.cursor() as cursor:
+        constraints = connection.introspection.get_constraints(cursor, User._meta.db_table)
+    if USER_EMAIL_INDEX not in constraints:
+        with connection.schema_editor() as editor:
+            editor.add_index(User, models.Index(fields=['email'], name=USER_EMAIL_INDEX))
@@ -1,3 +1,1040 @@
-from django.test import TestCase
+import asyncio
+import csv
+import hashlib
+import io
+import json
+import shutil
+import tempfile
+from datetime import timedelta
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db.models import F
+from django.test import AsyncClient, TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+from apiv1.cache import get_generation
+from apiv1.conditional import profile_etag
+from apiv1.models import RevokedToken, Task
+from apiv1.pagination import StudentProfileCursorPagination
+from apiv1.views import StudentProfileDetailView
+
+from config import tasks, throttling, warmup
+from config.revocation import revoked_tokens
+from student import dimensions, export
+from student.batches import batch_cache
+from student.models import Batch, Company, DirectoryFacet, StudentProfile, StudentVerification
+from student.pictures import picture_path, picture_url
+from student.serializers import StudentRegistrationSerializer
+
+
+FAST_HASHERS = [
+    'django.contrib.auth.hashers.MD5PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+]
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS)
+class LoginQueryCountTests(TestCase):
+    """POST /api/v1/login resolves user + profile in one joined query"""
+
+    def setUp(self):
+        dimensions.clear()
+        self.client = APIClient()
+        batch = Batch.objects.create(title='BBA 1', session='2009-10')
+        self.user = User.objects.create_user('24230115084', 'john@example.com', 'secret-pass')
+        StudentProfile.objects.create(
+            user=self.user, first_name='John', last_name='Doe', uni_id='24230115084',
+            email='john@example.com', phone='01700000000', batch=batch, is_cr=True
+        )
+
+    def login(self, username, password='secret-pass'):
+        return self.client.post('/api/v1/login', {'username': username, 'password': password}, format='json')
+
+    def test_login_by_any_identifier_is_one_query(self):
+        for identifier in ('24230115084', 'john@example.com', '01700000000'):
+            with self.assertNumQueries(1):
+                response = self.login(identifier)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.data['user']['role'], 'CR')
+            self.assertEqual(response.data['user']['student_profile']['batch'], 'BBA 1 (2009-10)')
+
+    def test_failed_login_is_one_query(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(self.login('24230115084', 'wrong').status_code, 401)
+        with self.assertNumQueries(1):
+            self.assertEqual(self.login('nobody').status_code, 401)
+
+    def test_login_with_outdated_hash_is_two_queries(self):
+        # The second query is the transparent password hash upgrade
+        User.objects.filter(pk=self.user.pk).update(
+            password=make_password('secret-pass', hasher='pbkdf2_sha256')
+        )
+        with self.assertNumQueries(2):
+            self.assertEqual(self.login('24230115084').status_code, 200)
+        self.assertTrue(User.objects.get(pk=self.user.pk).password.startswith('md5$'))
+
+    def test_login_lookup_uses_indexes(self):
+        from config.authentication import MultiFieldAuthBackend
+
+        plan = MultiFieldAuthBackend().user_queryset('john@example.com')[:1].explain()
+        scans = [line for line in plan.splitlines() if 'SCAN ' in line]
+        self.assertEqual(scans, [])
+
+    def test_user_without_profile(self):
+        User.objects.create_user('admin', 'admin@example.com', 'secret-pass')
+        with self.assertNumQueries(1):
+            response = self.login('admin')
+        self.assertIsNone(response.data['user']['role'])
+        self.assertIsNone(response.data['user']['student_profile'])
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS)
+class RegistrationQueryCountTests(TestCase):
+    """POST /api/v1/register: one uniqueness query, batch title from memory"""
+
+    # Uniqueness check, transaction begin / end, INSERT user, INSERT profile
+    # and the tasks queued by the post_save receivers (search index, facet
+    # counts; config.tasks)
+    SIGNUP_QUERIES = 7
+
+    def setUp(self):
+        dimensions.clear()
+        self.client = APIClient()
+        self.batch = Batch.objects.create(title='BBA 1', session='2009-10')
+        User.objects.create_user('24230115084', 'john@example.com', 'secret-pass')
+        # Load the title map and the country aliases, as any earlier signup in
+        # the process would have
+        batch_cache.get('BBA 1')
+        with self.captureOnCommitCallbacks(execute=True):
+            dimensions.countries.resolve('Bangladesh')
+        dimensions.countries.get('Bangladesh')
+
+    def register(self, **data):
+        data = {
+            'username': '24230115085', 'email': 'jane@example.com', 'password': 'secret-pass',
+            'first_name': 'Jane', 'last_name': 'Roe', 'batch': 'BBA 1', **data
+        }
+        data = {key: value for key, value in data.items() if value is not None}
+        return self.client.post('/api/v1/register', data, format='json')
+
+    def test_signup_query_budget(self):
+        with self.assertNumQueries(self.SIGNUP_QUERIES):
+            response = self.register()
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['student_profile']['batch'], 'BBA 1')
+        self.assertEqual(StudentProfile.objects.get(uni_id='24230115085').batch, self.batch)
+
+    def test_taken_id_and_email_is_one_query(self):
+        StudentProfile.objects.create(
+            first_name='Jim', last_name='Poe', uni_id='24230115086', email='jim@example.com', batch=self.batch
+        )
+        with self.assertNumQueries(1):
+            response = self.register(username='24230115084', email='jim@example.com')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['errors'], {
+            'username': ['A user with this university ID already exists.'],
+            'email': ['A student profile with this email already exists.'],
+        })
+
+    def test_email_is_checked_as_university_id_without_username(self):
+        response = self.register(username=None, email='john@example.com')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['errors'], {'email': ['A user with this email already exists.']})
+
+    def test_university_id_or_email_is_required(self):
+        for email in (None, '', '   '):
+            with self.subTest(email=email), self.assertNumQueries(0):
+                response = self.register(username=None, email=email)
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(response.data['errors'], {'username': ['A university ID or email is required.']})
+        self.assertFalse(User.objects.filter(username='').exists())
+
+    def test_concurrent_signup_is_reported_as_validation_error(self):
+        # As if another signup took the ID after validate() ran
+        with mock.patch.object(StudentRegistrationSerializer, 'validate', lambda self, attrs: attrs):
+            response = self.register(username='24230115084')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['errors'], {
+            'username': ['A user with this university ID already exists.'],
+        })
+        self.assertFalse(StudentProfile.objects.filter(email='jane@example.com').exists())
+
+    def test_batch_changes_clear_the_title_map(self):
+        self.batch.title = 'BBA 2'
+        self.batch.save()
+        self.assertEqual(self.register().status_code, 400)
+        self.assertEqual(self.register(batch='BBA 2').status_code, 201)
+
+        Batch.objects.create(title='BBA 3', session='2011-12')
+        self.assertEqual(self.register(username='24230115087', email='jo@example.com', batch='BBA 3').status_code, 201)
+
+
+@override_settings(
+    PASSWORD_HASHERS=FAST_HASHERS, DIRECTORY_CACHE_ENABLED=False,
+    THROTTLE_RATES={'login': '3/m', 'login-failures': '2/h', 'register': '3/m', 'search': '3/m'},
+)
+class ThrottleTests(TestCase):
+    """config.throttling: over-limit requests get 429 before any query or hash"""
+
+    def setUp(self):
+        dimensions.clear()
+        self.client = APIClient()
+        batch = Batch.objects.create(title='BBA 1', session='2009-10')
+        user = User.objects.create_user('24230115084', 'john@example.com', 'secret-pass')
+        StudentProfile.objects.create(
+            user=user, first_name='John', last_name='Doe', uni_id='24230115084',
+            email='john@example.com', batch=batch
+        )
+        throttling.store.clear()
+        throttling.counters.clear()
+        self.addCleanup(throttling.store.clear)
+
+    def login(self, username, password='secret-pass', ip='10.0.0.1'):
+        return self.client.post(
+            '/api/v1/login', {'username': username, 'password': password}, format='json', REMOTE_ADDR=ip
+        )
+
+    def test_search_per_ip(self):
+        for _ in range(3):
+            self.assertEqual(self.client.get('/api/v1/search', {'q': 'jo'}).status_code, 200)
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/v1/search', {'q': 'jo'})
+        self.assertEqual(response.status_code, 429)
+        self.assertIn('Retry-After', response)
+        # Another client still gets through
+        self.assertEqual(self.client.get('/api/v1/search', {'q': 'jo'}, REMOTE_ADDR='10.0.0.2').status_code, 200)
+        self.assertEqual(throttling.counters.snapshot()['search'], {'admitted': 4, 'rejected': 1})
+
+    def test_failed_logins_per_identifier_across_ips(self):
+        with self.assertLogs('config.views', 'INFO'):
+            self.assertEqual(self.login('24230115084', 'wrong', ip='10.0.0.1').status_code, 401)
+        self.assertEqual(self.login('24230115084', 'wrong', ip='10.0.0.2').status_code, 401)
+        # Used up for this account, even with the right password and a fresh IP,
+        # and rejected before the user lookup / password check
+        with self.assertNumQueries(0):
+            self.assertEqual(self.login('24230115084', ip='10.0.0.3').status_code, 429)
+        self.assertEqual(self.login('other', 'wrong', ip='10.0.0.3').status_code, 401)
+
+    def test_successful_logins_only_count_per_ip(self):
+        for _ in range(3):
+            self.assertEqual(self.login('24230115084').status_code, 200)
+        self.assertEqual(self.login('24230115084').status_code, 429)
+        self.assertEqual(self.login('24230115084', ip='10.0.0.2').status_code, 200)
+
+    @override_settings(THROTTLE_CACHE_ALIAS='default')
+    async def test_async_path_awaits_the_shared_cache(self):
+        caches['default'].clear()
+        loops = []
+
+        def recording(method):
+            def wrapper(cache, *args, **kwargs):
+                # The event loop's, if called on it; None in a worker thread
+                loops.append(asyncio._get_running_loop())
+                return method(cache, *args, **kwargs)
+            return wrapper
+
+        client = AsyncClient()
+        with mock.patch.object(LocMemCache, 'add', recording(LocMemCache.add)), \
+                mock.patch.object(LocMemCache, 'incr', recording(LocMemCache.incr)):
+            for _ in range(3):
+                self.assertEqual((await client.get('/api/v1/async/search', {'q': 'jo'})).status_code, 200)
+            # Requests other workers admitted: only the shared count knows
+            throttling.store.clear()
+            response = await client.get('/api/v1/async/search', {'q': 'jo'})
+        self.assertEqual(response.status_code, 429)
+        self.assertTrue(loops)
+        self.assertEqual(set(loops), {None})
+
+    def test_forwarded_for_is_ignored_without_proxies(self):
+        for n in range(3):
+            self.client.get('/api/v1/search', {'q': 'jo'}, HTTP_X_FORWARDED_FOR=f'10.1.0.{n}')
+        response = self.client.get('/api/v1/search', {'q': 'jo'}, HTTP_X_FORWARDED_FOR='10.1.0.9')
+        self.assertEqual(response.status_code, 429)
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS, THROTTLE_ENABLED=False)
+class StatelessJWTTests(TestCase):
+    """Bearer tokens are verified from their claims; logout revokes them by jti"""
+
+    def setUp(self):
+        dimensions.clear()
+        self.client = APIClient()
+        batch = Batch.objects.create(title='BBA 1', session='2009-10')
+        self.user = User.objects.create_user('24230115084', 'john@example.com', 'secret-pass')
+        self.profile = StudentProfile.objects.create(
+            user=self.user, first_name='John', last_name='Doe', uni_id='24230115084',
+            email='john@example.com', batch=batch, is_cr=True
+        )
+        revoked_tokens.clear()
+        revoked_tokens.sync()
+        self.addCleanup(revoked_tokens.clear)
+
+        tokens = self.client.post(
+            '/api/v1/login', {'username': '24230115084', 'password': 'secret-pass'}, format='json'
+        ).data
+        self.access, self.refresh = tokens['access'], tokens['refresh']
+
+    def test_claims(self):
+        token = AccessToken(self.access)
+        self.assertEqual(token['uni_id'], '24230115084')
+        self.assertEqual(token['role'], 'CR')
+        self.assertFalse(token['is_verified'])
+
+    def test_authenticated_request_skips_user_query(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.access}')
+        # The profile read, then the conditional UPDATE and queueing the
+        # reindex in one transaction
+        with self.assertNumQueries(5):
+            response = self.client.patch(
+                f'/api/v1/profile/{self.profile.id}/', {'bio': 'Hello'}, format='json', HTTP_IF_MATCH='*'
+            )
+        self.assertEqual(response.status_code, 200)
+
+    def test_logout_revokes_access_and_refresh_tokens(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.access}')
+        self.client.post('/api/v1/logout', {'refresh': self.refresh}, format='json')
+
+        response = self.client.post(f'/api/v1/admin/verify/{self.profile.id}/verify/')
+        self.assertEqual(response.status_code, 401)
+        self.client.credentials()
+        response = self.client.post('/auth/token/refresh', {'refresh': self.refresh}, format='json')
+        self.assertEqual(response.status_code, 401)
+
+    @override_settings(JWT_REVOCATION_SYNC=0)
+    async def test_async_views_check_revocations_off_the_event_loop(self):
+        client, headers = AsyncClient(), {'Authorization': f'Bearer {self.access}'}
+        self.assertEqual((await client.get('/api/v1/async/profile/', headers=headers)).status_code, 200)
+
+        # Revoked by another process: only the stored row knows
+        await sync_to_async(revoked_tokens.revoke)(AccessToken(self.access))
+        revoked_tokens.clear()
+        response = await client.get('/api/v1/async/profile/', headers=headers)
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(len(revoked_tokens), 1)
+
+    def test_revocations_from_other_processes_are_synced(self):
+        revoked_tokens.revoke(AccessToken(self.access))
+        # A fresh process only knows what's stored
+        revoked_tokens.clear()
+        self.assertTrue(revoked_tokens.is_revoked(AccessToken(self.access, verify=False)['jti']))
+
+    @override_settings(JWT_REVOCATION_SYNC=0)
+    def test_revocations_committed_out_of_id_order_are_synced(self):
+        earlier, later = AccessToken(self.access), AccessToken.for_user(self.user)
+        expires_at = timezone.now() + timedelta(minutes=5)
+        # Two logouts in other processes: the row with the higher id commits first
+        RevokedToken.objects.create(id=10, jti=later['jti'], token_type='access', expires_at=expires_at)
+        self.assertTrue(revoked_tokens.is_revoked(later['jti']))
+        RevokedToken.objects.create(id=5, jti=earlier['jti'], token_type='access', expires_at=expires_at)
+        self.assertTrue(revoked_tokens.is_revoked(earlier['jti']))
+
+
+@override_settings(
+    PASSWORD_HASHERS=FAST_HASHERS, THROTTLE_ENABLED=False, DIRECTORY_CACHE_ENABLED=False, TASKS_MODE='worker'
+)
+class ConditionalRequestTests(TestCase):
+    """ETag / If-None-Match reads and If-Match writes of /profile/{pk}/ (apiv1.conditional)"""
+
+    def setUp(self):
+        dimensions.clear()
+        self.client = APIClient()
+        batch = Batch.objects.create(title='BBA 1', session='2009-10')
+        user = User.objects.create_user('24230115084', 'john@example.com', 'secret-pass')
+        self.profile = StudentProfile.objects.create(
+            user=user, first_name='John', last_name='Doe', uni_id='24230115084',
+            email='john@example.com', batch=batch
+        )
+        self.url = f'/api/v1/profile/{self.profile.id}/'
+        self.client.force_authenticate(user)
+
+    def patch(self, data, etag):
+        return self.client.patch(self.url, data, format='json', HTTP_IF_MATCH=etag)
+
+    def test_current_if_none_match_is_not_modified(self):
+        etag = self.client.get(self.url)['ETag']
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+
+        self.patch({'bio': 'Hello'}, etag)
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_write_without_if_match_is_rejected(self):
+        response = self.client.patch(self.url, {'bio': 'Hello'}, format='json')
+        self.assertEqual(response.status_code, 428)
+        self.assertIsNone(StudentProfile.objects.get().bio)
+
+    def test_stale_if_match_gets_the_current_etag(self):
+        stale = self.client.get(self.url)['ETag']
+        current = self.patch({'bio': 'Hello'}, stale)['ETag']
+
+        response = self.patch({'bio': 'Bye'}, stale)
+        self.assertEqual(response.status_code, 412)
+        self.assertEqual(response['ETag'], current)
+        self.assertEqual(self.patch({'bio': 'Bye'}, current).status_code, 200)
+        self.assertEqual(StudentProfile.objects.get().bio, 'Bye')
+
+    def test_etag_of_another_profile_does_not_match(self):
+        other = StudentProfile.objects.create(
+            first_name='Jane', last_name='Roe', uni_id='24230115085',
+            email='jane@example.com', batch=self.profile.batch
+        )
+        # Same revision, other profile
+        self.assertEqual(other.revision, self.profile.revision)
+        response = self.patch({'bio': 'Hello'}, self.client.get(f'/api/v1/profile/{other.id}/')['ETag'])
+        self.assertEqual(response.status_code, 412)
+        self.assertEqual(response['ETag'], profile_etag(self.profile.id, self.profile.revision))
+        self.assertEqual(self.patch({'bio': 'Hello'}, f'W/{response["ETag"]}').status_code, 412)
+        self.assertIsNone(StudentProfile.objects.get(pk=self.profile.pk).bio)
+
+    def test_only_one_of_two_concurrent_writes_wins(self):
+        etag = self.client.get(self.url)['ETag']
+        queued = Task.objects.count()
+
+        write_changes = StudentProfileDetailView._write_changes
+
+        def concurrent_write(view, profile, changed, now):
+            # The other request commits between this one's read and its UPDATE
+            StudentProfile.objects.filter(pk=self.profile.pk).update(
+                current_company='Other', revision=F('revision') + 1
+            )
+            return write_changes(view, profile, changed, now)
+
+        with mock.patch.object(StudentProfileDetailView, '_write_changes', autospec=True,
+                               side_effect=concurrent_write):
+            response = self.patch({'bio': 'Hello', 'current_company': 'Initech'}, etag)
+        self.assertEqual(response.status_code, 412)
+        self.assertEqual(response['ETag'], profile_etag(self.profile.id, 2))
+        profile = StudentProfile.objects.get()
+        self.assertEqual((profile.bio, profile.current_company, profile.revision), (None, 'Other', 2))
+        # The losing write queued no side effects and left no canonical company behind
+        self.assertEqual(Task.objects.count(), queued)
+        self.assertFalse(Company.objects.filter(name='Initech').exists())
+        self.assertIsNone(dimensions.companies.get('Initech'))
+
+    def test_unique_value_taken_meanwhile_is_a_validation_error(self):
+        etag = self.client.get(self.url)['ETag']
+
+        def concurrent_registration(changed, using):
+            StudentProfile.objects.create(
+                first_name='Jane', last_name='Roe', uni_id='24230115085',
+                email='jane@example.com', batch=self.profile.batch
+            )
+            return {}
+
+        with mock.patch('apiv1.views.profile_refs', side_effect=concurrent_registration):
+            response = self.patch({'email': 'jane@example.com'}, etag)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('email', response.data)
+        self.assertEqual(StudentProfile.objects.get(pk=self.profile.pk).email, 'john@example.com')
+
+
+@override_settings(THROTTLE_ENABLED=False, DIRECTORY_CACHE_ENABLED=False, TASKS_MODE='worker')
+class KeysetPaginationTests(TestCase):
+    """GET /profile/?page_size=...: cursor pages on -id (apiv1.pagination)"""
+
+    def setUp(self):
+        dimensions.clear()
+        self.client = APIClient()
+        self.bba1 = Batch.objects.create(title='BBA 1', session='2009-10')
+        bba2 = Batch.objects.create(title='BBA 2', session='2010-11')
+        StudentProfile.objects.bulk_create([
+            StudentProfile(
+                first_name=f'First{n}', last_name=f'Last{n}', uni_id=f'U{n}',
+                email=f'u{n}@example.com', batch=self.bba1 if n % 3 else bba2
+            )
+            for n in range(25)
+        ])
+
+    def pages(self, params, between_pages=None):
+        pages = []
+        response = self.client.get('/api/v1/profile/', params)
+        while True:
+            self.assertEqual(response.status_code, 200)
+            pages.append([row['id'] for row in response.data['results']])
+            if response.data['next'] is None:
+                return pages, response
+            if between_pages:
+                between_pages(len(pages))
+            response = self.client.get(response.data['next'])
+
+    def test_pages_cover_every_profile_once(self):
+        ids = list(StudentProfile.objects.order_by('-id').values_list('id', flat=True))
+        pages, last = self.pages({'page_size': 7})
+        self.assertEqual([len(page) for page in pages], [7, 7, 7, 4])
+        self.assertEqual(sum(pages, []), ids)
+        self.assertEqual(last.data['count'], 25)
+
+        # And back again
+        previous = self.client.get(last.data['previous'])
+        self.assertEqual([row['id'] for row in previous.data['results']], pages[-2])
+
+    def test_pages_are_stable_while_profiles_change(self):
+        ids = list(StudentProfile.objects.order_by('-id').values_list('id', flat=True))
+
+        def change(page):
+            if page == 1:
+                # Sorts before the cursor: neither shifts nor repeats rows
+                StudentProfile.objects.create(
+                    first_name='New', last_name='Doe', uni_id='U99', email='u99@example.com', batch=self.bba1
+                )
+                StudentProfile.objects.filter(id=ids[0]).delete()
+
+        pages, _ = self.pages({'page_size': 7}, between_pages=change)
+        self.assertEqual(sum(pages, []), ids)
+
+    def test_filtered_pages(self):
+        ids = list(StudentProfile.objects.filter(batch=self.bba1).order_by('-id').values_list('id', flat=True))
+        pages, last = self.pages({'page_size': 5, 'batch': 'BBA 1'})
+        self.assertEqual(sum(pages, []), ids)
+        self.assertEqual(last.data['count'], 16)
+
+    def test_page_size_is_capped(self):
+        # max_page_size is read from PROFILE_MAX_PAGE_SIZE at import
+        with mock.patch.object(StudentProfileCursorPagination, 'max_page_size', 10):
+            response = self.client.get('/api/v1/profile/', {'page_size': 1000})
+        self.assertEqual(len(response.data['results']), 10)
+
+    def test_unpaginated_listing_is_unchanged(self):
+        response = self.client.get('/api/v1/profile/')
+        self.assertEqual(set(response.data), {'count', 'filters', 'results'})
+        self.assertEqual(response.data['count'], 25)
+        self.assertEqual(
+            [row['id'] for row in response.data['results']],
+            list(StudentProfile.objects.order_by('-id').values_list('id', flat=True))
+        )
+
+
+@override_settings(THROTTLE_ENABLED=False, DIRECTORY_CACHE_ENABLED=True, TASKS_MODE='worker')
+class CachedReadTests(TestCase):
+    """Anonymous directory reads are served from the response cache (apiv1.cache)"""
+
+    def setUp(self):
+        dimensions.clear()
+        caches[settings.DIRECTORY_CACHE_ALIAS].clear()
+        self.client = APIClient()
+        batch = Batch.objects.create(title='BBA 1', session='2009-10')
+        self.user = User.objects.create_user('24230115084', 'john@example.com', 'secret-pass')
+        self.profile = StudentProfile.objects.create(
+            user=self.user, first_name='John', last_name='Doe', uni_id='24230115084',
+            email='john@example.com', batch=batch
+        )
+
+    def test_hit_skips_the_view(self):
+        first = self.client.get('/api/v1/profile/', {'batch': 'BBA 1'})
+        with self.assertNumQueries(0):
+            # Same parameters in another order and with an empty one
+            second = self.client.get('/api/v1/profile/?is_cr=&batch=BBA+1')
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(second['ETag'], first['ETag'])
+        self.assertIn('Authorization', second['Vary'])
+
+    def test_changes_bump_the_generation(self):
+        etag = self.client.get('/api/v1/profile/')['ETag']
+        self.profile.current_company = 'Acme'
+        self.profile.save()
+
+        response = self.client.get('/api/v1/profile/')
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(json.loads(response.content)['results'][0]['current_company'], 'Acme')
+
+    def test_revalidation(self):
+        response = self.client.get('/api/v1/profile/')
+        with self.assertNumQueries(0):
+            revalidated = self.client.get('/api/v1/profile/', HTTP_IF_NONE_MATCH=response['ETag'])
+            self.assertEqual(revalidated.status_code, 304)
+            self.assertEqual(revalidated['ETag'], response['ETag'])
+            revalidated = self.client.get('/api/v1/profile/', HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+            self.assertEqual(revalidated.status_code, 304)
+
+        self.assertEqual(self.client.get('/api/v1/profile/', HTTP_IF_NONE_MATCH='"other"').status_code, 200)
+        StudentProfile.objects.filter(pk=self.profile.pk).delete()
+        self.assertEqual(self.client.get('/api/v1/profile/', HTTP_IF_NONE_MATCH=response['ETag']).status_code, 200)
+
+    def test_authorized_requests_bypass_the_cache(self):
+        self.client.get('/api/v1/profile/')
+        # Not seen by the signals, so only a fresh read shows it
+        StudentProfile.objects.filter(pk=self.profile.pk).update(current_company='Acme')
+
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.user)}')
+        response = self.client.get('/api/v1/profile/')
+        self.assertNotIn('ETag', response)
+        self.assertEqual(response.data['results'][0]['current_company'], 'Acme')
+
+        self.client.credentials()
+        response = self.client.get('/api/v1/profile/')
+        self.assertIsNone(json.loads(response.content)['results'][0]['current_company'])
+
+
+@override_settings(THROTTLE_ENABLED=False, DIRECTORY_CACHE_ENABLED=False, TASKS_MODE='worker')
+class PictureUploadTests(TestCase):
+    """POST /profile/{pk}/picture/: WebP variants stored under the content hash (student.pictures)"""
+
+    def setUp(self):
+        dimensions.clear()
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        media = override_settings(MEDIA_ROOT=media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+
+        self.client = APIClient()
+        batch = Batch.objects.create(title='BBA 1', session='2009-10')
+        user = User.objects.create_user('24230115084', 'john@example.com', 'secret-pass')
+        self.profile = StudentProfile.objects.create(
+            user=user, first_name='John', last_name='Doe', uni_id='24230115084',
+            email='john@example.com', batch=batch
+        )
+        self.client.force_authenticate(user)
+
+    def upload(self, data, name='me.png', **extra):
+        return self.client.post(
+            f'/api/v1/profile/{self.profile.id}/picture/',
+            {'image': SimpleUploadedFile(name, data)}, format='multipart', **extra
+        )
+
+    def image(self, size=(600, 400), format='PNG'):
+        buffer = io.BytesIO()
+        Image.new('RGB', size, (200, 30, 30)).save(buffer, format)
+        return buffer.getvalue()
+
+    @skipUnless(Image, 'requires Pillow')
+    def test_upload_stores_webp_variants(self):
+        data = self.image()
+        response = self.upload(data, HTTP_IF_MATCH=profile_etag(self.profile.id, self.profile.revision))
+        self.assertEqual(response.status_code, 201)
+
+        digest = hashlib.sha256(data).hexdigest()
+        self.assertEqual(StudentProfile.objects.get().profile_pic_hash, digest)
+        self.assertEqual(response.data['profile_pic'], picture_url(digest))
+        for size in settings.PROFILE_PIC_SIZES:
+            with default_storage.open(picture_path(digest, size)) as stored, Image.open(stored) as variant:
+                self.assertEqual((variant.format, variant.size), ('WEBP', (size, size)))
+        self.assertEqual(self.client.get(f'/api/v1/profile/{self.profile.id}/').data['profile_pic'], picture_url(digest))
+
+    def test_same_content_is_not_decoded_again(self):
+        data = b'stored before'
+        digest = hashlib.sha256(data).hexdigest()
+        for size in settings.PROFILE_PIC_SIZES:
+            default_storage.save(picture_path(digest, size), ContentFile(b'webp'))
+
+        with mock.patch('student.pictures._decode') as decode:
+            response = self.upload(data)
+            self.assertEqual(response.status_code, 201)
+            etag = response['ETag']
+            # Uploading it again changes nothing
+            response = self.upload(data)
+        decode.assert_not_called()
+        self.assertEqual(response['ETag'], etag)
+        self.assertEqual(StudentProfile.objects.get().profile_pic_hash, digest)
+
+    @skipUnless(Image, 'requires Pillow')
+    def test_rejected_uploads(self):
+        for data, name in [(b'not an image', 'me.png'), (self.image(format='BMP'), 'me.bmp')]:
+            with self.subTest(name=name):
+                response = self.upload(data, name=name)
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('image', response.data)
+
+    @skipUnless(Image, 'requires Pillow')
+    @override_settings(PROFILE_PIC_MAX_PIXELS=600 * 400 - 1)
+    def test_too_many_pixels(self):
+        data = self.image()
+        with mock.patch('PIL.ImageFile.ImageFile.load') as load:
+            response = self.upload(data)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['image'], ['Image dimensions are too large.'])
+        load.assert_not_called()
+        self.assertIsNone(StudentProfile.objects.get().profile_pic_hash)
+
+    @override_settings(PROFILE_PIC_MAX_BYTES=1024)
+    def test_oversized_upload(self):
+        with mock.patch('student.pictures._decode') as decode:
+            response = self.upload(b'x' * 2048)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('at most', response.data['image'][0])
+        decode.assert_not_called()
+        self.assertIsNone(StudentProfile.objects.get().profile_pic_hash)
+
+    def test_stale_if_match(self):
+        response = self.upload(b'anything', HTTP_IF_MATCH=profile_etag(self.profile.id, 0))
+        self.assertEqual(response.status_code, 412)
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS, THROTTLE_ENABLED=False, TASKS_MODE='worker', EXPORT_CHUNK_SIZE=2)
+class ExportTests(TestCase):
+    """GET /profile/export/: the directory streamed as CSV or JSON Lines (student.export)"""
+
+    def setUp(self):
+        dimensions.clear()
+        self.client = APIClient()
+        bba1 = Batch.objects.create(title='BBA 1', session='2009-10')
+        bba2 = Batch.objects.create(title='BBA 2', session='2010-11')
+        # Committed, as far as the alias maps go
+        with self.captureOnCommitCallbacks(execute=True):
+            for n, (batch, company) in enumerate([
+                (bba1, 'Acme'), (bba1, '=HYPERLINK("http://evil.example","x")'), (bba1, None), (bba2, 'Acme'),
+            ]):
+                StudentProfile.objects.create(
+                    first_name=f'First{n}', last_name='Doe', uni_id=f'U{n}', email=f'u{n}@example.com',
+                    batch=batch, current_company=company, phone='+8801700000000' if n == 0 else None
+                )
+        self.admin = User.objects.create_user('admin', 'admin@example.com', 'secret-pass', is_staff=True)
+
+    def export(self, **params):
+        response = self.client.get('/api/v1/profile/export/', params)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return response, b''.join(response.streaming_content).decode()
+
+    def test_admins_only(self):
+        self.assertEqual(self.client.get('/api/v1/profile/export/').status_code, 401)
+        user = User.objects.create_user('24230115084', 'john@example.com', 'secret-pass')
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(user)}')
+        self.assertEqual(self.client.get('/api/v1/profile/export/').status_code, 403)
+
+        token = self.client.post('/api/v1/login', {'username': 'admin', 'password': 'secret-pass'}, format='json')
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token.data["access"]}')
+        self.assertEqual(self.client.get('/api/v1/profile/export/').status_code, 200)
+
+    def test_csv(self):
+        self.client.force_authenticate(self.admin)
+        response, content = self.export(batch='BBA 1')
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="alumni.csv"')
+
+        rows = list(csv.reader(io.StringIO(content)))
+        self.assertEqual(rows[0], [name for name, _ in export.EXPORT_FIELDS])
+        self.assertEqual([row[3] for row in rows[1:]], ['U0', 'U1', 'U2'])
+        company, phone = rows[0].index('current_company'), rows[0].index('phone')
+        # Formulas (and +phone numbers) are quoted for spreadsheets
+        self.assertEqual(rows[2][company], '\'=HYPERLINK("http://evil.example","x")')
+        self.assertEqual(rows[1][phone], "'+8801700000000")
+        self.assertEqual((rows[1][company], rows[3][company]), ('Acme', ''))
+
+    def test_jsonl(self):
+        self.client.force_authenticate(self.admin)
+        response, content = self.export(output='jsonl', company='acme')
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        rows = [json.loads(line) for line in content.splitlines()]
+        self.assertEqual([(row['uni_id'], row['batch']) for row in rows], [('U0', 'BBA 1'), ('U3', 'BBA 2')])
+        # Not for spreadsheets; values as stored
+        self.assertEqual(rows[0]['phone'], '+8801700000000')
+
+        self.assertEqual(self.client.get('/api/v1/profile/export/', {'output': 'xlsx'}).status_code, 400)
+
+
+@override_settings(THROTTLE_ENABLED=False, TASKS_MODE='worker')
+class BulkVerificationTests(TestCase):
+    """POST /api/v1/admin/verify/bulk/: one UPDATE, outcomes per id"""
+
+    def setUp(self):
+        dimensions.clear()
+        self.client = APIClient()
+        batch = Batch.objects.create(title='BBA 1', session='2009-10')
+        StudentProfile.objects.bulk_create([
+            StudentProfile(
+                first_name=f'First{n}', last_name=f'Last{n}', uni_id=f'U{n}',
+                email=f'u{n}@example.com', batch=batch, is_verified=n == 2
+            )
+            for n in range(4)
+        ])
+        self.ids = list(StudentProfile.objects.order_by('id').values_list('id', flat=True))
+        self.client.force_authenticate(
+            User.objects.create_user('admin', 'admin@example.com', 'secret-pass', is_staff=True)
+        )
+
+    def verify(self, data):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post('/api/v1/admin/verify/bulk/', data, format='json')
+
+    def test_mixed_ids(self):
+        missing = self.ids[-1] + 100
+        response = self.verify({'ids': [self.ids[0], self.ids[2], missing, self.ids[1], self.ids[0]]})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['verified'], 2)
+        self.assertEqual(response.data['results'], [
+            {'id': self.ids[0], 'status': 'verified'},
+            {'id': self.ids[2], 'status': 'already_verified'},
+            {'id': missing, 'status': 'not_found'},
+            {'id': self.ids[1], 'status': 'verified'},
+        ])
+        self.assertEqual(
+            list(StudentProfile.objects.filter(is_verified=True).order_by('id').values_list('id', 'revision')),
+            [(self.ids[0], 2), (self.ids[1], 2), (self.ids[2], 1)]
+        )
+        self.assertEqual(StudentVerification.objects.count(), 2)
+
+        # Nothing left to verify the second time
+        response = self.verify({'ids': [self.ids[0], self.ids[1]]})
+        self.assertEqual(response.data['verified'], 0)
+        self.assertEqual({row['status'] for row in response.data['results']}, {'already_verified'})
+
+    def test_admins_only(self):
+        self.client.force_authenticate(User.objects.create_user('24230115084', 'john@example.com', 'secret-pass'))
+        response = self.verify({'batch': 'BBA 1'})
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(StudentProfile.objects.filter(is_verified=True).count(), 1)
+
+    def test_by_filter(self):
+        response = self.verify({'batch': 'BBA 1'})
+        self.assertEqual(response.data['verified'], 3)
+        self.assertFalse(StudentProfile.objects.filter(is_verified=False).exists())
+        self.assertEqual(self.client.post('/api/v1/admin/verify/bulk/', {}, format='json').status_code, 400)
+
+    @override_settings(DIRECTORY_CACHE_ENABLED=True)
+    def test_invalidates_cached_responses(self):
+        def verified_in_directory():
+            return sum(row['is_verified'] for row in json.loads(APIClient().get('/api/v1/profile/').content)['results'])
+
+        self.assertEqual(verified_in_directory(), 1)
+        before = get_generation()[0]
+
+        self.verify({'ids': self.ids[:2]})
+        self.assertEqual(get_generation()[0], before + 1)
+        self.assertEqual(verified_in_directory(), 3)
+
+        # Nothing verified, nothing invalidated
+        self.verify({'ids': self.ids[:2]})
+        self.assertEqual(get_generation()[0], before + 1)
+
+
+@override_settings(THROTTLE_ENABLED=False, SYNC_SETTLE=0)
+class SyncTests(TestCase):
+    """GET /api/v1/sync: only rows changed since the client's cursor (student.sync)"""
+
+    CLIENTS = 2000
+
+    def setUp(self):
+        dimensions.clear()
+        self.client = APIClient()
+        self.batch = Batch.objects.create(title='BBA 1', session='2009-10')
+        StudentProfile.objects.bulk_create([
+            StudentProfile(
+                first_name=f'First{n}', last_name=f'Last{n}', uni_id=f'U{n}',
+                email=f'u{n}@example.com', batch=self.batch, bio='x' * 200
+            )
+            for n in range(300)
+        ])
+
+    def download(self, cursor=None, page_size=None):
+        """Sync until caught up: (profiles by id, deleted profile ids, cursor)"""
+        profiles, deleted = {}, []
+        while True:
+            params = {key: value for key, value in (('cursor', cursor), ('page_size', page_size)) if value}
+            data = self.client.get('/api/v1/sync', params).data
+            profiles.update((row['id'], row) for row in data['profiles'])
+            deleted += data['deleted']['profiles']
+            cursor = data['cursor']
+            if not data['has_more']:
+                return profiles, deleted, cursor
+
+    def test_full_download_in_pages(self):
+        profiles, deleted, _ = self.download(page_size=70)
+        self.assertEqual(len(profiles), 300)
+        self.assertEqual(deleted, [])
+
+    def test_clients_sync_a_small_edit(self):
+        _, _, cursor = self.download()
+        full_size = len(self.client.get('/api/v1/profile/').content)
+
+        profile = StudentProfile.objects.get(uni_id='U7')
+        profile.current_company = 'Acme'
+        profile.save()
+
+        # Every offline copy catches up with three index range scans and a
+        # response of a few hundred bytes
+        with self.assertNumQueries(3):
+            self.client.get('/api/v1/sync', {'cursor': cursor})
+        for _ in range(self.CLIENTS):
+            response = self.client.get('/api/v1/sync', {'cursor': cursor})
+            self.assertEqual([row['id'] for row in response.data['profiles']], [profile.id])
+            self.assertEqual(response.data['profiles'][0]['current_company'], 'Acme')
+            self.assertFalse(response.data['has_more'])
+        self.assertLess(len(response.content) * 100, full_size)
+
+        # Caught up: nothing more to send
+        response = self.client.get('/api/v1/sync', {'cursor': response.data['cursor']})
+        self.assertEqual(response.data['profiles'], [])
+
+    def test_deletions_and_batch_renames(self):
+        _, _, cursor = self.download()
+        deleted = StudentProfile.objects.get(uni_id='U3')
+        deleted_id = deleted.id
+        deleted.delete()
+        self.batch.title = 'BBA 01'
+        self.batch.save()
+
+        data = self.client.get('/api/v1/sync', {'cursor': cursor}).data
+        self.assertEqual(data['batches'], [{'id': self.batch.id, 'title': 'BBA 01', 'session': '2009-10'}])
+        # Every profile shows the batch title
+        self.assertEqual(len(data['profiles']), 299)
+        self.assertEqual(data['deleted']['profiles'], [deleted_id])
+
+    def test_bad_cursors(self):
+        self.assertEqual(self.client.get('/api/v1/sync', {'cursor': 'nonsense'}).status_code, 400)
+        with override_settings(SYNC_TOMBSTONE_DAYS=0):
+            _, _, cursor = self.download()
+            self.assertEqual(self.client.get('/api/v1/sync', {'cursor': cursor}).status_code, 410)
+
+
+@override_settings(
+    PASSWORD_HASHERS=FAST_HASHERS, THROTTLE_ENABLED=False, DIRECTORY_CACHE_ENABLED=False, TASKS_MODE='worker'
+)
+class TaskQueueTests(TestCase):
+    """config.tasks: side effects queued in the request's transaction, run later"""
+
+    def setUp(self):
+        dimensions.clear()
+        self.client = APIClient()
+        Batch.objects.create(title='BBA 1', session='2009-10')
+        self.calls = []
+
+        def flaky(fail_times=0, note=None):
+            self.calls.append(note)
+            if note:
+                # Written, then rolled back with the failed attempt
+                Batch.objects.create(title=note, session='x')
+            if len(self.calls) <= fail_times:
+                raise RuntimeError('boom')
+
+        tasks.handler('tests.flaky')(flaky)
+        self.addCleanup(tasks.HANDLERS.pop, 'tests.flaky')
+
+    def test_registration_side_effects_run_later(self):
+        response = self.client.post('/api/v1/register', {
+            'username': '24230115085', 'email': 'jane@example.com', 'password': 'secret-pass',
+            'first_name': 'Jane', 'last_name': 'Roe', 'batch': 'BBA 1',
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.client.get('/api/v1/search', {'q': 'jane'}).data['count'], 0)
+        self.assertFalse(DirectoryFacet.objects.filter(dimension='total', count=1).exists())
+
+        self.assertEqual(tasks.run_pending(), 2)
+        self.assertEqual(self.client.get('/api/v1/search', {'q': 'jane'}).data['count'], 1)
+        self.assertTrue(DirectoryFacet.objects.filter(dimension='total', count=1).exists())
+        self.assertFalse(Task.objects.exists())
+
+    def test_dedupe_key(self):
+        for _ in range(3):
+            tasks.enqueue('tests.flaky', dedupe_key='same')
+        tasks.enqueue('tests.flaky')
+        self.assertEqual(tasks.run_pending(), 2)
+        # Queued again once the pending one has run
+        tasks.enqueue('tests.flaky', dedupe_key='same')
+        self.assertEqual(Task.objects.count(), 1)
+
+    @override_settings(TASK_RETRY_DELAY=60)
+    def test_retries_then_failure(self):
+        tasks.enqueue('tests.flaky', max_attempts=2, fail_times=5, note='attempt')
+        self.assertEqual(tasks.run_pending(), 1)
+        task = Task.objects.get()
+        self.assertEqual((task.status, task.attempts), (Task.PENDING, 1))
+        self.assertIn('boom', task.last_error)
+        # Not due before the retry delay
+        self.assertEqual(tasks.run_pending(), 0)
+
+        Task.objects.update(run_after=task.created_at)
+        self.assertEqual(tasks.run_pending(), 1)
+        self.assertEqual(Task.objects.get().status, Task.FAILED)
+        # Each failed attempt's writes were rolled back
+        self.assertEqual(len(self.calls), 2)
+        self.assertFalse(Batch.objects.filter(title='attempt').exists())
+
+    def test_expired_lease_is_taken_over(self):
+        tasks.enqueue('tests.flaky')
+        # Claimed by a worker that died
+        Task.objects.update(status=Task.RUNNING, attempts=1, locked_until=Task.objects.get().created_at)
+        self.assertEqual(tasks.run_pending(), 1)
+        self.assertFalse(Task.objects.exists())
+
+    def test_worker_whose_lease_was_taken_over_skips_the_task(self):
+        tasks.enqueue('tests.flaky')
+        [stale] = tasks.claim(10)
+        # Its lease runs out before it gets to run the task; another worker claims it
+        Task.objects.update(locked_until=stale.created_at)
+        [current] = tasks.claim(10)
+        self.assertEqual((stale.attempts, current.attempts), (1, 2))
+
+        with self.assertLogs('config.tasks', 'WARNING'):
+            self.assertFalse(tasks.run(stale))
+        self.assertEqual(self.calls, [])
+        self.assertTrue(tasks.run(current))
+        self.assertEqual(self.calls, [None])
+        self.assertFalse(Task.objects.exists())
+
+    @override_settings(DIRECTORY_CACHE_ENABLED=True)
+    def test_tasks_invalidate_cached_responses(self):
+        self.client.post('/api/v1/register', {
+            'username': '24230115085', 'email': 'jane@example.com', 'password': 'secret-pass',
+            'first_name': 'Jane', 'last_name': 'Roe', 'batch': 'BBA 1',
+        }, format='json')
+        # Cached before the index and facet tasks ran
+        self.assertEqual(self.client.get('/api/v1/search', {'q': 'jane'}).data['count'], 0)
+        self.assertEqual(self.client.get('/api/v1/stats').data['total'], 0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(tasks.run_pending(), 2)
+        self.assertEqual(self.client.get('/api/v1/search', {'q': 'jane'}).data['count'], 1)
+        self.assertEqual(self.client.get('/api/v1/stats').data['total'], 1)
+
+
+class WarmupTests(TestCase):
+    """config.warmup: caches primed at worker start, cold-start timings"""
+
+    def setUp(self):
+        dimensions.clear()
+        batch_cache.clear()
+        revoked_tokens.clear()
+        Batch.objects.create(title='BBA 1', session='2009-10')
+
+    def test_warm_primes_caches(self):
+        self.assertEqual(set(warmup.warm()), set(warmup.STAGES))
+        with self.assertNumQueries(0):
+            self.assertIsNotNone(batch_cache.get('BBA 1'))
+            self.assertIsNone(dimensions.countries.get('Atlantis'))
+            self.assertFalse(revoked_tokens.is_revoked('unknown-jti'))
+
+    def test_failed_stage_is_skipped(self):
+        def broken():
+            raise RuntimeError('no table')
+
+        with mock.patch.dict(warmup.STAGES, {'batches': broken}), self.assertLogs('config.warmup', 'ERROR'):
+            timings = warmup.warm()
+        self.assertNotIn('batches', timings)
+        self.assertIn('urls', timings)
+
+    @override_settings(TASKS_MODE='thread')
+    def test_first_response_is_timed(self):
+        cold_start = warmup.ColdStart()
+        with self.assertLogs('config.warmup', 'INFO') as logs:
+            cold_start.ready(0.5, {'urls': 0.01})
+            with mock.patch.object(tasks.drainer, 'start') as start:
+                self.client.get('/api/v1/profile/')
+                self.client.get('/api/v1/profile/')
+
+        # The drainer thread starts with the first request, not at import
+        start.assert_called_once_with()
+        self.assertEqual(cold_start.first_path, '/api/v1/profile/')
+        report = cold_start.report()
+        self.assertEqual(report['import_ms'], 500.0)
+        self.assertGreater(report['first_response_ms'], 0)
+        self.assertEqual([json.loads(line.split(':', 2)[2])['event'] for line in logs.output], ['ready', 'first_response'])
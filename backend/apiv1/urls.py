@@ -14,6 +14,9 @@ urlpatterns = [
     path('', include(router.urls)),
 
     path('search', views.student_search, name='student-search'),
+    path('stats', views.directory_stats, name='directory-stats'),
+    path('sync', views.directory_sync, name='directory-sync'),
+    path('admin/throttle', views.throttle_stats, name='throttle-stats'),
 
     
 
@@ -1,11 +1,31 @@
+import os
+
+from django.conf import settings
+from django.db import IntegrityError, router, transaction
+from django.db.models import F
+from django.db.models.signals import post_save
+from django.http import StreamingHttpResponse
 from django.shortcuts import render
+from django.utils import timezone
 from rest_framework import status, generics, viewsets
 from rest_framework.response import Response
-from rest_framework.permissions import AllowAny, IsAuthenticated, IsAuthenticatedOrReadOnly
+from rest_framework.permissions import AllowAny, IsAdminUser, IsAuthenticated, IsAuthenticatedOrReadOnly
 from rest_framework.decorators import api_view, permission_classes, action
-from django.db.models import Q, Value, IntegerField, Case, When
-from student.serializers import StudentRegistrationSerializer, StudentProfileSerializer
-from student.models import StudentProfile
+from rest_framework.exceptions import ValidationError
+from rest_framework.parsers import MultiPartParser
+from student.serializers import StudentRegistrationSerializer, StudentProfileSerializer, StudentProfileReadSerializer
+from student.models import Batch, StudentProfile, StudentVerification
+from student.search import search_profiles
+from student.dimensions import profile_refs
+from student.filters import filter_profiles
+from student.facets import facet_counts, list_facets
+from student import export, sync
+from student.pictures import PictureError, picture_url, store_picture
+from config import throttling
+from config.db_router import replica_reads
+from .cache import cached_read, bump_generation
+from .conditional import profile_etag, none_match, if_match
+from .pagination import StudentProfileCursorPagination
 
 
 class StudentRegistrationView(generics.CreateAPIView):
@@ -20,16 +40,23 @@ class StudentRegistrationView(generics.CreateAPIView):
         serializer = self.get_serializer(data=request.data)
         
         if serializer.is_valid():
-            result = serializer.save()
-            return Response(
-                serializer.to_representation(result),
-                status=status.HTTP_201_CREATED
-            )
+            try:
+                result = serializer.save()
+            except ValidationError as e:
+                # Lost a race for the same ID / email (see the serializer's create)
+                errors = e.detail
+            else:
+                return Response(
+                    serializer.to_representation(result),
+                    status=status.HTTP_201_CREATED
+                )
+        else:
+            errors = serializer.errors
         
         return Response(
             {
                 'message': 'Registration failed',
-                'errors': serializer.errors
+                'errors': errors
             },
             status=status.HTTP_400_BAD_REQUEST
         )
@@ -45,24 +72,37 @@ class StudentProfileDetailView(viewsets.ViewSet):
         ?is_cr=true - Filter by CR status
         ?company=google - Fuzzy search by company name
         ?position=engineer - Fuzzy search by job position
+        ?page_size=50 / ?cursor=... - Keyset pagination (see list)
+        ?fields=id,first_name,... - Only return these profile fields
+        ?facets=true - Add facet counts (see student.facets)
         
-    GET /profile/{pk} - Get single profile
-    PUT/PATCH /profile/{pk} - Update profile
+    GET /profile/{pk} - Get single profile (ETag, If-None-Match -> 304)
+    PUT/PATCH /profile/{pk} - Update profile (If-Match required)
+    POST /profile/{pk}/picture/ - Upload a profile picture
+    GET /profile/export/?output=csv|jsonl - Stream the (filtered) directory
     """
     serializer_class = StudentProfileSerializer
     queryset = StudentProfile.objects.all()
     permission_classes = [IsAuthenticatedOrReadOnly]
+    pagination_class = StudentProfileCursorPagination
 
     def get_permissions(self):
-        # Anyone can view, but only authenticated users can update
-        if self.request.method == 'GET':
+        # Anyone can view, but only authenticated users can update and admins export
+        if self.request.method == 'GET' and self.action != 'export':
             return [AllowAny()]
         return super().get_permissions()
 
+    @replica_reads
     def retrieve(self, request, pk=None):
-        """Handles GET /profile/{pk}"""
+        """Handles GET /profile/{pk}; 304 for a current If-None-Match (apiv1.conditional)"""
+        if 'HTTP_IF_NONE_MATCH' in request.META:
+            # Revalidation only needs the revision, not the whole row
+            current = self.queryset.filter(pk=pk).values_list('id', 'revision').first()
+            if current is not None and none_match(request, profile_etag(*current)):
+                return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': profile_etag(*current)})
+
         try:
-            profile = self.queryset.get(pk=pk)
+            profile = self.queryset.select_related('batch').get(pk=pk)
         except StudentProfile.DoesNotExist:
             return Response(
                 {'message': 'Profile not found'},
@@ -70,8 +110,10 @@ class StudentProfileDetailView(viewsets.ViewSet):
             )
         
         serializer = self.serializer_class(profile)
-        return Response(serializer.data)
+        return Response(serializer.data, headers={'ETag': profile_etag(profile.pk, profile.revision)})
     
+    @replica_reads
+    @cached_read('profile-list')
     def list(self, request):
         """
         Handles GET /profile/ with filtering options
@@ -82,75 +124,164 @@ class StudentProfileDetailView(viewsets.ViewSet):
         - is_cr: Filter by CR status (true/false)
         - company: Fuzzy search by company name (contains, case-insensitive)
         - position: Fuzzy search by job position (contains, case-insensitive)
+        - page_size: Switch to cursor mode with this many rows per page
+        - cursor: Opaque cursor from a previous page's next/previous link
+        - fields: Comma separated subset of profile fields to return
+        - facets: true to add counts per batch, country and company
+
+        In cursor mode only one page is serialized, `count` comes from a
+        separate COUNT(*) and `next`/`previous` carry the page cursors.
         """
         # Start with all profiles, optimized with select_related
         profiles = self.queryset.select_related('batch')
         
-        # Get filter parameters
-        batch_filter = request.query_params.get('batch', None)
-        country_filter = request.query_params.get('country', None)
-        is_cr_filter = request.query_params.get('is_cr', None)
-        company_filter = request.query_params.get('company', None)
-        position_filter = request.query_params.get('position', None)
-        
-        # Apply filters if provided
-        if batch_filter:
-            profiles = profiles.filter(batch__title__iexact=batch_filter)
-        
-        if country_filter:
-            profiles = profiles.filter(country__iexact=country_filter)
+        profiles, filters = filter_profiles(profiles, request.query_params)
 
-        if is_cr_filter is not None:
-            # Convert string to boolean
-            is_cr_bool = is_cr_filter.lower() in ('true', '1', 'yes')
-            profiles = profiles.filter(is_cr=is_cr_bool)
-        
-        if company_filter:
-            # Fuzzy match - contains search, case-insensitive
-            profiles = profiles.filter(current_company__icontains=company_filter)
-        
-        if position_filter:
-            # Fuzzy match - contains search, case-insensitive
-            profiles = profiles.filter(current_job_position__icontains=position_filter)
-        
-        # Order by most relevant: CR first, then by name
-        profiles = profiles.order_by('-id', '-is_cr', 'first_name', 'last_name')
-        
-        serializer = self.serializer_class(profiles, many=True)
-        
-        # Return with metadata about applied filters
-        return Response({
-            'count': len(serializer.data),
-            'filters': {
-                'batch': batch_filter,
-                'country': country_filter,
-                'is_cr': is_cr_filter,
-                'company': company_filter,
-                'position': position_filter,
-            },
-            'results': serializer.data
-        })
+        # Rows are built straight from .values() (see StudentProfileReadSerializer)
+        serializer = StudentProfileReadSerializer.from_request(request)
+
+        # ?facets=true: counts per batch / country / company alongside the results
+        facet_data = list_facets(request.query_params, profiles, filters)
+
+        paginator = self.pagination_class()
+        if paginator.is_requested(request):
+            # Keyset page on -id; count runs as its own COUNT(*) query
+            page = paginator.paginate_queryset(serializer.values(profiles), request, view=self)
+            data = {
+                'count': profiles.count(),
+                'filters': filters,
+                'next': paginator.get_next_link(),
+                'previous': paginator.get_previous_link(),
+                'results': serializer.serialize(page)
+            }
+        else:
+            # Order by most relevant: CR first, then by name
+            profiles = profiles.order_by('-id', '-is_cr', 'first_name', 'last_name')
+
+            results = serializer.serialize(profiles)
+
+            # Return with metadata about applied filters
+            data = {
+                'count': len(results),
+                'filters': filters,
+                'results': results
+            }
+
+        if facet_data is not None:
+            data['facets'] = facet_data
+        return Response(data)
     
+    @action(detail=False, methods=['get'], permission_classes=[IsAdminUser])
+    def export(self, request):
+        """
+        Handles GET /profile/export/ - stream the whole directory (admins only)
+
+        Takes the same filters as list, plus:
+        - output: csv (default) or jsonl
+        """
+        output = request.query_params.get('output', 'csv')
+        if output not in export.FORMATS:
+            return Response(
+                {'message': f"Unknown output '{output}', use one of: {', '.join(export.FORMATS)}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        profiles, _ = filter_profiles(StudentProfile.objects.all(), request.query_params)
+
+        response = StreamingHttpResponse(
+            export.stream(profiles, output, chunk_size=settings.EXPORT_CHUNK_SIZE),
+            content_type=export.FORMATS[output]
+        )
+        response['Content-Disposition'] = f'attachment; filename="alumni.{output}"'
+        return response
+
     # @action(detail=True, methods=['put'], permission_classes=[IsAuthenticated])
     def update(self, request, pk=None):
-        """Handles PUT /profile/{pk} (Full Update)"""
+        """Handles PUT /profile/{pk} (Full Update), If-Match required"""
+        return self._conditional_update(request, pk, partial=False)
+
+    # @action(detail=True, methods=['patch'], permission_classes=[IsAuthenticated])
+    def partial_update(self, request, pk=None):
+        """Handles PATCH /profile/{pk} (Partial Update), If-Match required"""
+        return self._conditional_update(request, pk, partial=True)
+
+    def _conditional_update(self, request, pk, partial):
+        """
+        Optimistic-concurrency write (see apiv1.conditional)
+
+        - 428 without If-Match, 412 (with the current ETag) when it's stale
+        - Only the columns that actually change are written, in one
+          UPDATE ... WHERE revision = <current> that also bumps the revision
+        - Prefer: return=minimal answers 204 instead of the updated profile
+        """
+        if 'HTTP_IF_MATCH' not in request.META:
+            return Response(
+                {'message': 'If-Match header with the profile ETag is required'},
+                status=status.HTTP_428_PRECONDITION_REQUIRED
+            )
+
         try:
-            profile = self.queryset.get(pk=pk)
+            profile = self.queryset.select_related('batch').get(pk=pk)
         except StudentProfile.DoesNotExist:
             return Response(
                 {'message': 'Profile not found'},
                 status=status.HTTP_404_NOT_FOUND
             )
-        
-        serializer = self.serializer_class(profile, data=request.data)
-        if serializer.is_valid():
-            serializer.save()
-            return Response(serializer.data)
-        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
-    # @action(detail=True, methods=['patch'], permission_classes=[IsAuthenticated])
-    def partial_update(self, request, pk=None):
-        """Handles PATCH /profile/{pk} (Partial Update)"""
+        if not if_match(request.META['HTTP_IF_MATCH'], profile.pk, profile.revision):
+            return self._precondition_failed(profile.pk, profile.revision)
+
+        serializer = self.serializer_class(profile, data=request.data, partial=partial)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        validated = dict(serializer.validated_data)
+        if 'batch' in validated:
+            title = validated['batch']['title']
+            if title == profile.batch.title:
+                validated['batch'] = profile.batch
+            else:
+                validated['batch'] = Batch.objects.filter(title=title).first()
+                if validated['batch'] is None:
+                    return Response(
+                        {'batch': [f"Batch '{title}' does not exist."]},
+                        status=status.HTTP_400_BAD_REQUEST
+                    )
+
+        changed = {
+            field: value for field, value in validated.items()
+            if getattr(profile, field) != value
+        }
+        if 'profile_pic' in changed:
+            # A new picture URL replaces an uploaded picture
+            changed['profile_pic_hash'] = None
+        error = self._save_changes(profile, changed)
+        if error is not None:
+            return error
+
+        headers = {'ETag': profile_etag(profile.pk, profile.revision)}
+        if 'return=minimal' in request.headers.get('Prefer', ''):
+            return Response(status=status.HTTP_204_NO_CONTENT, headers=headers)
+        return Response(serializer.data, headers=headers)
+
+    @action(detail=True, methods=['post'], permission_classes=[IsAuthenticated],
+            parser_classes=[MultiPartParser])
+    def picture(self, request, pk=None):
+        """
+        Handles POST /profile/{pk}/picture/ - upload a profile picture
+
+        Multipart form with the file as `image` (JPEG, PNG, WebP or GIF).
+        It's stored as WebP thumbnails under its content hash
+        (student.pictures), and `profile_pic` in profile responses links the
+        small one from then on. If-Match is checked when sent.
+        """
+        upload = request.FILES.get('image')
+        if upload is None:
+            return Response(
+                {'image': ['No image was uploaded.']},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
         try:
             profile = self.queryset.get(pk=pk)
         except StudentProfile.DoesNotExist:
@@ -158,16 +289,109 @@ class StudentProfileDetailView(viewsets.ViewSet):
                 {'message': 'Profile not found'},
                 status=status.HTTP_404_NOT_FOUND
             )
-        
-        serializer = self.serializer_class(profile, data=request.data, partial=True) 
-        if serializer.is_valid():
-            serializer.save()
-            return Response(serializer.data)
-        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        if 'HTTP_IF_MATCH' in request.META:
+            if not if_match(request.META['HTTP_IF_MATCH'], profile.pk, profile.revision):
+                return self._precondition_failed(profile.pk, profile.revision)
+
+        try:
+            digest = store_picture(upload)
+        except PictureError as e:
+            return Response(
+                {'image': [str(e)]},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        if profile.profile_pic_hash != digest:
+            error = self._save_changes(profile, {'profile_pic_hash': digest})
+            if error is not None:
+                return error
+
+        return Response(
+            {
+                'profile_pic': picture_url(digest),
+                'sizes': {str(size): picture_url(digest, size) for size in settings.PROFILE_PIC_SIZES},
+            },
+            status=status.HTTP_201_CREATED,
+            headers={'ETag': profile_etag(profile.pk, profile.revision)}
+        )
+
+    def _save_changes(self, profile, changed):
+        """
+        Write the `changed` columns in one UPDATE ... WHERE revision =
+        <profile.revision> that also bumps the revision, and apply them to
+        `profile`. Returns a 412 / 404 response when the profile was changed
+        or deleted since it was read, a 400 when another profile took one of
+        its unique values meanwhile, else None.
+        """
+        if not changed:
+            return None
+
+        now = timezone.now()
+        try:
+            updated = self._write_changes(profile, changed, now)
+        except IntegrityError:
+            # The serializer saw the email / uni_id free, then a concurrent
+            # registration or edit took it
+            errors = {
+                field: [f'student profile with this {field} already exists.']
+                for field in changed if StudentProfile._meta.get_field(field).unique
+            }
+            return Response(
+                errors or {'message': 'Profile could not be saved, reload it and retry'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        if not updated:
+            current = self.queryset.filter(pk=profile.pk).values_list('revision', flat=True).first()
+            if current is None:
+                return Response(
+                    {'message': 'Profile not found'},
+                    status=status.HTTP_404_NOT_FOUND
+                )
+            return self._precondition_failed(profile.pk, current)
+        return None
+
+    def _write_changes(self, profile, changed, now):
+        """The UPDATE of _save_changes and its post_save; False when the revision moved on"""
+        # One transaction with the tasks the post_save receivers queue
+        # (config.tasks), so they exist exactly when the change does
+        with transaction.atomic():
+            using = router.db_for_write(StudentProfile)
+            # Canonical country / company (the pre_save signal's job on
+            # save()); rows it adds go away with a failed update
+            changed.update(profile_refs(changed, using=using))
+            updated = self.queryset.filter(pk=profile.pk, revision=profile.revision).update(
+                **changed, revision=F('revision') + 1, updated_at=now
+            )
+            if updated:
+                for field, value in changed.items():
+                    setattr(profile, field, value)
+                profile.revision += 1
+                profile.updated_at = now
+                # .update() skips post_save; search index, facets and the
+                # response cache listen to it
+                post_save.send(
+                    sender=StudentProfile, instance=profile, created=False, raw=False,
+                    update_fields=frozenset([*changed, 'revision', 'updated_at']),
+                    using=using
+                )
+            else:
+                transaction.set_rollback(True)
+        return bool(updated)
+
+    def _precondition_failed(self, pk, revision):
+        return Response(
+            {'message': 'Profile was modified since it was fetched, reload it and retry'},
+            status=status.HTTP_412_PRECONDITION_FAILED,
+            headers={'ETag': profile_etag(pk, revision)}
+        )
 
 
 @api_view(['GET'])
 @permission_classes([AllowAny])
+@replica_reads
+@cached_read('search')
 def student_search(request):
     """
     Search students by name, email, phone, batch, company, or position
@@ -200,68 +424,18 @@ def student_search(request):
             status=status.HTTP_200_OK
         )
     
-    # Build the search query with Q objects for OR logic
-    search_query = Q()
-    
-    # Search in multiple fields (case-insensitive)
-    search_query |= Q(first_name__icontains=query)
-    search_query |= Q(last_name__icontains=query)
-    search_query |= Q(uni_id__icontains=query)
-    search_query |= Q(email__icontains=query)
-    search_query |= Q(phone__icontains=query)
-    search_query |= Q(batch__title__icontains=query)
-    search_query |= Q(batch__session__icontains=query)
-    search_query |= Q(country__icontains=query)
-    search_query |= Q(current_company__icontains=query)
-    search_query |= Q(current_job_position__icontains=query)
-    search_query |= Q(bio__icontains=query)
-    
-    # Query optimization: Use select_related to reduce database hits
-    results = StudentProfile.objects.filter(search_query).select_related(
-        'batch'
-    ).annotate(
-        # Relevance scoring for ordering
-        relevance=Case(
-            # Exact match in uni_id (highest priority)
-            When(uni_id__iexact=query, then=Value(100)),
-            # Exact match in first or last name
-            When(Q(first_name__iexact=query) | Q(last_name__iexact=query), then=Value(90)),
-            # Starts with in first or last name
-            When(Q(first_name__istartswith=query) | Q(last_name__istartswith=query), then=Value(80)),
-            # Exact match in email
-            When(email__iexact=query, then=Value(70)),
-            # Exact match in phone
-            When(phone__iexact=query, then=Value(65)),
-            # Starts with in uni_id
-            When(uni_id__istartswith=query, then=Value(60)),
-            # Contains in name
-            When(Q(first_name__icontains=query) | Q(last_name__icontains=query), then=Value(50)),
-            # Batch match
-            When(batch__title__icontains=query, then=Value(40)),
-            # Country match
-            When(country__icontains=query, then=Value(35)),
-            # Company or position match
-            When(Q(current_company__icontains=query) | Q(current_job_position__icontains=query), then=Value(30)),
-            # Email or phone contains
-            When(Q(email__icontains=query) | Q(phone__icontains=query), then=Value(25)),
-            # Bio match (lowest priority)
-            When(bio__icontains=query, then=Value(10)),
-            default=Value(1),
-            output_field=IntegerField()
-        )
-    ).order_by('-relevance', 'first_name', 'last_name').distinct()
-    
-    # Limit results to prevent large response payloads
-    results = results[:50]
+    # Candidates come from the full-text index, ranked by relevance tiers
+    # and limited to prevent large response payloads
+    results = search_profiles(query, limit=50)
     
-    # Serialize the results
-    serializer = StudentProfileSerializer(results, many=True)
+    # Serialize the results (fast path, honours ?fields=)
+    results = StudentProfileReadSerializer.from_request(request).serialize(results)
     
     return Response(
         {
             'query': query,
-            'count': len(serializer.data),
-            'results': serializer.data
+            'count': len(results),
+            'results': results
         },
         status=status.HTTP_200_OK
     )
@@ -270,34 +444,129 @@ def student_search(request):
 
 
 
+@api_view(['GET'])
+@permission_classes([AllowAny])
+@replica_reads
+@cached_read('stats')
+def directory_stats(request):
+    """
+    Alumni counts for the landing page
+    GET /api/v1/stats?limit=20
+
+    Returns the directory size, counts per batch, the top `limit` countries
+    and companies and the number of CRs, read from the precomputed
+    DirectoryFacet table (see student.facets).
+    """
+    try:
+        limit = min(max(int(request.query_params.get('limit', 20)), 1), 200)
+    except ValueError:
+        limit = 20
+
+    return Response(facet_counts(limit=limit), status=status.HTTP_200_OK)
+
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def directory_sync(request):
+    """
+    Changes since a client's last sync, for offline copies of the directory
+    GET /api/v1/sync?cursor=...&page_size=500
+
+    Without a cursor the whole directory is sent, in pages. Returns changed
+    `profiles` and `batches`, `deleted` profile / batch ids, the `cursor`
+    for the next call and `has_more` while further pages are waiting.
+    ?fields= restricts the profile fields as for GET /profile/. See
+    student.sync.
+
+    Not served from the read replica: a lagging replica would hand out
+    cursors past rows it hasn't received yet.
+    """
+    try:
+        page_size = min(max(int(request.query_params.get('page_size', settings.SYNC_PAGE_SIZE)), 1),
+                        settings.SYNC_MAX_PAGE_SIZE)
+    except ValueError:
+        page_size = settings.SYNC_PAGE_SIZE
+
+    serializer = StudentProfileReadSerializer.from_request(request)
+    try:
+        data = sync.changes(serializer, request.query_params.get('cursor'), page_size)
+    except sync.InvalidCursor as e:
+        return Response({'message': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    except sync.CursorExpired as e:
+        return Response({'message': str(e)}, status=status.HTTP_410_GONE)
+
+    return Response(data, status=status.HTTP_200_OK)
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def throttle_stats(request):
+    """
+    Rate limiter counters of the process serving the request
+    GET /api/v1/admin/throttle
+
+    Returns admitted / rejected requests per scope and the number of live
+    buckets (see config.throttling).
+    """
+    return Response(
+        {
+            'pid': os.getpid(),
+            'enabled': settings.THROTTLE_ENABLED,
+            'rates': settings.THROTTLE_RATES,
+            'buckets': len(throttling.store),
+            'scopes': throttling.counters.snapshot(),
+        },
+        status=status.HTTP_200_OK
+    )
+
+
 class VerificationView(viewsets.ViewSet):
     """
     ViewSet for verifying student profiles
     GET /admin/verify/ - List all unverified profiles
-    POST /admin/verify/{pk}/ - Verify a specific profile
+        ?page_size=50 / ?cursor=... - Keyset pagination with a count
+    POST /admin/verify/{pk}/verify/ - Verify a specific profile
+    POST /admin/verify/bulk/ - Verify many profiles at once (admins only)
     """
     serializer_class = StudentProfileSerializer
     queryset = StudentProfile.objects.filter(is_verified=False)
+    pagination_class = StudentProfileCursorPagination
 
     def list(self, request):
         """Handles GET /admin/verify/ to list unverified profiles"""
         profiles = self.queryset.select_related('batch')
-        serializer = self.serializer_class(profiles, many=True)
-        return Response(serializer.data)
+        serializer = StudentProfileReadSerializer.from_request(request)
+
+        paginator = self.pagination_class()
+        if paginator.is_requested(request):
+            # Both the page and the COUNT(*) use the partial index on unverified rows
+            page = paginator.paginate_queryset(serializer.values(profiles), request, view=self)
+            return Response({
+                'count': profiles.count(),
+                'next': paginator.get_next_link(),
+                'previous': paginator.get_previous_link(),
+                'results': serializer.serialize(page)
+            })
+
+        return Response(serializer.serialize(profiles))
 
     @action(detail=True, methods=['post'], permission_classes=[IsAuthenticated])
     def verify(self, request, pk=None):
         """Handles POST /admin/verify/{pk}/verify/ to verify a profile"""
         try:
-            profile = StudentProfile.objects.get(pk=pk)
+            profile = StudentProfile.objects.select_related('batch').get(pk=pk)
         except StudentProfile.DoesNotExist:
             return Response(
                 {'message': 'Profile not found'},
                 status=status.HTTP_404_NOT_FOUND
             )
         
-        profile.is_verified = True
-        profile.save()
+        with transaction.atomic():
+            profile.is_verified = True
+            profile.save(update_fields=['is_verified'])
+            StudentVerification.objects.bulk_create(
+                [StudentVerification(student=profile)], ignore_conflicts=True
+            )
         
         serializer = self.serializer_class(profile)
         return Response(
@@ -305,4 +574,77 @@ class VerificationView(viewsets.ViewSet):
                 'message': 'Profile verified successfully',
                 'profile': serializer.data
             }
-        )
\ No newline at end of file
+        )
+
+    @action(detail=False, methods=['post'], permission_classes=[IsAdminUser])
+    def bulk(self, request):
+        """
+        Handles POST /admin/verify/bulk/ to verify many profiles with one UPDATE (admins only)
+
+        Body (one of):
+        - ids: List of profile ids, e.g. {"ids": [12, 13, 14]}
+        - batch / country / is_cr / company / position: Verify every
+          unverified profile matching these filters (same as GET /profile/),
+          e.g. {"batch": "BBA 1"}
+
+        Returns the outcome for each id: verified, already_verified or not_found,
+        or 409 when another request verified some of them meanwhile.
+        """
+        if 'ids' in request.data:
+            ids = request.data.getlist('ids') if hasattr(request.data, 'getlist') else request.data['ids']
+            try:
+                if not isinstance(ids, (list, tuple)):
+                    raise TypeError
+                ids = list(dict.fromkeys(int(profile_id) for profile_id in ids))
+            except (TypeError, ValueError):
+                return Response(
+                    {'message': 'ids must be a list of profile ids'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+        else:
+            params = {key: str(value) for key, value in request.data.items() if value is not None}
+            profiles, filters = filter_profiles(self.queryset, params)
+            if not any(filters.values()):
+                return Response(
+                    {'message': 'Provide ids or at least one filter (batch, country, is_cr, company, position)'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            ids = list(profiles.values_list('id', flat=True))
+
+        with transaction.atomic():
+            # Read under row locks, so a concurrent verification or delete
+            # can't land between the read and the UPDATE
+            found = dict(
+                StudentProfile.objects.select_for_update().filter(id__in=ids).values_list('id', 'is_verified')
+            )
+            pending = [profile_id for profile_id in ids if found.get(profile_id) is False]
+            verified = StudentProfile.objects.filter(id__in=pending, is_verified=False).update(
+                is_verified=True, revision=F('revision') + 1, updated_at=timezone.now()
+            )
+            if verified != len(pending):
+                # Without row locks (SQLite) another request got some of them
+                # first, and which ones is no longer known
+                transaction.set_rollback(True)
+                return Response(
+                    {'message': 'Profiles were verified concurrently, retry'},
+                    status=status.HTTP_409_CONFLICT
+                )
+            StudentVerification.objects.bulk_create(
+                [StudentVerification(student_id=profile_id) for profile_id in pending],
+                ignore_conflicts=True
+            )
+            # .update() skips the post_save signal that invalidates cached reads
+            if verified:
+                transaction.on_commit(bump_generation)
+
+        outcomes = {False: 'verified', True: 'already_verified', None: 'not_found'}
+        return Response(
+            {
+                'message': f'{verified} profiles verified',
+                'verified': verified,
+                'results': [
+                    {'id': profile_id, 'status': outcomes[found.get(profile_id)]}
+                    for profile_id in ids
+                ]
+            }
+        )
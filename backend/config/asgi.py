@@ -8,9 +8,18 @@ https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
 
 import os
+from time import perf_counter
+
+started = perf_counter()
 
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
 
 application = get_asgi_application()
+
+# Warm the in-memory state up before the worker takes traffic, ready to be
+# shared with forked workers (config.warmup)
+from config import warmup
+
+warmup.startup(started)
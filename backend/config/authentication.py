@@ -1,8 +1,23 @@
+import logging
+
 from django.contrib.auth.backends import ModelBackend
 from django.contrib.auth.models import User
-from django.db.models import Q
+from django.db.models import Value, IntegerField, Case, When
+from django.utils.functional import cached_property
+from asgiref.sync import sync_to_async
+from rest_framework_simplejwt.authentication import JWTStatelessUserAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.settings import api_settings
+
 from student.models import StudentProfile
 
+from .hashing import check_user_password
+from .revocation import revoked_tokens
+
+
+logger = logging.getLogger(__name__)
+
 
 class MultiFieldAuthBackend(ModelBackend):
     """
@@ -10,55 +25,140 @@ class MultiFieldAuthBackend(ModelBackend):
     - University ID (username)
     - Email
     - Phone number
+
+    The user and its student profile (with batch) are resolved in a single
+    joined query; the loaded profile is cached on `user.student_profile`
+    so the token serializer doesn't need to look it up again.
     """
-    
+
     def authenticate(self, request, username=None, password=None, **kwargs):
         if username is None or password is None:
             return None
-        
+
         try:
-            user = None
-            
-            # Try to find the user by uni_id (stored as username), email, or phone
-            # First check if it's a direct username match
-            try:
-                user = User.objects.get(username=username)
-            except User.DoesNotExist:
-                # If not found by username, try to find by email in User model
-                try:
-                    user = User.objects.get(email=username)
-                except User.DoesNotExist:
-                    # If not found by email in User, search in StudentProfile
-                    student_profile = StudentProfile.objects.filter(
-                        Q(uni_id=username) | Q(email=username) | Q(phone=username)
-                    ).first()
-
-                    
-                    
-                    if student_profile:
-                        # Get the associated User by uni_id
-                        try:
-                            user = User.objects.get(username=student_profile.uni_id)
-                        except User.DoesNotExist:
-                            return None
-                    else:
-                        return None
-            
-            # Verify the password and check if user is active
-            if user and user.check_password(password) and user.is_active:
+            user = self.find_user(username)
+
+            # Verify the password (off-thread when a hash pool is configured;
+            # outdated hashes are upgraded) and check if user is active
+            if user and check_user_password(user, password) and user.is_active:
                 return user
-                
+
         except Exception as e:
             # Log the exception for debugging
-            import logging
-            logger = logging.getLogger(__name__)
             logger.error(f"Authentication error: {str(e)}")
             return None
-        
+
         return None
-    
+
+    def find_user(self, identifier):
+        """
+        Resolve a login identifier to a User in one query. A direct username
+        match wins over an email match, which wins over a profile match
+        (uni_id, email or phone).
+        """
+        return self.user_queryset(identifier).first()
+
+    def user_queryset(self, identifier):
+        """
+        The users matching `identifier`, best match first. Each identifier
+        column is looked up on its own index and the user ids UNIONed: OR-ing
+        the columns across the join made the database scan auth_user.
+        """
+        matches = User.objects.filter(username=identifier).values('id').union(
+            User.objects.filter(email=identifier).values('id'),
+            *[
+                StudentProfile.objects.filter(**{field: identifier}).values('user_id')
+                for field in ('uni_id', 'email', 'phone')
+            ]
+        )
+        return User.objects.select_related(
+            'student_profile__batch'
+        ).filter(
+            id__in=matches
+        ).order_by(
+            Case(
+                When(username=identifier, then=Value(0)),
+                When(email=identifier, then=Value(1)),
+                default=Value(2),
+                output_field=IntegerField()
+            ),
+            'id'
+        )
+
     def get_user(self, user_id):
         try:
             return User.objects.get(pk=user_id)
         except User.DoesNotExist:
-            return None
\ No newline at end of file
+            return None
+
+
+class ClaimsUser(TokenUser):
+    """
+    request.user for JWT-authenticated requests, built from the token's
+    claims (see CustomTokenObtainPairSerializer.get_token) without loading
+    the User row. Tokens issued before the claims existed fall back to
+    the defaults.
+    """
+
+    @cached_property
+    def uni_id(self):
+        return self.token.get('uni_id')
+
+    @cached_property
+    def role(self):
+        return self.token.get('role')
+
+    @cached_property
+    def is_verified(self):
+        return self.token.get('is_verified', False)
+
+
+class StatelessJWTAuthentication(JWTStatelessUserAuthentication):
+    """
+    JWT authentication without a database query: the signature and expiry
+    are checked, the jti is looked up in the in-memory revocation list
+    (config.revocation) and request.user is a ClaimsUser.
+
+    The trade-off: deactivating a user or changing their password doesn't
+    end their current access tokens early; logout (or a revocation) does.
+    """
+
+    def get_validated_token(self, raw_token):
+        validated_token = super().get_validated_token(raw_token)
+        if self.is_revoked(validated_token.get(api_settings.JTI_CLAIM)):
+            raise InvalidToken('Token has been revoked')
+        return validated_token
+
+    def is_revoked(self, jti):
+        return revoked_tokens.is_revoked(jti)
+
+
+class AsyncJWTAuthentication(StatelessJWTAuthentication):
+    """
+    StatelessJWTAuthentication for the native async views (apiv1.async_views).
+
+    Token parsing and validation are CPU only and reused as is; the periodic
+    revocation list sync (a query) runs through sync_to_async first, and
+    the check itself is only a lookup, so nothing blocks the event loop.
+    Raises the same exceptions as the DRF authentication class.
+    """
+
+    def is_revoked(self, jti):
+        # Synced by aauthenticate already
+        return revoked_tokens.is_listed(jti)
+
+    async def aauthenticate(self, request):
+        header = self.get_header(request)
+        if header is None:
+            return None
+
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+
+        if revoked_tokens.sync_due():
+            await sync_to_async(revoked_tokens.sync)()
+
+        validated_token = self.get_validated_token(raw_token)
+
+        return self.get_user(validated_token), validated_token
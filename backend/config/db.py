@@ -0,0 +1,17 @@
+"""
+Database connection hooks
+
+apply_sqlite_pragmas runs on every new SQLite connection and applies
+settings.SQLITE_PRAGMAS (WAL, synchronous=NORMAL, mmap_size,
+busy_timeout). Connected from Apiv1Config.ready().
+"""
+from django.conf import settings
+
+
+def apply_sqlite_pragmas(sender, connection, **kwargs):
+    if connection.vendor != 'sqlite' or not settings.SQLITE_PRAGMAS:
+        return
+    # Straight on the DB-API connection so the PRAGMAs don't show up in
+    # query logging / assertNumQueries
+    for name, value in settings.SQLITE_PRAGMAS.items():
+        connection.connection.execute(f'PRAGMA {name} = {value}')
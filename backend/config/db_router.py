@@ -0,0 +1,55 @@
+"""
+Read replica routing
+
+When DATABASES has a 'replica' alias (DB_REPLICA_HOST), ORM reads made
+inside a view wrapped with @replica_reads go to the replica. Everything
+else, including any write made by those views, stays on 'default', so
+replication lag only ever shows up in the public directory reads.
+"""
+from contextvars import ContextVar
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+
+_replica_reads = ContextVar('replica_reads', default=False)
+
+
+def replica_reads(view):
+    """Route the ORM reads of a (sync or async) view to the read replica"""
+    if iscoroutinefunction(view):
+        @wraps(view)
+        async def async_wrapper(*args, **kwargs):
+            token = _replica_reads.set(True)
+            try:
+                return await view(*args, **kwargs)
+            finally:
+                _replica_reads.reset(token)
+        return markcoroutinefunction(async_wrapper)
+
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        token = _replica_reads.set(True)
+        try:
+            return view(*args, **kwargs)
+        finally:
+            _replica_reads.reset(token)
+    return wrapper
+
+
+class ReadReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if _replica_reads.get() and 'replica' in settings.DATABASES:
+            return 'replica'
+        return None
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both aliases hold the same data
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == 'default'
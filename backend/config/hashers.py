@@ -0,0 +1,25 @@
+"""
+Password hashers with per-environment cost settings
+
+Same algorithm names as Django's built-in hashers, so existing hashes keep
+verifying. When the configured cost changes, Django flags the stored hash
+as outdated and it is re-hashed transparently on the next successful login.
+"""
+from django.conf import settings
+from django.contrib.auth import hashers
+
+
+class PBKDF2PasswordHasher(hashers.PBKDF2PasswordHasher):
+    iterations = settings.PASSWORD_PBKDF2_ITERATIONS
+
+
+class Argon2PasswordHasher(hashers.Argon2PasswordHasher):
+    """Requires argon2-cffi"""
+    time_cost = settings.PASSWORD_ARGON2_TIME_COST
+    memory_cost = settings.PASSWORD_ARGON2_MEMORY_COST
+    parallelism = settings.PASSWORD_ARGON2_PARALLELISM
+
+
+class BCryptSHA256PasswordHasher(hashers.BCryptSHA256PasswordHasher):
+    """Requires bcrypt"""
+    rounds = settings.PASSWORD_BCRYPT_ROUNDS
@@ -0,0 +1,97 @@
+"""
+Password hashing in process pools
+
+Bulk paths (`manage.py import_alumni`) hash many passwords at once:
+hash_pool() / make_passwords() spread them over every core, which is where
+hashing time is actually taken off the caller.
+
+A login or registration hashes one password and its request waits for the
+result either way. With PASSWORD_HASH_WORKERS > 0 that hash runs in a
+shared process pool rather than on the request thread, which still blocks
+until it's done; what the pool adds is a bound: at most
+PASSWORD_HASH_WORKERS hashes run at once per worker process (and
+PASSWORD_HASH_WORKERS * 4 are queued, callers beyond that wait for a slot),
+so a burst of logins can't take every core from the requests around it.
+With 0 workers (the default) hashing runs inline as before.
+"""
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth import hashers
+
+
+_executor = None
+_slots = None
+_lock = threading.Lock()
+
+
+def _init_worker():
+    # Spawned (non-forked) workers start without Django configured
+    import django
+    from django.apps import apps
+    if not apps.ready:
+        django.setup()
+
+
+def _run(func, *args):
+    global _executor, _slots
+    workers = settings.PASSWORD_HASH_WORKERS
+    if workers <= 0:
+        return func(*args)
+
+    if _executor is None:
+        with _lock:
+            if _executor is None:
+                _slots = threading.BoundedSemaphore(workers * 4)
+                _executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker)
+
+    # The caller still waits for the hash; only where it runs changes
+    with _slots:
+        return _executor.submit(func, *args).result()
+
+
+def make_password(password):
+    """Hash a raw password with the preferred hasher"""
+    return _run(hashers.make_password, password)
+
+
+def verify_password(password, encoded):
+    """Return (is_correct, must_update) for a raw password against a stored hash"""
+    return _run(hashers.verify_password, password, encoded)
+
+
+def check_user_password(user, password):
+    """
+    Like User.check_password, with the hashing offloaded. A correct password
+    stored with an outdated hasher or cost is re-hashed and saved.
+    """
+    if not user.has_usable_password():
+        return False
+
+    is_correct, must_update = verify_password(password, user.password)
+    if is_correct and must_update:
+        user.password = make_password(password)
+        user.save(update_fields=['password'])
+    return is_correct
+
+
+def hash_pool(workers):
+    """A dedicated process pool for bulk hashing (e.g. imports), used as a context manager"""
+    return ProcessPoolExecutor(max_workers=workers, initializer=_init_worker)
+
+
+def make_passwords(passwords, pool=None):
+    """Hash many raw passwords, in `pool` if given. Empty passwords become unusable ones."""
+    passwords = [password or None for password in passwords]
+    if pool is None:
+        return [hashers.make_password(password) for password in passwords]
+    return list(pool.map(hashers.make_password, passwords, chunksize=16))
+
+
+def shutdown():
+    global _executor
+    with _lock:
+        if _executor is not None:
+            _executor.shutdown()
+            _executor = None
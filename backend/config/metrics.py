@@ -0,0 +1,190 @@
+"""
+Per-request query and timing metrics
+
+Collected by config.middleware.QueryInstrumentationMiddleware while
+REQUEST_METRICS_ENABLED is on:
+
+- every SQL statement goes through record_query(), an execute wrapper
+  installed on each database connection, and is counted against the
+  request in the `_current` context variable (context variables follow
+  the request into sync_to_async threads, so async views are covered too)
+- timed('serialize') blocks and response rendering add their durations
+
+Finished requests are folded into a per-route, per-minute histogram that
+is flushed to REQUEST_METRICS_DIR/metrics-<pid>.json; `manage.py
+dump_request_metrics` merges the files of all worker processes.
+"""
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from time import perf_counter
+
+from django.conf import settings
+
+
+# Request latency histogram bucket upper bounds, in milliseconds
+LATENCY_BUCKETS = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000, float('inf')]
+
+_current = ContextVar('request_metrics', default=None)
+
+
+class RequestMetrics:
+    """Counters for one request"""
+
+    __slots__ = ('started', 'queries', 'sql_time', 'slowest', 'slowest_time', 'timings', '_depth')
+
+    def __init__(self):
+        self.started = perf_counter()
+        self.queries = 0
+        self.sql_time = 0.0
+        self.slowest = None
+        self.slowest_time = 0.0
+        self.timings = {}
+        self._depth = {}
+
+    def add_query(self, sql, duration):
+        self.queries += 1
+        self.sql_time += duration
+        if duration >= self.slowest_time:
+            self.slowest, self.slowest_time = sql, duration
+
+    def add_timing(self, name, duration):
+        self.timings[name] = self.timings.get(name, 0.0) + duration
+
+
+def current():
+    """Metrics of the request being handled, None outside instrumented requests"""
+    return _current.get()
+
+
+def record_query(execute, sql, params, many, context):
+    """Execute wrapper: time the statement against the current request"""
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    started = perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.add_query(sql, perf_counter() - started)
+
+
+def install_recorder(connection, **kwargs):
+    """Add record_query to a connection once (also a connection_created receiver)"""
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+@contextmanager
+def timed(name):
+    """
+    Add the time spent in the block to the current request's `name` timing.
+    Nested blocks with the same name only count once; free outside requests.
+    """
+    metrics = _current.get()
+    if metrics is None or metrics._depth.get(name):
+        yield
+        return
+    metrics._depth[name] = 1
+    started = perf_counter()
+    try:
+        yield
+    finally:
+        metrics._depth[name] = 0
+        metrics.add_timing(name, perf_counter() - started)
+
+
+class TimedSerializerMixin:
+    """Counts a DRF serializer's to_representation() as 'serialize' time"""
+
+    def to_representation(self, instance):
+        with timed('serialize'):
+            return super().to_representation(instance)
+
+
+# ---------------------------------------------------------------------------
+# Per-route histograms
+# ---------------------------------------------------------------------------
+
+class RouteHistograms:
+    """
+    Rolling per-route stats for this process, bucketed by minute and kept
+    for REQUEST_METRICS_RETENTION minutes.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.routes = {}
+        self.last_flush = time.monotonic()
+
+    def add(self, route, duration_ms, queries, sql_ms):
+        minute = str(int(time.time() // 60 * 60))
+        with self.lock:
+            stats = self.routes.setdefault(route, {}).get(minute)
+            if stats is None:
+                stats = self.routes[route][minute] = new_stats()
+            stats['count'] += 1
+            stats['total_ms'] += duration_ms
+            stats['sql_ms'] += sql_ms
+            stats['queries'] += queries
+            stats['max_queries'] = max(stats['max_queries'], queries)
+            stats['max_ms'] = max(stats['max_ms'], duration_ms)
+            stats['buckets'][bisect_left(LATENCY_BUCKETS, duration_ms)] += 1
+
+        if time.monotonic() - self.last_flush >= settings.REQUEST_METRICS_FLUSH_INTERVAL:
+            self.flush()
+
+    def flush(self):
+        """Write this process's histograms to REQUEST_METRICS_DIR, dropping expired minutes"""
+        cutoff = time.time() - settings.REQUEST_METRICS_RETENTION * 60
+        with self.lock:
+            self.last_flush = time.monotonic()
+            for route in list(self.routes):
+                minutes = self.routes[route]
+                for minute in [minute for minute in minutes if int(minute) < cutoff]:
+                    del minutes[minute]
+                if not minutes:
+                    del self.routes[route]
+            data = json.dumps({'pid': os.getpid(), 'routes': self.routes})
+
+        os.makedirs(settings.REQUEST_METRICS_DIR, exist_ok=True)
+        path = os.path.join(settings.REQUEST_METRICS_DIR, f'metrics-{os.getpid()}.json')
+        with open(f'{path}.tmp', 'w') as handle:
+            handle.write(data)
+        os.replace(f'{path}.tmp', path)
+
+
+def new_stats():
+    return {
+        'count': 0, 'total_ms': 0.0, 'sql_ms': 0.0, 'queries': 0,
+        'max_queries': 0, 'max_ms': 0.0, 'buckets': [0] * len(LATENCY_BUCKETS),
+    }
+
+
+def merge_stats(into, stats):
+    into['count'] += stats['count']
+    into['total_ms'] += stats['total_ms']
+    into['sql_ms'] += stats['sql_ms']
+    into['queries'] += stats['queries']
+    into['max_queries'] = max(into['max_queries'], stats['max_queries'])
+    into['max_ms'] = max(into['max_ms'], stats['max_ms'])
+    into['buckets'] = [a + b for a, b in zip(into['buckets'], stats['buckets'])]
+    return into
+
+
+def percentile(stats, fraction):
+    """Upper bound of the bucket holding the `fraction` quantile, in ms"""
+    target = stats['count'] * fraction
+    seen = 0
+    for bound, count in zip(LATENCY_BUCKETS, stats['buckets']):
+        seen += count
+        if count and seen >= target:
+            return min(bound, stats['max_ms'])
+    return stats['max_ms']
+
+
+histograms = RouteHistograms()
@@ -0,0 +1,151 @@
+import json
+import logging
+from time import perf_counter
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+from . import metrics, throttling
+
+
+logger = logging.getLogger('config.metrics')
+
+
+class QueryInstrumentationMiddleware:
+    """
+    Per-request SQL count / timing instrumentation (config.metrics)
+
+    For every request records the number of queries, total SQL time, the
+    slowest statement, serializer and render time and the response size.
+    They are sent back as a Server-Timing header, logged as one JSON line
+    on the `config.metrics` logger and added to the per-route histograms
+    (`manage.py dump_request_metrics`).
+
+    Off unless REQUEST_METRICS_ENABLED; then Django drops the middleware
+    at startup (MiddlewareNotUsed) and no wrapper is installed at all.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.REQUEST_METRICS_ENABLED:
+            raise MiddlewareNotUsed
+
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+        # Connections opened from now on (any thread) record their queries
+        connection_created.connect(metrics.install_recorder, dispatch_uid='request_metrics')
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+
+        # Connections opened before the middleware was loaded
+        for connection in connections.all(initialized_only=True):
+            metrics.install_recorder(connection)
+
+        request_metrics = request._metrics = metrics.RequestMetrics()
+        token = metrics._current.set(request_metrics)
+        try:
+            response = self.get_response(request)
+        finally:
+            metrics._current.reset(token)
+        self.finish(request, response, request_metrics)
+        return response
+
+    async def __acall__(self, request):
+        request_metrics = request._metrics = metrics.RequestMetrics()
+        token = metrics._current.set(request_metrics)
+        try:
+            response = await self.get_response(request)
+        finally:
+            metrics._current.reset(token)
+        self.finish(request, response, request_metrics)
+        return response
+
+    def process_template_response(self, request, response):
+        # DRF responses are rendered after the view returns; time the rendering
+        started = perf_counter()
+        response.add_post_render_callback(
+            lambda rendered: request._metrics.add_timing('render', perf_counter() - started)
+        )
+        return response
+
+    def finish(self, request, response, request_metrics):
+        duration_ms = (perf_counter() - request_metrics.started) * 1000
+        sql_ms = request_metrics.sql_time * 1000
+        serialize_ms = request_metrics.timings.get('serialize', 0.0) * 1000
+        render_ms = request_metrics.timings.get('render', 0.0) * 1000
+        size = None if response.streaming else len(response.content)
+
+        match = request.resolver_match
+        route = f'{request.method} {match.view_name if match else "<unresolved>"}'
+
+        response['Server-Timing'] = ', '.join([
+            f'db;dur={sql_ms:.2f};desc="{request_metrics.queries} queries"',
+            f'serialize;dur={serialize_ms:.2f}',
+            f'render;dur={render_ms:.2f}',
+            f'total;dur={duration_ms:.2f}',
+        ])
+
+        logger.info(json.dumps({
+            'route': route,
+            'path': request.path,
+            'status': response.status_code,
+            'duration_ms': round(duration_ms, 2),
+            'queries': request_metrics.queries,
+            'sql_ms': round(sql_ms, 2),
+            'slowest_sql': (request_metrics.slowest or '')[:300],
+            'slowest_sql_ms': round(request_metrics.slowest_time * 1000, 2),
+            'serialize_ms': round(serialize_ms, 2),
+            'render_ms': round(render_ms, 2),
+            'response_bytes': size,
+        }))
+
+        metrics.histograms.add(route, duration_ms, request_metrics.queries, sql_ms)
+
+
+class ThrottleMiddleware:
+    """
+    Rejects requests over the config.throttling limits with 429 before the
+    view (and with it authentication, queries and password hashing) runs.
+    Only the URL names in throttling.RULES are checked.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+            # Otherwise Django runs the sync process_view in a thread
+            self.process_view = self.aprocess_view
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        return await self.get_response(request)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        url_name = request.resolver_match.url_name
+        if url_name not in throttling.RULES or not settings.THROTTLE_ENABLED:
+            return None
+        return throttling.check(request, url_name)
+
+    async def aprocess_view(self, request, view_func, view_args, view_kwargs):
+        # The local buckets are plain dict operations; the shared cache (if
+        # THROTTLE_CACHE_ALIAS is set) is awaited, not called on the event loop
+        url_name = request.resolver_match.url_name
+        if url_name not in throttling.RULES or not settings.THROTTLE_ENABLED:
+            return None
+        return await throttling.acheck(request, url_name)
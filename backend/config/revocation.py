@@ -0,0 +1,96 @@
+"""
+Revoked JWTs, checked in memory
+
+Logout revokes the presented access token (and refresh token, if sent) by
+its jti. Revocations are stored in apiv1.RevokedToken and mirrored in a
+per-process jti -> expiry map, so checking a token is a dict lookup.
+
+- The map is loaded at worker start (config.warmup) or on first use.
+- Revocations made by other processes are picked up at most every
+  JWT_REVOCATION_SYNC seconds by re-reading the table's unexpired rows.
+  Not "rows newer than the last id seen": ids are handed out at INSERT,
+  so a row committed after a higher one would be skipped for good. The
+  table stays small, as rows are deleted once their token expired.
+- Entries are evicted once the token has expired anyway (signature
+  validation rejects it from then on).
+"""
+import threading
+import time
+from datetime import datetime, timezone
+
+from django.conf import settings
+from rest_framework_simplejwt.settings import api_settings
+
+from apiv1.models import RevokedToken
+
+
+class RevocationList:
+    """jti -> expiry (epoch seconds) of revoked tokens; reads take no lock"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._revoked = {}
+        self._synced = None
+
+    def __len__(self):
+        return len(self._revoked)
+
+    def is_revoked(self, jti):
+        if self.sync_due():
+            self.sync(wait=self._synced is None)
+        return self.is_listed(jti)
+
+    def is_listed(self, jti):
+        """is_revoked() without the sync, for callers that synced already (no query)"""
+        expires = self._revoked.get(jti)
+        return expires is not None and expires > time.time()
+
+    def sync_due(self):
+        return self._synced is None or time.monotonic() - self._synced >= settings.JWT_REVOCATION_SYNC
+
+    def sync(self, wait=True):
+        """
+        Add the stored revocations and evict expired ones.
+        With wait=False a sync already running in another thread is enough.
+        """
+        if not self._lock.acquire(blocking=wait):
+            return
+        try:
+            now = time.time()
+            rows = RevokedToken.objects.filter(
+                expires_at__gt=datetime.fromtimestamp(now, timezone.utc)
+            ).values_list('jti', 'expires_at')
+
+            # Kept: this process's own revocations, committed or not yet
+            revoked = {jti: expires for jti, expires in self._revoked.items() if expires > now}
+            for jti, expires_at in rows:
+                revoked[jti] = expires_at.timestamp()
+            # Swapped in whole, so readers never see a half-updated map
+            self._revoked = revoked
+            self._synced = time.monotonic()
+        finally:
+            self._lock.release()
+
+    def revoke(self, token):
+        """Revoke a validated simplejwt token until it expires"""
+        jti = token[api_settings.JTI_CLAIM]
+        expires = token['exp']
+        expires_at = datetime.fromtimestamp(expires, timezone.utc)
+
+        RevokedToken.objects.bulk_create(
+            [RevokedToken(jti=jti, token_type=token.get(api_settings.TOKEN_TYPE_CLAIM, ''), expires_at=expires_at)],
+            ignore_conflicts=True
+        )
+        # Logouts are rare; a good moment to drop rows nobody needs any more
+        RevokedToken.objects.filter(expires_at__lte=datetime.now(timezone.utc)).delete()
+
+        with self._lock:
+            self._revoked = {**self._revoked, jti: expires}
+
+    def clear(self):
+        with self._lock:
+            self._revoked = {}
+            self._synced = None
+
+
+revoked_tokens = RevocationList()
@@ -1,23 +1,41 @@
-from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from django.core.exceptions import ObjectDoesNotExist
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
 from rest_framework import serializers
-from student.models import StudentProfile
+
+from .revocation import revoked_tokens
 
 
 class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
     username_field = 'username'  # This can be uni_id, email, or phone
-    
+
     role = serializers.SerializerMethodField()
 
+    @classmethod
+    def get_token(cls, user):
+        """
+        Carry what request handling needs in the token, so authenticated
+        requests don't load the user (config.authentication.ClaimsUser).
+        Access tokens copy these claims from the refresh token.
+        """
+        token = super().get_token(user)
+        serializer = cls()
+        profile = serializer.get_profile(user)
+        token['username'] = user.username
+        token['is_staff'] = user.is_staff
+        token['is_superuser'] = user.is_superuser
+        token['uni_id'] = profile.uni_id if profile else None
+        token['role'] = serializer.get_role(user)
+        token['is_verified'] = profile.is_verified if profile else False
+        return token
+
     def validate(self, attrs):
         # The custom authentication backend will handle the multi-field lookup
+        # and has already loaded the student profile alongside the user
         data = super().validate(attrs)
 
-        # Get student profile if exists
-        student_profile = None
-        try:
-            student_profile = StudentProfile.objects.get(uni_id=self.user.username)
-        except StudentProfile.DoesNotExist:
-            pass
+        student_profile = self.get_profile(self.user)
 
         data['user'] = {
             'id': self.user.id,
@@ -27,16 +45,22 @@ class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
             'student_profile': self.get_student_profile(student_profile) if student_profile else None,
         }
         return data
-    
-    def get_role(self, obj):
+
+    def get_profile(self, obj):
+        """The user's StudentProfile, or None for users without one (e.g. admins)"""
         try:
-            student_profile = StudentProfile.objects.get(uni_id=obj.username)
-            if student_profile.is_cr:
-                return 'CR'
-            return 'Student'
-        except StudentProfile.DoesNotExist:
+            return obj.student_profile
+        except ObjectDoesNotExist:
             return None
-    
+
+    def get_role(self, obj):
+        student_profile = self.get_profile(obj)
+        if student_profile is None:
+            return None
+        if student_profile.is_cr:
+            return 'CR'
+        return 'Student'
+
     def get_student_profile(self, profile):
         if not profile:
             return None
@@ -47,4 +71,14 @@ class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
             'batch': str(profile.batch),
             'is_verified': profile.is_verified,
             'is_cr': profile.is_cr,
-        }
\ No newline at end of file
+        }
+
+
+class RevocableTokenRefreshSerializer(TokenRefreshSerializer):
+    """TokenRefreshSerializer that also refuses refresh tokens revoked at logout"""
+
+    def validate(self, attrs):
+        refresh = self.token_class(attrs['refresh'])
+        if revoked_tokens.is_revoked(refresh.get(api_settings.JTI_CLAIM)):
+            raise InvalidToken('Token has been revoked')
+        return super().validate(attrs)
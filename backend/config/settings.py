@@ -35,6 +35,10 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # First, so its numbers cover every other middleware (off by default)
+    'config.middleware.QueryInstrumentationMiddleware',
+    # Rate limits for login / register / search (config.throttling)
+    'config.middleware.ThrottleMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -71,13 +75,148 @@ CSRF_TRUSTED_ORIGINS = ['http://localhost', 'http://127.0.0.1', 'http://127.0.0.
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
-DATABASES = {
+# DB_ENGINE: 'sqlite' (default, single node) or 'postgres' (psycopg 3).
+# Connections are kept open for DB_CONN_MAX_AGE seconds and health checked
+# before reuse. With DB_POOL=True PostgreSQL uses psycopg's connection pool
+# instead (needs psycopg[pool]; Django requires CONN_MAX_AGE = 0 with it).
+DB_ENGINE = config('DB_ENGINE', default='sqlite')
+DB_CONN_MAX_AGE = config('DB_CONN_MAX_AGE', default=60, cast=int)
+DB_POOL = config('DB_POOL', default=False, cast=bool)
+
+if DB_ENGINE == 'postgres':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': config('DB_NAME', default='bup_alumni'),
+            'USER': config('DB_USER', default='postgres'),
+            'PASSWORD': config('DB_PASSWORD', default=''),
+            'HOST': config('DB_HOST', default='localhost'),
+            'PORT': config('DB_PORT', default='5432'),
+            'CONN_MAX_AGE': 0 if DB_POOL else DB_CONN_MAX_AGE,
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {
+                'pool': {
+                    'min_size': config('DB_POOL_MIN_SIZE', default=2, cast=int),
+                    'max_size': config('DB_POOL_MAX_SIZE', default=10, cast=int),
+                    'timeout': config('DB_POOL_TIMEOUT', default=10, cast=int),
+                },
+            } if DB_POOL else {},
+        }
+    }
+
+    # Optional read replica for the public (AllowAny) GET views, see config.db_router
+    DB_REPLICA_HOST = config('DB_REPLICA_HOST', default='')
+    if DB_REPLICA_HOST:
+        DATABASES['replica'] = {
+            **DATABASES['default'],
+            'HOST': DB_REPLICA_HOST,
+            'PORT': config('DB_REPLICA_PORT', default=DATABASES['default']['PORT']),
+            'TEST': {'MIRROR': 'default'},
+        }
+        DATABASE_ROUTERS = ['config.db_router.ReadReplicaRouter']
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': config('SQLITE_PATH', default=BASE_DIR / 'db.sqlite3'),
+            'CONN_MAX_AGE': DB_CONN_MAX_AGE,
+            'CONN_HEALTH_CHECKS': True,
+        }
+    }
+
+# PRAGMAs applied to every new SQLite connection (config.db). WAL lets reads
+# run alongside the single writer; busy_timeout makes writers wait for the
+# lock instead of failing with "database is locked".
+SQLITE_TUNED = config('SQLITE_TUNED', default=True, cast=bool)
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'mmap_size': config('SQLITE_MMAP_SIZE', default=256 * 1024 * 1024, cast=int),
+    'busy_timeout': config('SQLITE_BUSY_TIMEOUT', default=5000, cast=int),
+} if SQLITE_TUNED else {}
+
+
+# Cache
+# CACHE_BACKEND: 'locmem' (per process), 'file' or 'redis' (shared between workers)
+CACHE_BACKEND = config('CACHE_BACKEND', default='locmem')
+_CACHE_BACKENDS = {
+    'locmem': 'django.core.cache.backends.locmem.LocMemCache',
+    'file': 'django.core.cache.backends.filebased.FileBasedCache',
+    'redis': 'django.core.cache.backends.redis.RedisCache',
+}
+_CACHE_LOCATIONS = {
+    'locmem': 'bup-alumni',
+    'file': os.path.join(BASE_DIR, 'cache'),
+    'redis': 'redis://127.0.0.1:6379/1',
+}
+
+CACHES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'BACKEND': _CACHE_BACKENDS[CACHE_BACKEND],
+        'LOCATION': config('CACHE_LOCATION', default=_CACHE_LOCATIONS[CACHE_BACKEND]),
     }
 }
 
+# Anonymous GET /profile/, /profile/{pk} and /search responses (apiv1.cache)
+DIRECTORY_CACHE_ENABLED = config('DIRECTORY_CACHE_ENABLED', default=True, cast=bool)
+DIRECTORY_CACHE_ALIAS = 'default'
+DIRECTORY_CACHE_TIMEOUT = config('DIRECTORY_CACHE_TIMEOUT', default=300, cast=int)
+DIRECTORY_CACHE_MAX_AGE = config('DIRECTORY_CACHE_MAX_AGE', default=0, cast=int)
+
+# Seconds a process trusts its in-memory Batch title map (student.batches)
+BATCH_CACHE_TTL = config('BATCH_CACHE_TTL', default=300, cast=int)
+# Seconds other processes' country / company aliases take to show up (student.dimensions)
+DIMENSION_CACHE_TTL = config('DIMENSION_CACHE_TTL', default=300, cast=int)
+
+
+# Worker start-up (config.warmup): prime URL, auth, serializer and in-memory
+# caches before taking traffic, then gc.freeze() what was built so workers
+# forked from it (gunicorn --preload) keep sharing those pages
+WARMUP_ENABLED = config('WARMUP_ENABLED', default=True, cast=bool)
+WARMUP_GC_FREEZE = config('WARMUP_GC_FREEZE', default=True, cast=bool)
+
+# Per-request SQL count / timing instrumentation (config.middleware)
+# Adds Server-Timing headers and JSON log lines on the `config.metrics`
+# logger; per-route histograms are flushed to REQUEST_METRICS_DIR every
+# REQUEST_METRICS_FLUSH_INTERVAL seconds (manage.py dump_request_metrics)
+REQUEST_METRICS_ENABLED = config('REQUEST_METRICS_ENABLED', default=False, cast=bool)
+REQUEST_METRICS_DIR = config('REQUEST_METRICS_DIR', default=os.path.join(BASE_DIR, 'metrics'))
+REQUEST_METRICS_FLUSH_INTERVAL = config('REQUEST_METRICS_FLUSH_INTERVAL', default=10, cast=int)
+REQUEST_METRICS_RETENTION = config('REQUEST_METRICS_RETENTION', default=60, cast=int)  # minutes
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'config.metrics': {
+            'handlers': ['console'],
+            'level': config('REQUEST_METRICS_LOG_LEVEL', default='INFO'),
+            'propagate': False,
+        },
+        # Failed logins, with client IP and user agent
+        'config.views': {
+            'handlers': ['console'],
+            'level': config('THROTTLE_LOG_LEVEL', default='INFO'),
+            'propagate': False,
+        },
+        # Import / warm-up time and first response duration of each process
+        'config.warmup': {
+            'handlers': ['console'],
+            'level': config('WARMUP_LOG_LEVEL', default='INFO'),
+            'propagate': False,
+        },
+        # Background task retries and failures
+        'config.tasks': {
+            'handlers': ['console'],
+            'level': config('TASK_LOG_LEVEL', default='WARNING'),
+            'propagate': False,
+        },
+    },
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -97,7 +236,29 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# Password hashing: 'pbkdf2' (default), 'argon2' (needs argon2-cffi) or
+# 'bcrypt' (needs bcrypt). The other hashers stay listed so existing hashes
+# still verify and get upgraded on the next login.
+PASSWORD_HASHER = config('PASSWORD_HASHER', default='pbkdf2')
+PASSWORD_PBKDF2_ITERATIONS = config('PASSWORD_PBKDF2_ITERATIONS', default=1_000_000, cast=int)
+PASSWORD_ARGON2_TIME_COST = config('PASSWORD_ARGON2_TIME_COST', default=2, cast=int)
+PASSWORD_ARGON2_MEMORY_COST = config('PASSWORD_ARGON2_MEMORY_COST', default=102400, cast=int)
+PASSWORD_ARGON2_PARALLELISM = config('PASSWORD_ARGON2_PARALLELISM', default=8, cast=int)
+PASSWORD_BCRYPT_ROUNDS = config('PASSWORD_BCRYPT_ROUNDS', default=12, cast=int)
+
+_PASSWORD_HASHERS = {
+    'pbkdf2': 'config.hashers.PBKDF2PasswordHasher',
+    'argon2': 'config.hashers.Argon2PasswordHasher',
+    'bcrypt': 'config.hashers.BCryptSHA256PasswordHasher',
+}
+PASSWORD_HASHERS = [_PASSWORD_HASHERS[PASSWORD_HASHER]] + [
+    hasher for name, hasher in _PASSWORD_HASHERS.items() if name != PASSWORD_HASHER
+]
 
+# Run login / registration hashes in a pool of this many processes (0 =
+# inline). The request still waits for its hash; the pool bounds how many
+# run at once per worker process (config.hashing)
+PASSWORD_HASH_WORKERS = config('PASSWORD_HASH_WORKERS', default=0, cast=int)
 
 
 
@@ -118,6 +279,16 @@ STATIC_URL = '/static/'
 MEDIA_URL = '/media/'
 
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+
+# Uploaded profile pictures (student.pictures): square WebP variants, in px;
+# list / search / detail responses link the PROFILE_PIC_LIST_SIZE one
+PROFILE_PIC_SIZES = (96, 320)
+PROFILE_PIC_LIST_SIZE = 96
+PROFILE_PIC_QUALITY = config('PROFILE_PIC_QUALITY', default=80, cast=int)
+PROFILE_PIC_MAX_BYTES = config('PROFILE_PIC_MAX_BYTES', default=10 * 1024 * 1024, cast=int)
+# Rejects decompression bombs before they're decoded
+PROFILE_PIC_MAX_PIXELS = config('PROFILE_PIC_MAX_PIXELS', default=40_000_000, cast=int)
+PROFILE_PIC_WORKERS = config('PROFILE_PIC_WORKERS', default=4, cast=int)
 STATIC_ROOT = os.path.join(BASE_DIR, 'static')
 
 
@@ -134,23 +305,85 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        # Claims-only users, no per-request User query (see the class)
+        'config.authentication.StatelessJWTAuthentication',
 
     ),
 }
 
+# Rate limits (config.throttling), 'N/period' with period s, m, h or d; N is
+# also the burst size
+THROTTLE_ENABLED = config('THROTTLE_ENABLED', default=True, cast=bool)
+THROTTLE_RATES = {
+    # Login attempts per client IP
+    'login': config('THROTTLE_LOGIN_RATE', default='20/m'),
+    # Failed logins per username / email / phone, from any IP
+    'login-failures': config('THROTTLE_LOGIN_FAILURE_RATE', default='10/h'),
+    # Registrations per client IP; a campus or dorm NAT puts a whole batch
+    # behind one address, so this allows a batch signing up in an hour
+    'register': config('THROTTLE_REGISTER_RATE', default='200/h'),
+    'search': config('THROTTLE_SEARCH_RATE', default='120/m'),
+}
+# Reverse proxies in front of the app that append to X-Forwarded-For
+# (0: use REMOTE_ADDR, the header is client controlled)
+THROTTLE_PROXY_COUNT = config('THROTTLE_PROXY_COUNT', default=0, cast=int)
+# Cache alias counting requests across worker processes ('' = per process only)
+THROTTLE_CACHE_ALIAS = config('THROTTLE_CACHE_ALIAS', default='')
+
+# Cursor pagination for the profile directory (GET /api/v1/profile/?page_size=..)
+PROFILE_PAGE_SIZE = config('PROFILE_PAGE_SIZE', default=50, cast=int)
+PROFILE_MAX_PAGE_SIZE = config('PROFILE_MAX_PAGE_SIZE', default=200, cast=int)
+
+# Incremental sync (GET /api/v1/sync, student.sync): rows per stream and
+# page, seconds a write may take to commit, days deletions are remembered
+SYNC_PAGE_SIZE = config('SYNC_PAGE_SIZE', default=500, cast=int)
+SYNC_MAX_PAGE_SIZE = config('SYNC_MAX_PAGE_SIZE', default=2000, cast=int)
+SYNC_SETTLE = config('SYNC_SETTLE', default=5, cast=int)
+SYNC_TOMBSTONE_DAYS = config('SYNC_TOMBSTONE_DAYS', default=90, cast=int)
+
+# Background tasks (config.tasks): 'thread' (drained inside each web
+# process), 'worker' (only `manage.py run_tasks`) or 'sync' (run inline)
+TASKS_MODE = config('TASKS_MODE', default='thread')
+# Threads running tasks per process, seconds between queue polls, seconds a
+# claimed task is leased for, first retry delay (doubling) and attempts
+TASK_WORKERS = config('TASK_WORKERS', default=2, cast=int)
+TASK_POLL = config('TASK_POLL', default=5, cast=float)
+TASK_LEASE = config('TASK_LEASE', default=300, cast=int)
+TASK_RETRY_DELAY = config('TASK_RETRY_DELAY', default=10, cast=int)
+TASK_MAX_ATTEMPTS = config('TASK_MAX_ATTEMPTS', default=5, cast=int)
+
+# Rows fetched per round trip by GET /profile/export/ and manage.py export_alumni
+EXPORT_CHUNK_SIZE = config('EXPORT_CHUNK_SIZE', default=2000, cast=int)
+
+# Search backend for /api/v1/search: 'fulltext' (FTS5 / tsvector index) or 'orm' (LIKE scan)
+STUDENT_SEARCH_BACKEND = config('STUDENT_SEARCH_BACKEND', default='fulltext')
+# How many index hits get ranked with the relevance tiers; terms matching more
+# profiles than this use the LIKE scan, so the ranking stays exact
+STUDENT_SEARCH_CANDIDATES = config('STUDENT_SEARCH_CANDIDATES', default=500, cast=int)
+# Answer name/uni_id/email/phone lookups from an in-process prefix/trigram index
+STUDENT_SEARCH_INMEMORY = config('STUDENT_SEARCH_INMEMORY', default=False, cast=bool)
+# Seconds between checks for profiles changed by other processes (student.search_index)
+STUDENT_SEARCH_INMEMORY_SYNC = config('STUDENT_SEARCH_INMEMORY_SYNC', default=5, cast=int)
+
 # JWT Configuration
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(hours=24),
     'REFRESH_TOKEN_LIFETIME': timedelta(days=100),
     'ROTATE_REFRESH_TOKENS': False,
     'BLACKLIST_AFTER_ROTATION': True,
+    'TOKEN_USER_CLASS': 'config.authentication.ClaimsUser',
+    'TOKEN_REFRESH_SERIALIZER': 'config.serializers.RevocableTokenRefreshSerializer',
 }
 
+# Seconds between checks for tokens revoked by other processes (config.revocation)
+JWT_REVOCATION_SYNC = config('JWT_REVOCATION_SYNC', default=10, cast=int)
+
 
 
 # Authentication Backends (MUST be at root level)
+# MultiFieldAuthBackend already covers username logins and ModelBackend's
+# permission checks; a ModelBackend fallback would only repeat the lookup
+# (and the password hash) on every failed login.
 AUTHENTICATION_BACKENDS = [
     'config.authentication.MultiFieldAuthBackend',
-    'django.contrib.auth.backends.ModelBackend',
 ]
\ No newline at end of file
@@ -0,0 +1,195 @@
+"""
+Background tasks, queued in the database
+
+Side effects that don't have to be done before the response (search index
+and facet maintenance, notifications) are queued with enqueue() and run
+later, so a request only pays for its own transaction plus one INSERT.
+
+- Tasks are apiv1.Task rows, inserted in the caller's transaction: they
+  exist exactly when the change that queued them was committed, and
+  nothing is lost when a process dies.
+- A task with a `dedupe_key` is dropped while another pending task has the
+  same key (e.g. three edits of a profile reindex it once).
+- Each task runs in a transaction together with deleting its row, so its
+  database writes happen exactly once. A failed task is retried after
+  TASK_RETRY_DELAY * 2 ** (attempts - 1) seconds, and kept with status
+  'failed' after `max_attempts`.
+- A running task holds a lease of TASK_LEASE seconds; tasks of a crashed
+  worker are picked up again once it runs out. Every claim counts an
+  attempt, and a worker only runs, retries or fails the task while
+  `attempts` is still the one it claimed: a worker whose lease was taken
+  over skips the task instead of running it a second time.
+- Handlers that change what cached directory responses show bump the
+  response cache generation with transaction.on_commit, so readers see
+  the change once the task's transaction commits.
+
+TASKS_MODE decides who runs them:
+
+- 'thread': a daemon thread in each web process, started with its first
+  request (config.warmup) and woken when a transaction that queued tasks
+  commits and every TASK_POLL seconds (retries, tasks left by other
+  processes); TASK_WORKERS threads run them
+- 'worker': only `manage.py run_tasks` processes
+- 'sync': inline in enqueue(), no row (tests, local development)
+
+Handlers are registered with @handler('app.name') in the app's tasks
+module and get the JSON payload as keyword arguments.
+"""
+import logging
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from apiv1.models import Task
+
+
+logger = logging.getLogger(__name__)
+
+HANDLERS = {}
+
+
+def handler(name):
+    """Register a task handler under `name`"""
+    def register(func):
+        HANDLERS[name] = func
+        return func
+    return register
+
+
+def enqueue(name, dedupe_key=None, delay=0, max_attempts=None, **payload):
+    """
+    Queue handler `name` with the JSON-serializable `payload`, to run once
+    the current transaction commits (right away outside of one)
+    """
+    if name not in HANDLERS:
+        raise KeyError(f'No task handler named {name!r}')
+    if settings.TASKS_MODE == 'sync':
+        HANDLERS[name](**payload)
+        return
+
+    Task.objects.bulk_create([Task(
+        name=name, payload=payload, dedupe_key=dedupe_key,
+        run_after=timezone.now() + timedelta(seconds=delay),
+        max_attempts=max_attempts or settings.TASK_MAX_ATTEMPTS,
+    )], ignore_conflicts=dedupe_key is not None)
+
+    if settings.TASKS_MODE == 'thread' and not delay:
+        transaction.on_commit(drainer.wake)
+
+
+def _due(now):
+    return Q(status=Task.PENDING, run_after__lte=now) | Q(status=Task.RUNNING, locked_until__lt=now)
+
+
+def claim(limit):
+    """Lease up to `limit` due tasks to this process; returns them"""
+    now = timezone.now()
+    candidates = list(Task.objects.filter(_due(now)).order_by('run_after', 'id').values_list('id', flat=True)[:limit])
+    claimed = []
+    for task_id in candidates:
+        # Compare-and-set: another worker may have taken it meanwhile
+        if Task.objects.filter(_due(now), id=task_id).update(
+            status=Task.RUNNING, attempts=F('attempts') + 1,
+            locked_until=now + timedelta(seconds=settings.TASK_LEASE)
+        ):
+            claimed.append(task_id)
+    return list(Task.objects.filter(id__in=claimed).order_by('run_after', 'id'))
+
+
+def run(task):
+    """Run a claimed task; True when it succeeded"""
+    try:
+        with transaction.atomic():
+            # Deleted first: a transaction that starts with a write waits for
+            # SQLite's write lock (busy_timeout) rather than failing with
+            # "database is locked" when its read snapshot went stale. The
+            # row lock it takes also keeps other workers from claiming it
+            deleted, _ = Task.objects.filter(id=task.id, attempts=task.attempts).delete()
+            if not deleted:
+                # Our lease ran out and another worker claimed (or ran) it
+                logger.warning('Task %s %s was taken over by another worker, skipped', task.id, task.name)
+                return False
+            HANDLERS[task.name](**task.payload)
+        return True
+    except Exception:
+        error = traceback.format_exc()
+
+    # Only while the task is still ours (see the module docstring)
+    ours = Task.objects.filter(id=task.id, attempts=task.attempts)
+
+    if task.attempts >= task.max_attempts:
+        logger.error('Task %s %s failed for good after %d attempts:\n%s', task.id, task.name, task.attempts, error)
+        ours.update(status=Task.FAILED, locked_until=None, last_error=error)
+    else:
+        retry = settings.TASK_RETRY_DELAY * 2 ** (task.attempts - 1)
+        logger.warning('Task %s %s failed (attempt %d), retrying in %ss', task.id, task.name, task.attempts, retry)
+        try:
+            ours.update(
+                status=Task.PENDING, locked_until=None, last_error=error,
+                run_after=timezone.now() + timedelta(seconds=retry)
+            )
+        except IntegrityError:
+            # Queued again with the same dedupe_key meanwhile; that one will do
+            ours.delete()
+    return False
+
+
+def run_pending(limit=100):
+    """Claim and run due tasks in this thread; returns how many were run"""
+    tasks = claim(limit)
+    for task in tasks:
+        run(task)
+    return len(tasks)
+
+
+class Drainer:
+    """Runs the queue in the background of a web process (TASKS_MODE = 'thread')"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._pool = None
+
+    def start(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._pool = ThreadPoolExecutor(max_workers=settings.TASK_WORKERS, thread_name_prefix='task')
+                self._thread = threading.Thread(target=self._loop, name='task-drainer', daemon=True)
+                self._thread.start()
+
+    def wake(self):
+        self.start()
+        self._wakeup.set()
+
+    def _loop(self):
+        while True:
+            self._wakeup.wait(settings.TASK_POLL)
+            self._wakeup.clear()
+            try:
+                while True:
+                    tasks = claim(settings.TASK_WORKERS * 10)
+                    if not tasks:
+                        break
+                    # Each pool thread uses (and afterwards closes) its own connection
+                    list(self._pool.map(_run_in_thread, tasks))
+            except Exception:
+                logger.exception('Task drainer failed to claim tasks')
+            finally:
+                close_old_connections()
+
+
+def _run_in_thread(task):
+    try:
+        return run(task)
+    finally:
+        close_old_connections()
+
+
+drainer = Drainer()
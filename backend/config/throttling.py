@@ -0,0 +1,313 @@
+"""
+Rate limiting for login, registration and search
+
+config.middleware.ThrottleMiddleware checks the rules below in
+process_view, i.e. after URL resolution but before authentication, the view
+and any database query or password hash, so a rejected request costs a few
+dictionary operations.
+
+Rules map a URL name to scopes, each keyed on the client IP or on the login
+identifier:
+
+- login: every attempt counts against the IP ('login'); failed attempts
+  also count against the submitted username ('login-failures', charged by
+  CustomTokenObtainPairView), so stuffing one account from many IPs is
+  limited as well
+- register / search: per IP (registration's limit is sized for many
+  students behind one NAT address, see THROTTLE_REGISTER_RATE)
+
+Limits come from THROTTLE_RATES as 'N/period' (s, m, h, d). Each is a token
+bucket holding N tokens that refills at N per period, so short bursts of up
+to N requests pass.
+
+Buckets live in a per-process TokenBucketStore. With THROTTLE_CACHE_ALIAS
+set, requests the local bucket admits are also counted in that cache
+(fixed windows, cache.incr; aincr on the async path), so the limits hold
+across worker processes.
+
+Admitted / rejected counts per scope are kept in `counters` (GET
+/api/v1/admin/throttle).
+"""
+import json
+import time
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse
+
+
+PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+# URL name -> [(scope, key)]; key is 'ip' or 'username'
+RULES = {
+    'login': [('login', 'ip'), ('login-failures', 'username')],
+    'token_obtain_pair': [('login', 'ip'), ('login-failures', 'username')],
+    'student-register': [('register', 'ip')],
+    'student-search': [('search', 'ip')],
+    'async-student-search': [('search', 'ip')],
+}
+
+# Scopes only checked by the middleware; their tokens are taken by charge()
+CHARGED_SCOPES = {'login-failures'}
+
+
+def parse_rate(rate):
+    """'10/m' -> (capacity 10, refill rate in tokens per second)"""
+    count, period = rate.split('/')
+    count = int(count)
+    return count, count / PERIODS[period.strip()[0]]
+
+
+class TokenBucketStore:
+    """
+    Token buckets by key, shared by the threads of a process without a lock.
+
+    Each bucket is an immutable (tokens, updated, full_at) tuple replaced in a
+    single dict assignment, which is atomic under the GIL. Two threads racing
+    on the same key can both see the old tuple, so one of them may be let
+    through without paying; the bucket is never corrupted.
+    """
+
+    def __init__(self, max_keys=100000):
+        self.max_keys = max_keys
+        self._buckets = {}
+
+    def __len__(self):
+        return len(self._buckets)
+
+    def take(self, key, capacity, rate, cost=1):
+        """
+        Take `cost` tokens from the bucket. Returns 0.0 when admitted, else
+        the seconds until enough tokens are back (nothing is taken then)
+        """
+        now = time.monotonic()
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            tokens = capacity
+            if len(self._buckets) >= self.max_keys:
+                self.prune(now)
+        else:
+            tokens = min(capacity, bucket[0] + (now - bucket[1]) * rate)
+
+        if tokens < cost:
+            return (cost - tokens) / rate
+        tokens -= cost
+        self._buckets[key] = (tokens, now, now + (capacity - tokens) / rate)
+        return 0.0
+
+    def wait(self, key, capacity, rate, cost=1):
+        """Seconds until `cost` tokens are available, without taking any"""
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            return 0.0
+        tokens = min(capacity, bucket[0] + (time.monotonic() - bucket[1]) * rate)
+        return 0.0 if tokens >= cost else (cost - tokens) / rate
+
+    def prune(self, now=None):
+        """Forget buckets that have refilled (they're the same as new ones)"""
+        now = time.monotonic() if now is None else now
+        for key, bucket in list(self._buckets.items()):
+            if bucket[2] <= now:
+                self._buckets.pop(key, None)
+        if len(self._buckets) >= self.max_keys:
+            # Flooded with distinct keys that are all still draining: start over
+            # rather than grow without bound
+            self._buckets.clear()
+
+    def clear(self):
+        self._buckets.clear()
+
+
+class Counters:
+    """Admitted / rejected requests per scope in this process (approximate under races)"""
+
+    def __init__(self):
+        self.admitted = {}
+        self.rejected = {}
+
+    def admit(self, scope):
+        self.admitted[scope] = self.admitted.get(scope, 0) + 1
+
+    def reject(self, scope):
+        self.rejected[scope] = self.rejected.get(scope, 0) + 1
+
+    def snapshot(self):
+        scopes = sorted({*self.admitted, *self.rejected})
+        return {
+            scope: {'admitted': self.admitted.get(scope, 0), 'rejected': self.rejected.get(scope, 0)}
+            for scope in scopes
+        }
+
+    def clear(self):
+        self.admitted.clear()
+        self.rejected.clear()
+
+
+store = TokenBucketStore()
+counters = Counters()
+_rates = {}
+
+
+def rate(scope):
+    """(capacity, tokens per second) for a scope, parsed once per rate string"""
+    value = settings.THROTTLE_RATES[scope]
+    parsed = _rates.get(value)
+    if parsed is None:
+        parsed = _rates[value] = parse_rate(value)
+    return parsed
+
+
+def client_ip(request):
+    """
+    The client address: REMOTE_ADDR, or with THROTTLE_PROXY_COUNT proxies in
+    front, the address the outermost of them saw (X-Forwarded-For entries
+    further left are client supplied and can't be trusted)
+    """
+    proxies = settings.THROTTLE_PROXY_COUNT
+    if proxies:
+        forwarded = [ip.strip() for ip in request.META.get('HTTP_X_FORWARDED_FOR', '').split(',') if ip.strip()]
+        if forwarded:
+            return forwarded[-min(proxies, len(forwarded))]
+    return request.META.get('REMOTE_ADDR', '')
+
+
+def login_identifier(request):
+    """The username of a login request, normalised, without DRF's parsers"""
+    try:
+        if request.content_type == 'application/json':
+            # Small body; Django keeps it in request.body for DRF to parse again
+            data = json.loads(request.body or b'{}')
+        else:
+            data = request.POST
+        username = data.get('username')
+    except (ValueError, AttributeError):
+        return None
+    return str(username).strip().lower() if username else None
+
+
+def _buckets(request, url_name):
+    """(scope, bucket key, capacity, refill) of each rule that applies to the request"""
+    keys = {}
+    for scope, key in RULES[url_name]:
+        if key not in keys:
+            keys[key] = client_ip(request) if key == 'ip' else login_identifier(request)
+        value = keys[key]
+        if value is not None:
+            yield (scope, f'{scope}:{value}', *rate(scope))
+
+
+def check(request, url_name):
+    """None to let the request through, else a 429 response"""
+    for scope, bucket, capacity, refill in _buckets(request, url_name):
+        if scope in CHARGED_SCOPES:
+            wait = store.wait(bucket, capacity, refill) or _shared_wait(bucket, capacity, refill)
+        else:
+            wait = store.take(bucket, capacity, refill) or _take_shared(bucket, capacity, refill)
+        if wait:
+            counters.reject(scope)
+            return throttled(wait)
+        counters.admit(scope)
+    return None
+
+
+async def acheck(request, url_name):
+    """check() for the async middleware path: the shared cache through its async API"""
+    for scope, bucket, capacity, refill in _buckets(request, url_name):
+        if scope in CHARGED_SCOPES:
+            wait = store.wait(bucket, capacity, refill) or await _ashared_wait(bucket, capacity, refill)
+        else:
+            wait = store.take(bucket, capacity, refill) or await _atake_shared(bucket, capacity, refill)
+        if wait:
+            counters.reject(scope)
+            return throttled(wait)
+        counters.admit(scope)
+    return None
+
+
+def charge(scope, value):
+    """Take a token for `value` in a CHARGED_SCOPES scope (e.g. a failed login)"""
+    if not settings.THROTTLE_ENABLED or not value:
+        return
+    bucket = f'{scope}:{str(value).strip().lower()}'
+    capacity, refill = rate(scope)
+    # Charged after the fact: an empty bucket just stays empty
+    store.take(bucket, capacity, refill)
+    _take_shared(bucket, capacity, refill)
+
+
+def _window(bucket, capacity, refill):
+    period = capacity / refill
+    window = int(time.time() // period)
+    return f'throttle:{bucket}:{window}', period, (window + 1) * period
+
+
+def _take_shared(bucket, capacity, refill):
+    """Count a request in the shared cache, if configured; seconds to wait when over"""
+    if not settings.THROTTLE_CACHE_ALIAS:
+        return 0.0
+    cache = caches[settings.THROTTLE_CACHE_ALIAS]
+    key, period, window_end = _window(bucket, capacity, refill)
+    cache.add(key, 0, timeout=int(period) + 1)
+    try:
+        count = cache.incr(key)
+    except ValueError:
+        # Expired between add() and incr()
+        return 0.0
+    if count <= capacity:
+        return 0.0
+    return window_end - time.time()
+
+
+def _shared_wait(bucket, capacity, refill):
+    """Seconds to wait when the shared count for `bucket` is used up, without counting"""
+    if not settings.THROTTLE_CACHE_ALIAS:
+        return 0.0
+    key, _, window_end = _window(bucket, capacity, refill)
+    if (caches[settings.THROTTLE_CACHE_ALIAS].get(key) or 0) < capacity:
+        return 0.0
+    return window_end - time.time()
+
+
+async def _atake_shared(bucket, capacity, refill):
+    """_take_shared() with the cache's async methods"""
+    if not settings.THROTTLE_CACHE_ALIAS:
+        return 0.0
+    cache = caches[settings.THROTTLE_CACHE_ALIAS]
+    key, period, window_end = _window(bucket, capacity, refill)
+    await cache.aadd(key, 0, timeout=int(period) + 1)
+    try:
+        count = await cache.aincr(key)
+    except ValueError:
+        return 0.0
+    if count <= capacity:
+        return 0.0
+    return window_end - time.time()
+
+
+async def _ashared_wait(bucket, capacity, refill):
+    """_shared_wait() with the cache's async methods"""
+    if not settings.THROTTLE_CACHE_ALIAS:
+        return 0.0
+    key, _, window_end = _window(bucket, capacity, refill)
+    if (await caches[settings.THROTTLE_CACHE_ALIAS].aget(key) or 0) < capacity:
+        return 0.0
+    return window_end - time.time()
+
+
+@lru_cache(maxsize=1024)
+def _throttled_body(seconds):
+    unit = 'second' if seconds == 1 else 'seconds'
+    return json.dumps(
+        {'detail': f'Request was throttled. Expected available in {seconds} {unit}.'},
+        separators=(',', ':')
+    ).encode()
+
+
+def throttled(wait):
+    """429 in the shape of DRF's Throttled error"""
+    seconds = max(1, int(wait + 0.999))
+    return HttpResponse(
+        _throttled_body(seconds), status=429, content_type='application/json',
+        headers={'Retry-After': str(seconds)}
+    )
@@ -2,11 +2,13 @@ from django.contrib import admin
 from django.urls import path, include
 from django.conf.urls.static import static, settings
 from . import views
+from student.pictures import serve_picture
 from rest_framework_simplejwt.views import (TokenObtainPairView,TokenRefreshView)
 
 urlpatterns = [
     path('admin/', admin.site.urls),
 
+    path('api/v1/async/', include('apiv1.async_urls')),
     path('api/v1/', include('apiv1.urls')),
     path('student/', include('student.urls')),
 
@@ -15,6 +17,9 @@ urlpatterns = [
 
     path('auth/token', TokenObtainPairView.as_view(), name='token_obtain_pair'),
 
+    # Uploaded profile pictures, immutable (development; see student.pictures)
+    path(f'{settings.MEDIA_URL.strip("/")}/avatars/<path:path>', serve_picture, name='profile-picture'),
+
 
 ] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
 
@@ -4,8 +4,19 @@ from rest_framework import viewsets, permissions, status, generics
 from rest_framework_simplejwt.views import TokenObtainPairView
 from .serializers import *
 from rest_framework.response import Response
+from rest_framework.exceptions import AuthenticationFailed
 from django.core.exceptions import PermissionDenied  
 from django.shortcuts import redirect
+import json
+import logging
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+
+from . import throttling
+from .revocation import revoked_tokens
+
+
+logger = logging.getLogger(__name__)
 
 
 
@@ -17,32 +28,47 @@ class CustomTokenObtainPairView(TokenObtainPairView):
         user_agent = request.META.get('HTTP_USER_AGENT', 'Unknown')
         username = request.data.get('username')
 
-        response = super().post(request, *args, **kwargs)
+        try:
+            response = super().post(request, *args, **kwargs)
+        except AuthenticationFailed:
+            # Failed logins count against the identifier from any IP
+            # (ThrottleMiddleware rejects once they're used up)
+            throttling.charge('login-failures', username)
+            logger.info('Failed login for %r from %s (%s)', username, client_ip, user_agent)
+            raise
 
         return response
 
     def _get_client_ip(self, request):
-        x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
-        if x_forwarded_for:
-            ip = x_forwarded_for.split(',')[0]
-        else:
-            ip = request.META.get('REMOTE_ADDR')
-        return ip
+        return throttling.client_ip(request)
 
 
 
 def logout_view(request):
-
+    """
+    End the session and revoke the bearer access token and, when sent as
+    `refresh` (form or JSON body), the refresh token (config.revocation)
+    """
     logout(request)
 
-    access_token = request.META.get('HTTP_AUTHORIZATION', '').split('Bearer ')[-1]
-    if access_token:
-        from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+    tokens = []
+    header = request.META.get('HTTP_AUTHORIZATION', '')
+    if header.startswith('Bearer '):
+        tokens.append((AccessToken, header[len('Bearer '):].strip()))
+    refresh = request.POST.get('refresh')
+    if refresh is None and request.content_type == 'application/json':
+        try:
+            refresh = json.loads(request.body or b'{}').get('refresh')
+        except (ValueError, AttributeError):
+            refresh = None
+    if refresh:
+        tokens.append((RefreshToken, refresh))
+
+    for token_class, raw_token in tokens:
         try:
-            token = OutstandingToken.objects.get(token=access_token)
-            BlacklistedToken.objects.get_or_create(token=token)
-        except OutstandingToken.DoesNotExist:
+            revoked_tokens.revoke(token_class(raw_token))
+        except TokenError:
+            # Invalid or already expired: nothing to revoke
             pass
 
     return redirect('login')
-
@@ -0,0 +1,237 @@
+"""
+Worker start-up warming and cold-start timings
+
+Much of what a request needs is built lazily on first use: the URL
+resolver and its compiled patterns, the authentication backend and DRF /
+simplejwt settings imports, model metadata behind the serializers, the
+translation catalogs, and the in-memory maps (batch titles, country and
+company aliases, revoked tokens, the search index). Without warming, the
+first requests on every new worker pay for all of it.
+
+startup() runs at the end of config.wsgi / config.asgi, before the worker
+takes traffic:
+
+- warm() runs every STAGES entry (WARMUP_ENABLED); a stage that fails
+  (e.g. the database isn't migrated yet) is logged and left to build
+  lazily as before
+- freeze() then makes the warmed state cheap to share with workers forked
+  from it (gunicorn --preload): database connections are closed, since a
+  connection must not be used by two processes, and with
+  WARMUP_GC_FREEZE the surviving objects are moved out of the garbage
+  collector's reach (gc.freeze), so collections in the workers don't
+  write to, and copy, the shared pages
+- no thread is started before the fork; the task drainer (config.tasks)
+  starts with the first request of each process
+
+Every process logs one JSON line on the `config.warmup` logger when it's
+ready (import and per-stage warm-up time) and one after its first response
+(how long it took). `manage.py warmup --cold` measures the same in a fresh
+interpreter, for tracking cold-start cost across releases.
+"""
+import gc
+import json
+import logging
+import os
+import threading
+from time import perf_counter
+
+from django.conf import settings
+from django.core.signals import request_finished, request_started
+from django.db import connections
+
+
+logger = logging.getLogger(__name__)
+
+
+def warm_urls():
+    """Import every urlconf (and with it the views), compile the patterns and build the reverse map"""
+    from django.urls import get_resolver
+
+    def compile_patterns(patterns):
+        for entry in patterns:
+            entry.pattern.regex
+            if hasattr(entry, 'url_patterns'):
+                compile_patterns(entry.url_patterns)
+
+    resolver = get_resolver()
+    compile_patterns(resolver.url_patterns)
+    resolver.reverse_dict
+
+
+def warm_auth():
+    """Authentication backends, password hashers and the DRF / simplejwt settings they read"""
+    from django.contrib.auth import get_backends
+    from django.contrib.auth.hashers import get_hashers
+    from rest_framework.settings import api_settings
+    from rest_framework_simplejwt.settings import api_settings as jwt_settings
+    from rest_framework_simplejwt.state import token_backend
+
+    get_backends()
+    get_hashers()
+    for name in (
+        'DEFAULT_AUTHENTICATION_CLASSES', 'DEFAULT_PERMISSION_CLASSES', 'DEFAULT_RENDERER_CLASSES',
+        'DEFAULT_PARSER_CLASSES', 'DEFAULT_PAGINATION_CLASS', 'DEFAULT_FILTER_BACKENDS',
+    ):
+        getattr(api_settings, name)
+    jwt_settings.AUTH_TOKEN_CLASSES
+    token_backend.get_leeway()
+
+
+def warm_serializers():
+    """Model metadata caches and the serializer field maps built from them"""
+    from django.apps import apps
+
+    from config.serializers import CustomTokenObtainPairSerializer, RevocableTokenRefreshSerializer
+    from student.serializers import StudentProfileSerializer, StudentRegistrationSerializer
+
+    for model in apps.get_models():
+        model._meta.get_fields()
+        model._meta.related_objects
+    for serializer in (
+        StudentRegistrationSerializer, StudentProfileSerializer,
+        CustomTokenObtainPairSerializer, RevocableTokenRefreshSerializer,
+    ):
+        serializer().fields
+
+
+def warm_translations():
+    """Load the LANGUAGE_CODE catalogs validation and error messages come from"""
+    from django.utils import translation
+
+    with translation.override(settings.LANGUAGE_CODE):
+        translation.gettext('This field is required.')
+
+
+def warm_batches():
+    from student.batches import batch_cache
+
+    batch_cache.load()
+
+
+def warm_dimensions():
+    from student import dimensions
+
+    dimensions.countries.load()
+    dimensions.companies.load()
+
+
+def warm_revoked_tokens():
+    from config.revocation import revoked_tokens
+
+    revoked_tokens.sync()
+
+
+def warm_search():
+    """Check for the full-text index table and, with STUDENT_SEARCH_INMEMORY, build the in-memory index"""
+    from student import search
+    from student.search_index import get_profile_index
+
+    search.is_available()
+    if settings.STUDENT_SEARCH_INMEMORY:
+        get_profile_index()
+
+
+# Stage name -> function, run in this order
+STAGES = {
+    'urls': warm_urls,
+    'auth': warm_auth,
+    'serializers': warm_serializers,
+    'translations': warm_translations,
+    'batches': warm_batches,
+    'dimensions': warm_dimensions,
+    'revoked_tokens': warm_revoked_tokens,
+    'search': warm_search,
+}
+
+
+def warm(stages=None):
+    """
+    Run the given STAGES (all by default); returns {stage: seconds} for the
+    stages that succeeded. Failures are logged, not raised.
+    """
+    timings = {}
+    for name in stages or STAGES:
+        started = perf_counter()
+        try:
+            STAGES[name]()
+        except Exception:
+            logger.exception('Warm-up stage %r failed', name)
+            continue
+        timings[name] = perf_counter() - started
+    return timings
+
+
+def freeze():
+    """Prepare the warmed process to be forked (see the module docstring)"""
+    connections.close_all()
+    if settings.WARMUP_GC_FREEZE:
+        gc.collect()
+        gc.freeze()
+
+
+class ColdStart:
+    """Start-up timings of this process, logged once ready and after the first response"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.import_time = None
+        self.stages = {}
+        self.first_path = None
+        self.first_response = None
+        self._first_started = None
+
+    def ready(self, import_time, stages):
+        self.import_time = import_time
+        self.stages = stages
+        request_started.connect(self._request_started, dispatch_uid='warmup_first_request')
+        report = self.report()
+        del report['first_response_ms']
+        logger.info(json.dumps({'event': 'ready', 'pid': os.getpid(), **report}))
+
+    def _request_started(self, sender, environ=None, scope=None, **kwargs):
+        with self._lock:
+            if self._first_started is not None:
+                return
+            self._first_started = perf_counter()
+            self.first_path = (environ or {}).get('PATH_INFO') or (scope or {}).get('path')
+        request_started.disconnect(dispatch_uid='warmup_first_request')
+        request_finished.connect(self._request_finished, dispatch_uid='warmup_first_response')
+
+        # Threads are only started in the process serving requests, never
+        # in a --preload parent about to fork
+        if settings.TASKS_MODE == 'thread':
+            from config.tasks import drainer
+            drainer.start()
+
+    def _request_finished(self, sender, **kwargs):
+        request_finished.disconnect(dispatch_uid='warmup_first_response')
+        self.first_response = perf_counter() - self._first_started
+        logger.info(json.dumps({
+            'event': 'first_response',
+            'pid': os.getpid(),
+            'path': self.first_path,
+            'duration_ms': round(self.first_response * 1000, 2),
+        }))
+
+    def report(self):
+        return {
+            'import_ms': round(self.import_time * 1000, 2) if self.import_time is not None else None,
+            'warm_ms': round(sum(self.stages.values()) * 1000, 2),
+            'stages_ms': {name: round(seconds * 1000, 2) for name, seconds in self.stages.items()},
+            'first_response_ms': round(self.first_response * 1000, 2) if self.first_response is not None else None,
+        }
+
+
+cold_start = ColdStart()
+
+
+def startup(started):
+    """
+    Warm this process up; called by config.wsgi / config.asgi once the
+    application is loaded. `started` is the perf_counter() value taken
+    before Django was imported.
+    """
+    import_time = perf_counter() - started
+    stages = warm() if settings.WARMUP_ENABLED else {}
+    freeze()
+    cold_start.ready(import_time, stages)
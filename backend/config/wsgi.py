@@ -8,9 +8,18 @@ https://docs.djangoproject.com/en/5.2/howto/deployment/wsgi/
 """
 
 import os
+from time import perf_counter
+
+started = perf_counter()
 
 from django.core.wsgi import get_wsgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
 
 application = get_wsgi_application()
+
+# Warm the in-memory state up before the worker takes traffic, ready to be
+# shared with forked workers (config.warmup)
+from config import warmup
+
+warmup.startup(started)
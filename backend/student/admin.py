@@ -5,5 +5,11 @@ admin.site.site_header = "Student Models"
 
 admin.site.register(Batch)
 admin.site.register(Role)
+admin.site.register(Country)
+admin.site.register(CountryAlias)
+admin.site.register(Company)
+admin.site.register(CompanyAlias)
 admin.site.register(StudentProfile)
-admin.site.register(StudentVerification)
\ No newline at end of file
+admin.site.register(StudentVerification)
+admin.site.register(DirectoryFacet)
+admin.site.register(Tombstone)
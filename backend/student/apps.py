@@ -1,6 +1,12 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
 
 
 class StudentConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'student'
+
+    def ready(self):
+        from . import signals
+        post_migrate.connect(signals.create_search_index, sender=self)
+        post_migrate.connect(signals.backfill_dimensions, sender=self)
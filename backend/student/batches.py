@@ -0,0 +1,58 @@
+"""
+In-process Batch title -> id map
+
+Registration resolves the submitted batch title on every signup. The batch
+table is a handful of rows that almost never change, so each process keeps
+the whole title -> (id, session) map in memory instead of querying it.
+
+Saves and deletes in this process clear the map (student.signals). Other
+processes see renames and deletions after BATCH_CACHE_TTL seconds; a title
+missing from the map always reloads it, so new batches are found right away.
+"""
+import threading
+import time
+
+from django.conf import settings
+
+from .models import Batch
+
+
+class BatchCache:
+    """title -> (id, session) for every Batch, safe to share between threads"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._batches = None
+        self._loaded = 0.0
+
+    def get(self, title):
+        """The Batch titled exactly `title` (no query while cached), None if there is none"""
+        row = self.load().get(title)
+        if row is None:
+            # Possibly created (by another process) since the map was loaded
+            self.clear()
+            row = self.load().get(title)
+        if row is None:
+            return None
+        batch_id, session = row
+        return Batch.from_db('default', ['id', 'title', 'session'], (batch_id, title, session))
+
+    def clear(self, **kwargs):
+        """Drop the map (also a Batch post_save / post_delete receiver)"""
+        with self._lock:
+            self._batches = None
+
+    def load(self):
+        """title -> (id, session), loaded when missing or older than BATCH_CACHE_TTL"""
+        with self._lock:
+            if self._batches is None or time.monotonic() - self._loaded > settings.BATCH_CACHE_TTL:
+                batches = {}
+                # Titles aren't unique; the oldest batch with a title wins
+                for batch_id, title, session in Batch.objects.order_by('-id').values_list('id', 'title', 'session'):
+                    batches[title] = (batch_id, session)
+                self._batches = batches
+                self._loaded = time.monotonic()
+            return self._batches
+
+
+batch_cache = BatchCache()
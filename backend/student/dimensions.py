@@ -0,0 +1,231 @@
+"""
+Canonical countries and companies
+
+`country` and `current_company` are free text, so "Google", "google inc"
+and "Google LLC" used to be filtered and counted as three companies. Each
+spelling is normalized to a key (company_key / country_key) and the key
+looked up in an alias table (CountryAlias / CompanyAlias) pointing at one
+canonical Country / Company row:
+
+- StudentProfile.country_ref / company_ref are resolved on every save
+  (pre_save signal in student.signals); unknown spellings get a new
+  canonical row named after them. Paths that skip signals (bulk_create,
+  queryset.update) run `manage.py normalize_dimensions` afterwards, which
+  also (re)resolves existing rows after aliases were edited in the admin.
+  `manage.py migrate` links profiles that have none yet (post_migrate).
+- GET /profile/?country= and the facet counts use the integer foreign keys.
+  ?company= (contains) scans the alias keys in memory, then filters on
+  company_ref_id__in.
+
+Each process keeps every alias key in memory (AliasIndex), loaded on first
+use and cleared when alias changes in this process commit or after
+DIMENSION_CACHE_TTL seconds. Rows resolve() adds belong to the caller's
+transaction: a rolled-back save takes them along, and the maps never hold
+their ids.
+"""
+import re
+import threading
+import time
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+
+from .models import Company, CompanyAlias, Country, CountryAlias, StudentProfile
+
+
+WORDS = re.compile(r'[^\W_]+')
+
+# Trailing words that don't tell companies apart
+LEGAL_SUFFIXES = {
+    'ag', 'bv', 'co', 'company', 'corp', 'corporation', 'gmbh', 'inc', 'incorporated', 'limited',
+    'llc', 'llp', 'lp', 'ltd', 'plc', 'pte', 'pvt', 'private', 'sa',
+}
+
+# Country spellings no normalization can join -> the canonical name
+COUNTRY_ALIASES = {
+    'bd': 'Bangladesh',
+    'britain': 'United Kingdom',
+    'great britain': 'United Kingdom',
+    'ksa': 'Saudi Arabia',
+    'uae': 'United Arab Emirates',
+    'uk': 'United Kingdom',
+    'us': 'United States',
+    'usa': 'United States',
+    'united states of america': 'United States',
+}
+
+
+def _words(text):
+    """Lowercase words, initialisms joined ('U.S.A.' -> ['usa'])"""
+    words = []
+    initials = False
+    for word in WORDS.findall(str(text).lower()):
+        if len(word) == 1 and initials:
+            words[-1] += word
+        else:
+            words.append(word)
+            initials = len(word) == 1
+    return words
+
+
+def company_key(text):
+    """'Google, Inc.' -> 'google'"""
+    words = _words(str(text).replace('&', ' and '))
+    while len(words) > 1 and words[-1] in LEGAL_SUFFIXES:
+        words.pop()
+    return ' '.join(words)
+
+
+def country_key(text):
+    """'The Netherlands' -> 'netherlands'"""
+    words = _words(text)
+    if len(words) > 1 and words[0] == 'the':
+        words.pop(0)
+    return ' '.join(words)
+
+
+class AliasIndex:
+    """key -> canonical id and id -> name for one dimension, safe to share between threads"""
+
+    def __init__(self, model, alias_model, key_func, aliases=None):
+        self.model = model
+        self.alias_model = alias_model
+        self.key_func = key_func
+        self.aliases = aliases or {}
+        # CompanyAlias.company / CountryAlias.country
+        self.fk = model._meta.model_name
+        self._lock = threading.Lock()
+        self._keys = None
+        self._names = None
+        self._loaded = 0.0
+
+    def get(self, text, using=None):
+        """Canonical id for a spelling, None when it isn't known (no query while cached)"""
+        if not text:
+            return None
+        key = self.key_func(text)
+        keys = self.load(using)[0]
+        if key in keys:
+            return keys[key]
+        canonical = self.aliases.get(key)
+        return keys.get(self.key_func(canonical)) if canonical else None
+
+    def resolve(self, text, using='default'):
+        """
+        Canonical id for a spelling, adding it (and a canonical row) when
+        new. The rows are written in the caller's transaction, if any.
+        """
+        if not text or not self.key_func(text):
+            return None
+        found = self.get(text, using=using)
+        if found is not None:
+            return found
+
+        key = self.key_func(text)
+        canonical = self.aliases.get(key)
+        if canonical:
+            # A known alias: attach it to the canonical spelling's row
+            found = self.resolve(canonical, using=using)
+        try:
+            # A savepoint inside the caller's transaction
+            with transaction.atomic(using=using):
+                if found is None:
+                    name = ' '.join(str(text).split())[:self.model._meta.get_field('name').max_length]
+                    found = self.model.objects.using(using).create(name=name).pk
+                self.alias_model.objects.using(using).create(key=key, **{f'{self.fk}_id': found})
+        except IntegrityError:
+            # Added by another process meanwhile (or earlier in this
+            # transaction, before the maps were reloaded)
+            found = self.alias_model.objects.using(using).filter(key=key).values_list(
+                f'{self.fk}_id', flat=True
+            ).first()
+        return found
+
+    def name(self, pk):
+        return self.load()[1].get(pk)
+
+    def search(self, fragment, using=None):
+        """Ids of the canonical rows with a spelling containing `fragment`"""
+        fragment = self.key_func(fragment)
+        if not fragment:
+            return set()
+        keys = self.load(using)[0]
+        return {pk for key, pk in keys.items() if fragment in key}
+
+    def clear(self, **kwargs):
+        """Drop the maps"""
+        with self._lock:
+            self._keys = None
+
+    def clear_on_commit(self, using='default', **kwargs):
+        """
+        post_save / post_delete receiver: drop the maps once the change
+        commits, so they never hold rows a rollback takes back
+        """
+        transaction.on_commit(self.clear, using=using)
+
+    def load(self, using=None):
+        """
+        (key -> id, id -> name), loaded from `using` (None: the router's
+        pick) when missing or older than DIMENSION_CACHE_TTL
+        """
+        with self._lock:
+            if self._keys is None or time.monotonic() - self._loaded > settings.DIMENSION_CACHE_TTL:
+                keys, names = {}, {}
+                rows = self.alias_model.objects.using(using).values_list('key', f'{self.fk}_id', f'{self.fk}__name')
+                for key, pk, name in rows:
+                    keys[key] = pk
+                    names[pk] = name
+                self._keys, self._names = keys, names
+                self._loaded = time.monotonic()
+            return self._keys, self._names
+
+
+countries = AliasIndex(Country, CountryAlias, country_key, COUNTRY_ALIASES)
+companies = AliasIndex(Company, CompanyAlias, company_key)
+
+def clear():
+    """Drop both alias maps (tests: ids cached before a rollback are gone)"""
+    countries.clear()
+    companies.clear()
+
+
+# StudentProfile text field -> (foreign key attname, index)
+DIMENSIONS = {
+    'country': ('country_ref_id', countries),
+    'current_company': ('company_ref_id', companies),
+}
+
+
+def profile_refs(values, using='default'):
+    """Foreign key values for the DIMENSIONS text fields present in `values`"""
+    return {
+        attname: index.resolve(values[field], using=using)
+        for field, (attname, index) in DIMENSIONS.items() if field in values
+    }
+
+
+def normalize_profiles(using='default'):
+    """
+    Resolve country_ref / company_ref of every profile from its text, one
+    UPDATE per canonical row. Returns {text field: profiles changed}.
+    Facet counts need rebuilding afterwards (facets.rebuild_facets).
+    """
+    profiles = StudentProfile.objects.using(using)
+    changed = {}
+    for field, (attname, index) in DIMENSIONS.items():
+        texts = {}
+        for text in profiles.values_list(field, flat=True).distinct().order_by():
+            texts.setdefault(index.resolve(text, using=using), []).append(text)
+
+        changed[field] = 0
+        for pk, spellings in texts.items():
+            match = Q(**{f'{field}__in': [text for text in spellings if text is not None]})
+            if None in spellings:
+                match |= Q(**{f'{field}__isnull': True})
+            # Only rows pointing elsewhere; reruns touch nothing
+            stale = profiles.filter(match).exclude(**{attname: pk}) if pk is not None else \
+                profiles.filter(match, **{f'{attname}__isnull': False})
+            changed[field] += stale.update(**{attname: pk})
+    return changed
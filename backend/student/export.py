@@ -0,0 +1,100 @@
+"""
+Streaming export of the alumni directory
+
+Rows are read with .values_list().iterator(), so no model instances or DRF
+serializers are built, and are encoded as CSV or JSON Lines one chunk at a
+time. Memory stays flat regardless of the directory size and the header goes
+out before the first database round trip completes.
+
+CSV cells that a spreadsheet would read as a formula (starting with =, +,
+-, @, tab or carriage return) are prefixed with a single quote, so profile
+text can't run as one when an admin opens the export; phone numbers
+written as +880... get the quote too.
+"""
+import csv
+import json
+
+# (output column, queryset lookup) in StudentProfileSerializer field order
+EXPORT_FIELDS = [
+    ('id', 'id'),
+    ('first_name', 'first_name'),
+    ('last_name', 'last_name'),
+    ('uni_id', 'uni_id'),
+    ('bio', 'bio'),
+    ('profile_pic', 'profile_pic'),
+    ('batch', 'batch__title'),
+    ('country', 'country'),
+    ('current_job_position', 'current_job_position'),
+    ('current_company', 'current_company'),
+    ('email', 'email'),
+    ('phone', 'phone'),
+    ('linkedin', 'linkedin'),
+    ('facebook', 'facebook'),
+    ('instagram', 'instagram'),
+    ('is_cr', 'is_cr'),
+    ('is_verified', 'is_verified'),
+]
+
+FORMATS = {
+    'csv': 'text/csv',
+    'jsonl': 'application/x-ndjson',
+}
+
+# First characters that make a spreadsheet treat a cell as a formula
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+
+class _Line:
+    """File-like object for csv.writer that hands back what was written"""
+
+    def write(self, value):
+        return value
+
+
+def csv_cell(value):
+    """`value` as written to CSV, quoted out of formula syntax when it's text"""
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def export_rows(profiles, chunk_size=2000):
+    """Plain tuples in EXPORT_FIELDS order, fetched chunk_size rows at a time"""
+    return profiles.order_by('id').values_list(
+        *[lookup for _, lookup in EXPORT_FIELDS]
+    ).iterator(chunk_size=chunk_size)
+
+
+def stream_csv(profiles, chunk_size=2000):
+    writer = csv.writer(_Line())
+    yield writer.writerow([name for name, _ in EXPORT_FIELDS])
+
+    lines = []
+    for row in export_rows(profiles, chunk_size):
+        lines.append(writer.writerow([csv_cell(value) for value in row]))
+        if len(lines) >= chunk_size:
+            yield ''.join(lines)
+            lines = []
+    if lines:
+        yield ''.join(lines)
+
+
+def stream_jsonl(profiles, chunk_size=2000):
+    names = [name for name, _ in EXPORT_FIELDS]
+    # Nothing to send before the first row, but start the response anyway
+    yield ''
+
+    lines = []
+    for row in export_rows(profiles, chunk_size):
+        lines.append(json.dumps(dict(zip(names, row)), ensure_ascii=False) + '\n')
+        if len(lines) >= chunk_size:
+            yield ''.join(lines)
+            lines = []
+    if lines:
+        yield ''.join(lines)
+
+
+def stream(profiles, output='csv', chunk_size=2000):
+    if output == 'jsonl':
+        return stream_jsonl(profiles, chunk_size)
+    return stream_csv(profiles, chunk_size)
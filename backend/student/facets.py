@@ -0,0 +1,175 @@
+"""
+Directory statistics and facet counts
+
+Profile counts per batch, country, company and CR status are kept in the
+DirectoryFacet table so GET /api/v1/stats (and ?facets=true on the
+unfiltered profile list) read a handful of summary rows instead of
+aggregating the whole directory.
+
+The table is maintained incrementally by the StudentProfile signals in
+student.signals: each profile snapshots its facet values when loaded and
+the difference is applied on save (as a background task, config.tasks) /
+delete. Paths that skip signals
+(bulk_create, queryset.update) call rebuild_facets() or
+`manage.py rebuild_facets` afterwards.
+"""
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import Count, F, Q
+
+from .dimensions import companies, countries
+from .models import Batch, DirectoryFacet, StudentProfile
+
+
+# Facet dimension -> StudentProfile field. Countries and companies are
+# counted per canonical row (student.dimensions), so spellings of one
+# company add up
+FACET_FIELDS = {
+    'batch': 'batch_id',
+    'country': 'country_ref_id',
+    'company': 'company_ref_id',
+    'cr': 'is_cr',
+}
+
+# Row carrying the size of the whole directory
+TOTAL = ('total', '')
+
+
+def facet_value(dimension, value):
+    """The stored facet value for a field value, None when it isn't counted"""
+    if dimension == 'cr':
+        return 'true' if value else None
+    if value is None:
+        return None
+    return str(value).strip()[:200] or None
+
+
+def facet_pairs(values):
+    """
+    The (dimension, value) pairs a profile counts towards, from a mapping of
+    its FACET_FIELDS values
+    """
+    pairs = [TOTAL]
+    for dimension, field in FACET_FIELDS.items():
+        value = facet_value(dimension, values[field])
+        if value is not None:
+            pairs.append((dimension, value))
+    return pairs
+
+
+def apply_changes(old_pairs, new_pairs, using='default'):
+    """Move a profile's counts from `old_pairs` to `new_pairs`"""
+    changes = Counter(new_pairs)
+    changes.subtract(old_pairs)
+
+    by_delta = {}
+    for pair, delta in changes.items():
+        if delta:
+            by_delta.setdefault(delta, []).append(pair)
+    if not by_delta:
+        return
+
+    facets = DirectoryFacet.objects.using(using)
+    with transaction.atomic(using=using):
+        # Make sure rows exist for values seen for the first time
+        added = [pair for delta, pairs in by_delta.items() if delta > 0 for pair in pairs]
+        if added:
+            facets.bulk_create(
+                [DirectoryFacet(dimension=dimension, value=value) for dimension, value in added],
+                ignore_conflicts=True
+            )
+        # One UPDATE per distinct delta (normally just +1 and -1)
+        for delta, pairs in by_delta.items():
+            match = Q()
+            for dimension, value in pairs:
+                match |= Q(dimension=dimension, value=value)
+            facets.filter(match).update(count=F('count') + delta)
+
+
+def rebuild_facets(using='default'):
+    """Recompute every facet row from StudentProfile; returns the number of rows"""
+    profiles = StudentProfile.objects.using(using)
+    rows = [DirectoryFacet(dimension=TOTAL[0], value=TOTAL[1], count=profiles.count())]
+    for dimension, counts in _grouped(profiles).items():
+        rows.extend(
+            DirectoryFacet(dimension=dimension, value=value, count=count)
+            for value, count in counts.items()
+        )
+
+    with transaction.atomic(using=using):
+        DirectoryFacet.objects.using(using).all().delete()
+        DirectoryFacet.objects.using(using).bulk_create(rows, batch_size=1000)
+    return len(rows)
+
+
+def _grouped(profiles):
+    """Counter of facet values per dimension over `profiles`, one GROUP BY each"""
+    grouped = {}
+    for dimension, field in FACET_FIELDS.items():
+        counts = grouped[dimension] = Counter()
+        for value, count in profiles.values_list(field).annotate(count=Count('id')).order_by():
+            value = facet_value(dimension, value)
+            if value is not None:
+                counts[value] += count
+    return grouped
+
+
+def facet_counts(profiles=None, limit=20):
+    """
+    Facet counts for the whole directory (from the summary table) or for a
+    filtered `profiles` queryset (grouped on the fly).
+
+    Returns {'total', 'batch', 'country', 'company', 'cr'}; the list facets
+    are sorted by count and capped at `limit` entries (batches are never
+    capped).
+    """
+    if profiles is None:
+        counts = {dimension: {} for dimension in FACET_FIELDS}
+        counts['total'] = {}
+        for dimension, value, count in DirectoryFacet.objects.filter(count__gt=0).values_list(
+            'dimension', 'value', 'count'
+        ):
+            counts.setdefault(dimension, {})[value] = count
+        total = counts['total'].get('', 0)
+    else:
+        counts = _grouped(profiles)
+        total = profiles.count()
+
+    batches = {
+        str(batch_id): (title, session)
+        for batch_id, title, session in Batch.objects.filter(
+            id__in=[int(batch_id) for batch_id in counts['batch']]
+        ).values_list('id', 'title', 'session')
+    }
+
+    return {
+        'total': total,
+        'batch': sorted(
+            (
+                {'batch': batches[batch_id][0], 'session': batches[batch_id][1], 'count': count}
+                for batch_id, count in counts['batch'].items() if batch_id in batches
+            ),
+            key=lambda row: row['batch']
+        ),
+        'country': _top(counts['country'], 'country', countries, limit),
+        'company': _top(counts['company'], 'company', companies, limit),
+        'cr': counts['cr'].get('true', 0),
+    }
+
+
+def _top(counts, name, index, limit):
+    """The `limit` most common canonical rows, by name (ids from the in-memory alias index)"""
+    named = [(index.name(int(pk)), count) for pk, count in counts.items()]
+    ranked = sorted(((value, count) for value, count in named if value is not None), key=lambda item: (-item[1], item[0]))
+    return [{name: value, 'count': count} for value, count in ranked[:limit]]
+
+
+def list_facets(params, profiles, filters):
+    """
+    Facet counts for a profile list request with ?facets=true, else None.
+    Unfiltered lists read the summary table; filtered ones group `profiles`.
+    """
+    if (params.get('facets') or '').lower() not in ('true', '1', 'yes'):
+        return None
+    return facet_counts(profiles if any(filters.values()) else None)
@@ -0,0 +1,73 @@
+from asgiref.sync import sync_to_async
+from django.db.models.functions import Lower
+
+from .dimensions import companies, countries
+
+
+def filter_profiles(profiles, params):
+    """
+    Apply the directory filters shared by GET /profile/, the export endpoint
+    and the export_alumni command. `params` is any mapping with .get()
+    (request.query_params or a plain dict).
+
+    - batch: Filter by batch title (exact match, case-insensitive)
+    - country: Filter by country (any spelling of it, see student.dimensions)
+    - is_cr: Filter by CR status (true/false)
+    - company: Fuzzy search by company name (contains, matched against the
+      in-memory company aliases)
+    - position: Fuzzy search by job position (contains, case-insensitive)
+
+    Returns the filtered queryset and the applied filters.
+    """
+    # Get filter parameters
+    batch_filter = params.get('batch', None)
+    country_filter = params.get('country', None)
+    is_cr_filter = params.get('is_cr', None)
+    company_filter = params.get('company', None)
+    position_filter = params.get('position', None)
+
+    # Apply filters if provided
+    if batch_filter:
+        # Lower(title), the expression batch_title_lower_idx is built on
+        profiles = profiles.alias(batch_title_lower=Lower('batch__title')).filter(
+            batch_title_lower=batch_filter.lower()
+        )
+
+    if country_filter:
+        # Indexed foreign key lookup; unknown countries match nothing
+        country_id = countries.get(country_filter)
+        profiles = profiles.filter(country_ref_id=country_id) if country_id else profiles.none()
+
+    if is_cr_filter is not None:
+        # Convert string to boolean
+        is_cr_bool = is_cr_filter.lower() in ('true', '1', 'yes')
+        profiles = profiles.filter(is_cr=is_cr_bool)
+
+    if company_filter:
+        # Fuzzy match - contains search over the company spellings in memory,
+        # then an indexed foreign key lookup
+        profiles = profiles.filter(company_ref_id__in=companies.search(company_filter))
+
+    if position_filter:
+        # Fuzzy match - contains search, case-insensitive
+        profiles = profiles.filter(current_job_position__icontains=position_filter)
+
+    filters = {
+        'batch': batch_filter,
+        'country': country_filter,
+        'is_cr': is_cr_filter,
+        'company': company_filter,
+        'position': position_filter,
+    }
+    return profiles, filters
+
+
+async def afilter_profiles(profiles, params):
+    """
+    filter_profiles() for async views. The country and company filters read
+    the alias maps, which (re)load with a sync query, so with either of them
+    the filters are applied in a thread.
+    """
+    if params.get('country') or params.get('company'):
+        return await sync_to_async(filter_profiles)(profiles, params)
+    return filter_profiles(profiles, params)
@@ -0,0 +1,270 @@
+import json
+import os
+import platform
+import random
+import statistics
+import time
+import tracemalloc
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.utils import timezone
+from rest_framework_simplejwt.tokens import AccessToken
+
+from config.revocation import revoked_tokens
+from student import dimensions, facets, search, sync
+from student.batches import batch_cache
+from student.models import StudentProfile
+from student.synthetic import seed_directory, scratch_database, FIRST_NAMES, LAST_NAMES
+
+
+# Upper bound on the queries one request of each endpoint may issue, at any
+# directory size (JWT authentication itself is query-free, see
+# config.authentication.StatelessJWTAuthentication).
+# Lower these when an endpoint gets cheaper.
+QUERY_BUDGETS = {
+    'register': 7,
+    'login': 1,
+    'profile-list': 2,
+    'profile-list-filtered': 2,
+    'profile-detail': 1,
+    'profile-patch': 5,
+    'search': 2,
+    'stats': 2,
+    'sync': 3,
+    'verify-list': 2,
+    'verify': 5,
+    'verify-bulk': 5,
+}
+
+PASSWORD = 'bench-password-1'
+FAST_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark every apiv1 endpoint through the test client on synthetic directories: '
+        'query-count budgets, latency percentiles and memory peaks, compared against a JSON baseline'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000],
+                            help='Directory sizes to seed (e.g. 1000 10000 100000)')
+        parser.add_argument('--iterations', type=int, default=50, help='Requests per endpoint and size')
+        parser.add_argument('--endpoints', nargs='+', choices=sorted(QUERY_BUDGETS),
+                            help='Only run these endpoints')
+        parser.add_argument('--output', default='bench_api.json', help='Write the results to this file')
+        parser.add_argument('--baseline', help='Compare against this earlier --output file')
+        parser.add_argument('--threshold', type=float, default=0.25,
+                            help='Allowed relative slowdown / memory growth against the baseline (0.25 = 25%%)')
+        parser.add_argument('--real-hashing', action='store_true',
+                            help='Use the configured password hashers (default: MD5, so login and register '
+                                 'measure the request path rather than the hash cost; see bench_hashing)')
+        parser.add_argument('--cached', action='store_true', help='Leave the directory response cache on')
+
+    def handle(self, *args, **options):
+        baseline = None
+        if options['baseline']:
+            try:
+                with open(options['baseline']) as handle:
+                    baseline = json.load(handle)
+            except (OSError, ValueError) as e:
+                raise CommandError(f'Could not read baseline {options["baseline"]}: {e}')
+
+        overrides = {
+            'DIRECTORY_CACHE_ENABLED': options['cached'], 'STUDENT_SEARCH_INMEMORY': False,
+            # One client hammering register / login; see bench_throttle for the limiter itself
+            'THROTTLE_ENABLED': False,
+            # Requests only queue their side effects; measure that, not a
+            # drainer thread competing for the database
+            'TASKS_MODE': 'worker',
+        }
+        if not options['real_hashing']:
+            overrides['PASSWORD_HASHERS'] = FAST_HASHERS
+
+        results = {}
+        over_budget = []
+        with override_settings(**overrides), scratch_database():
+            for size in sorted(options['sizes']):
+                self.stdout.write(self.style.MIGRATE_HEADING(f'\n{size} profiles'))
+                self._seed(size)
+                results[str(size)] = {}
+                for name, run in self._endpoints(size):
+                    if options['endpoints'] and name not in options['endpoints']:
+                        continue
+                    result = self._measure(run, options['iterations'])
+                    results[str(size)][name] = result
+                    flag = ''
+                    if result['queries'] > QUERY_BUDGETS[name]:
+                        over_budget.append(f'{size} {name}: {result["queries"]} queries > budget {QUERY_BUDGETS[name]}')
+                        flag = self.style.ERROR('  over query budget')
+                    self.stdout.write(
+                        f'  {name:<22} p50 {result["p50_ms"]:>8.2f}ms  p95 {result["p95_ms"]:>8.2f}ms  '
+                        f'p99 {result["p99_ms"]:>8.2f}ms  queries {result["queries"]:>3}  '
+                        f'peak {result["peak_kb"]:>8.1f}KB{flag}'
+                    )
+
+        report = {
+            'meta': {
+                'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                'python': platform.python_version(),
+                'database': settings.DATABASES['default']['ENGINE'],
+                'iterations': options['iterations'],
+                'real_hashing': options['real_hashing'],
+                'cached': options['cached'],
+            },
+            'results': results,
+        }
+        with open(options['output'], 'w') as handle:
+            json.dump(report, handle, indent=2)
+        self.stdout.write(f'\nResults written to {os.path.abspath(options["output"])}')
+
+        regressions = over_budget + (self._compare(baseline, results, options['threshold']) if baseline else [])
+        if regressions:
+            for line in regressions:
+                self.stdout.write(self.style.ERROR(f'  {line}'))
+            raise CommandError(f'{len(regressions)} performance regressions')
+        self.stdout.write(self.style.SUCCESS('No regressions'))
+
+    # ------------------------------------------------------------------
+    # Fixtures
+    # ------------------------------------------------------------------
+
+    def _seed(self, size):
+        started = time.perf_counter()
+        seed_directory(size)
+        # bulk_create skips the signals that maintain these
+        search.rebuild_index()
+        dimensions.normalize_profiles()
+        facets.rebuild_facets()
+
+        self.user, _ = User.objects.get_or_create(username='bench-user', defaults={'email': 'bench@example.com'})
+        self.user.set_password(PASSWORD)
+        self.user.save()
+        self.profile = StudentProfile.objects.filter(user=self.user).first()
+        if self.profile is None:
+            self.profile = StudentProfile.objects.filter(user__isnull=True).order_by('id').first()
+            self.profile.user = self.user
+            self.profile.save(update_fields=['user'])
+        self.token = str(AccessToken.for_user(self.user))
+        self.ids = list(StudentProfile.objects.values_list('id', flat=True).order_by('?')[:1000])
+        # Registration's batch title map is loaded once per process; measure the steady state
+        batch_cache.clear()
+        batch_cache.get('BBA 1')
+        # And the country / company alias maps
+        dimensions.countries.resolve('Bangladesh')
+        dimensions.countries.load()
+        dimensions.companies.load()
+        # Likewise the revoked-token list (re-synced every JWT_REVOCATION_SYNC seconds)
+        revoked_tokens.sync()
+        # An offline copy that was current when seeding finished
+        self.sync_cursor = sync.encode_cursor(dict.fromkeys(sync.STREAMS, (timezone.now(), 0)))
+        self.registered = 0
+        self.stdout.write(f'  seeded in {time.perf_counter() - started:.1f}s')
+
+    def _endpoints(self, size):
+        """(name, callable(iteration) -> response) for every benchmarked endpoint"""
+        client = Client()
+        auth = {'HTTP_AUTHORIZATION': f'Bearer {self.token}'}
+        rng = random.Random(size)
+        queries = [rng.choice(FIRST_NAMES + LAST_NAMES)[:rng.randint(2, 6)] for _ in range(100)]
+
+        def register(i):
+            self.registered += 1
+            number = f'{size}-{self.registered}'
+            return client.post('/api/v1/register', {
+                'username': f'bench{number}', 'password': PASSWORD, 'email': f'bench{number}@example.com',
+                'first_name': 'Bench', 'last_name': 'User', 'batch': 'BBA 1',
+            }, content_type='application/json')
+
+        def profile_patch(i):
+            return client.patch(
+                f'/api/v1/profile/{self.profile.id}/', {'bio': f'Benchmark bio {i}'},
+                content_type='application/json', HTTP_IF_MATCH='*', **auth
+            )
+
+        def verify(i):
+            return client.post(f'/api/v1/admin/verify/{self.ids[i % len(self.ids)]}/verify/', **auth)
+
+        def verify_bulk(i):
+            ids = [self.ids[(i * 20 + n) % len(self.ids)] for n in range(20)]
+            return client.post('/api/v1/admin/verify/bulk/', {'ids': ids}, content_type='application/json', **auth)
+
+        return [
+            ('register', register),
+            ('login', lambda i: client.post(
+                '/api/v1/login', {'username': self.user.username, 'password': PASSWORD},
+                content_type='application/json'
+            )),
+            ('profile-list', lambda i: client.get('/api/v1/profile/', {'page_size': 50})),
+            ('profile-list-filtered', lambda i: client.get(
+                '/api/v1/profile/', {'page_size': 50, 'country': 'canada', 'is_cr': 'false'}
+            )),
+            ('profile-detail', lambda i: client.get(f'/api/v1/profile/{self.ids[i % len(self.ids)]}/')),
+            ('profile-patch', profile_patch),
+            ('search', lambda i: client.get('/api/v1/search', {'q': queries[i % len(queries)]})),
+            ('stats', lambda i: client.get('/api/v1/stats')),
+            ('sync', lambda i: client.get('/api/v1/sync', {'cursor': self.sync_cursor})),
+            ('verify-list', lambda i: client.get('/api/v1/admin/verify/', {'page_size': 50}, **auth)),
+            ('verify', verify),
+            ('verify-bulk', verify_bulk),
+        ]
+
+    # ------------------------------------------------------------------
+    # Measuring
+    # ------------------------------------------------------------------
+
+    def _measure(self, run, iterations):
+        timings = []
+        max_queries = 0
+        for i in range(iterations):
+            with CaptureQueriesContext(connection) as captured:
+                started = time.perf_counter()
+                response = run(i)
+                timings.append(time.perf_counter() - started)
+            if response.status_code >= 400:
+                raise CommandError(f'{response.request["PATH_INFO"]} returned {response.status_code}: '
+                                   f'{response.content[:200]!r}')
+            max_queries = max(max_queries, len(captured))
+
+        # One more request under tracemalloc for the memory peak (tracing
+        # slows everything down, so it's kept out of the timings)
+        tracemalloc.start()
+        try:
+            run(iterations)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        timings.sort()
+        return {
+            'p50_ms': round(statistics.median(timings) * 1000, 3),
+            'p95_ms': round(self._percentile(timings, 0.95) * 1000, 3),
+            'p99_ms': round(self._percentile(timings, 0.99) * 1000, 3),
+            'queries': max_queries,
+            'peak_kb': round(peak / 1024, 1),
+        }
+
+    def _percentile(self, timings, fraction):
+        return timings[min(int(len(timings) * fraction), len(timings) - 1)]
+
+    def _compare(self, baseline, results, threshold):
+        """Regressions of `results` against a baseline report"""
+        regressions = []
+        for size, endpoints in results.items():
+            for name, result in endpoints.items():
+                before = baseline.get('results', {}).get(size, {}).get(name)
+                if not before:
+                    continue
+                if result['queries'] > before['queries']:
+                    regressions.append(f'{size} {name}: {before["queries"]} -> {result["queries"]} queries')
+                for key in ('p50_ms', 'p99_ms', 'peak_kb'):
+                    # Small absolute slack so sub-millisecond noise doesn't fail the run
+                    slack = 0.5 if key.endswith('_ms') else 16
+                    if result[key] > before[key] * (1 + threshold) + slack:
+                        regressions.append(f'{size} {name}: {key} {before[key]} -> {result[key]}')
+        return regressions
@@ -0,0 +1,109 @@
+import asyncio
+import statistics
+import time
+from urllib.parse import urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = (
+        'Hammer running servers with many concurrent keep-alive clients and report '
+        'requests/s and latency percentiles. Compare the ASGI and WSGI deployments, e.g.\n'
+        '  uvicorn config.asgi:application --port 8001          (async views)\n'
+        '  gunicorn config.wsgi -w 1 --threads 16 -b :8002      (DRF views)\n'
+        '  manage.py bench_concurrency http://127.0.0.1:8001/api/v1/async/search?q=ra '
+        'http://127.0.0.1:8002/api/v1/search?q=ra'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('urls', nargs='+', help='URLs to benchmark, one after the other')
+        parser.add_argument('--clients', type=int, default=1000, help='Concurrent connections (mind ulimit -n)')
+        parser.add_argument('--requests', type=int, default=20000, help='Requests per URL')
+        parser.add_argument('--timeout', type=float, default=30, help='Seconds before a request counts as failed')
+        parser.add_argument('--header', action='append', default=[], help='Extra request header, "Name: value"')
+
+    def handle(self, *args, **options):
+        self.stdout.write(
+            f'{"url":<50}  {"ok":>7}  {"errors":>6}  {"req/s":>8}  {"p50":>8}  {"p99":>8}  {"max":>8}'
+        )
+        for url in options['urls']:
+            parts = urlsplit(url)
+            if parts.scheme != 'http' or not parts.hostname:
+                raise CommandError(f'Only plain http:// URLs are supported: {url}')
+
+            latencies, errors, elapsed = asyncio.run(self._run(parts, options))
+            self._report(url, latencies, errors, elapsed)
+
+    async def _run(self, parts, options):
+        target = parts.path or '/'
+        if parts.query:
+            target += f'?{parts.query}'
+        headers = ''.join(f'{header}\r\n' for header in options['header'])
+        request = (
+            f'GET {target} HTTP/1.1\r\nHost: {parts.netloc}\r\n{headers}Connection: keep-alive\r\n\r\n'
+        ).encode()
+
+        remaining = [options['requests']]
+        latencies = []
+        errors = [0]
+
+        async def client():
+            reader = writer = None
+            while remaining[0] > 0:
+                remaining[0] -= 1
+                started = time.perf_counter()
+                try:
+                    if writer is None:
+                        reader, writer = await asyncio.open_connection(parts.hostname, parts.port or 80)
+                    writer.write(request)
+                    status = await asyncio.wait_for(self._read_response(reader), options['timeout'])
+                except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, ValueError):
+                    errors[0] += 1
+                    if writer is not None:
+                        writer.close()
+                    reader = writer = None
+                    continue
+                if status == 200:
+                    latencies.append(time.perf_counter() - started)
+                else:
+                    errors[0] += 1
+            if writer is not None:
+                writer.close()
+
+        started = time.perf_counter()
+        await asyncio.gather(*(client() for _ in range(options['clients'])))
+        return latencies, errors[0], time.perf_counter() - started
+
+    async def _read_response(self, reader):
+        """Read one HTTP/1.1 response, returning its status code"""
+        head = await reader.readuntil(b'\r\n\r\n')
+        lines = head.decode('latin-1').split('\r\n')
+        status = int(lines[0].split()[1])
+        headers = {}
+        for line in lines[1:]:
+            if ':' in line:
+                name, value = line.split(':', 1)
+                headers[name.strip().lower()] = value.strip()
+
+        if 'content-length' in headers:
+            await reader.readexactly(int(headers['content-length']))
+        elif headers.get('transfer-encoding', '').lower() == 'chunked':
+            while True:
+                size = int((await reader.readuntil(b'\r\n')).split(b';')[0], 16)
+                await reader.readexactly(size + 2)
+                if size == 0:
+                    break
+        return status
+
+    def _report(self, url, latencies, errors, elapsed):
+        if not latencies:
+            self.stdout.write(f'{url[:50]:<50}  {0:>7}  {errors:>6}  (no successful requests)')
+            return
+        latencies.sort()
+        p50 = statistics.median(latencies) * 1000
+        p99 = latencies[max(int(len(latencies) * 0.99) - 1, 0)] * 1000
+        self.stdout.write(
+            f'{url[:50]:<50}  {len(latencies):>7}  {errors:>6}  {len(latencies) / elapsed:>8.0f}  '
+            f'{p50:>6.1f}ms  {p99:>6.1f}ms  {latencies[-1] * 1000:>6.1f}ms'
+        )
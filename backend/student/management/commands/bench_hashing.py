@@ -0,0 +1,60 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth import hashers
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+
+from config import hashing
+
+
+class Command(BaseCommand):
+    help = 'Report password checks (logins) per second per core, before and after the hashing settings'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--logins', type=int, default=20, help='Password checks per measurement')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='Hash pool size to measure')
+
+    def handle(self, *args, **options):
+        logins = options['logins']
+        workers = options['workers']
+
+        # Before: Django's stock PBKDF2 cost, inline on the request thread
+        baseline = hashers.PBKDF2PasswordHasher()
+        encoded = baseline.encode('correct horse', baseline.salt())
+        rate = self._inline(lambda: baseline.verify('correct horse', encoded), logins)
+        self._report(f'before: {baseline.algorithm} x{baseline.iterations} inline', rate, 1)
+
+        # After: the configured preferred hasher, inline and through the pool
+        preferred = hashers.get_hasher('default')
+        encoded = hashers.make_password('correct horse')
+        rate = self._inline(lambda: hashers.verify_password('correct horse', encoded), logins)
+        self._report(f'after:  {preferred.algorithm} ({self._cost(preferred)}) inline', rate, 1)
+
+        with override_settings(PASSWORD_HASH_WORKERS=workers):
+            hashing.verify_password('correct horse', encoded)  # start the pool
+            started = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=workers * 2) as threads:
+                list(threads.map(
+                    lambda _: hashing.verify_password('correct horse', encoded),
+                    range(logins * workers)
+                ))
+            rate = logins * workers / (time.perf_counter() - started)
+            hashing.shutdown()
+        self._report(f'after:  {preferred.algorithm} pool of {workers}', rate, workers)
+
+    def _inline(self, check, logins):
+        started = time.perf_counter()
+        for _ in range(logins):
+            check()
+        return logins / (time.perf_counter() - started)
+
+    def _cost(self, hasher):
+        for attribute in ('iterations', 'rounds', 'time_cost'):
+            if hasattr(hasher, attribute):
+                return f'{attribute}={getattr(hasher, attribute)}'
+        return 'default cost'
+
+    def _report(self, label, rate, cores):
+        self.stdout.write(f'{label:<45} {rate:>8.1f} logins/s  {rate / cores:>8.1f} logins/s/core')
@@ -0,0 +1,71 @@
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+
+from student import search
+from student.search_index import ProfileSearchIndex
+from student.synthetic import synthetic_rows, seed_directory, scratch_database, FIRST_NAMES, LAST_NAMES
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the in-memory search index against the ORM search path'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 1000000])
+        parser.add_argument('--queries', type=int, default=200)
+        parser.add_argument('--skip-orm', action='store_true', help='Only benchmark the in-memory index')
+
+    def handle(self, *args, **options):
+        queries = self._queries(options['queries'])
+
+        self.stdout.write(f'{"size":>9}  {"path":<10}  {"build":>8}  {"p50":>10}  {"p99":>10}')
+        for size in options['sizes']:
+            index = ProfileSearchIndex()
+            started = time.perf_counter()
+            index.build(
+                (number, row['first_name'], row['last_name'], row['uni_id'], row['email'], row['phone'])
+                for number, row in enumerate(synthetic_rows(size), start=1)
+            )
+            build = time.perf_counter() - started
+            self._report(size, 'memory', build, [self._time(index.search, query) for query in queries])
+
+        if options['skip_orm']:
+            return
+
+        with scratch_database():
+            for size in options['sizes']:
+                started = time.perf_counter()
+                seed_directory(size)
+                search.rebuild_index()
+                build = time.perf_counter() - started
+
+                for backend in ('orm', 'fulltext'):
+                    with override_settings(STUDENT_SEARCH_BACKEND=backend, STUDENT_SEARCH_INMEMORY=False):
+                        timings = [
+                            self._time(lambda query: list(search.search_profiles(query)), query)
+                            for query in queries
+                        ]
+                    self._report(size, backend, build, timings)
+
+    def _queries(self, count):
+        """Search-as-you-type prefixes of names and uni_ids, 2 to 6 characters long"""
+        rng = random.Random(1)
+        queries = []
+        for _ in range(count):
+            term = rng.choice([rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES), f'20{rng.randint(10, 24)}000'])
+            queries.append(term[:rng.randint(2, 6)])
+        return queries
+
+    def _time(self, func, query):
+        started = time.perf_counter()
+        func(query)
+        return time.perf_counter() - started
+
+    def _report(self, size, path, build, timings):
+        timings = sorted(timings)
+        p50 = statistics.median(timings) * 1e6
+        p99 = timings[int(len(timings) * 0.99) - 1] * 1e6
+        self.stdout.write(f'{size:>9}  {path:<10}  {build:>7.2f}s  {p50:>8.0f}us  {p99:>8.0f}us')
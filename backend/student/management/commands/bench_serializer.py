@@ -0,0 +1,44 @@
+import time
+
+from django.core.management.base import BaseCommand
+from rest_framework.renderers import JSONRenderer
+
+from student.models import StudentProfile
+from student.serializers import StudentProfileSerializer, StudentProfileReadSerializer
+from student.synthetic import seed_directory, scratch_database
+
+
+class Command(BaseCommand):
+    help = 'Report profiles serialized per second by the DRF serializer and the read fast path'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 50000])
+        parser.add_argument('--fields', help='Comma separated sparse fieldset for the fast path')
+
+    def handle(self, *args, **options):
+        renderer = JSONRenderer()
+        fields = options['fields'].split(',') if options['fields'] else None
+
+        self.stdout.write(f'{"rows":>7}  {"path":<12}  {"time":>8}  {"rows/s":>10}')
+        with scratch_database():
+            for size in sorted(options['sizes']):
+                seed_directory(size)
+                profiles = StudentProfile.objects.select_related('batch').order_by('-id')
+
+                self._run(size, 'drf', lambda: renderer.render(
+                    StudentProfileSerializer(profiles, many=True).data
+                ))
+                self._run(size, 'fast', lambda: renderer.render(
+                    StudentProfileReadSerializer().serialize(profiles)
+                ))
+                if fields:
+                    self._run(size, 'fast+fields', lambda: renderer.render(
+                        StudentProfileReadSerializer(fields).serialize(profiles)
+                    ))
+
+    def _run(self, size, path, func):
+        # Query + serialization + JSON rendering, as a list response would pay
+        started = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - started
+        self.stdout.write(f'{size:>7}  {path:<12}  {elapsed:>7.3f}s  {size / elapsed:>10.0f}')
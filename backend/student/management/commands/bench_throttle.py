@@ -0,0 +1,111 @@
+import json
+import logging
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client, RequestFactory
+from django.test.utils import CaptureQueriesContext, override_settings
+
+from config import throttling
+from student.synthetic import scratch_database
+
+
+RATES = {'login': '5/h', 'login-failures': '5/h', 'register': '5/h', 'search': '5/h'}
+
+
+class Command(BaseCommand):
+    help = (
+        'Load test the rate limiter: cost of a rejected request in the token-bucket store '
+        'and through the full Django stack, and store throughput under concurrent threads'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=20000, help='Rejected requests per measurement')
+        parser.add_argument('--threads', type=int, default=8, help='Threads for the concurrency run')
+        parser.add_argument('--keys', type=int, default=1000, help='Distinct client IPs in the concurrency run')
+
+    def handle(self, *args, **options):
+        total = options['requests']
+        # django.request logs a warning for every 429
+        logging.getLogger('django.request').setLevel(logging.ERROR)
+        with override_settings(THROTTLE_ENABLED=True, THROTTLE_RATES=RATES, THROTTLE_CACHE_ALIAS=''), \
+                scratch_database():
+            throttling.store.clear()
+            throttling.counters.clear()
+
+            self.stdout.write(self.style.MIGRATE_HEADING('Rejected request cost'))
+            self._check(total)
+            self._stack(total // 10, 'login', '/api/v1/login', {'username': 'stuffed', 'password': 'x'})
+            self._stack(total // 10, 'search', '/api/v1/search?q=ab', None)
+
+            self.stdout.write(self.style.MIGRATE_HEADING('\nConcurrent store access'))
+            self._concurrent(total, options['threads'], options['keys'])
+
+            self.stdout.write(self.style.MIGRATE_HEADING('\nCounters'))
+            self.stdout.write(json.dumps(throttling.counters.snapshot(), indent=2))
+
+    def _check(self, total):
+        """throttling.check() alone, for an IP whose bucket is empty"""
+        request = RequestFactory().post(
+            '/api/v1/login', {'username': 'stuffed', 'password': 'x'}, content_type='application/json'
+        )
+        while throttling.check(request, 'login') is None:
+            pass
+
+        started = time.perf_counter()
+        for _ in range(total):
+            throttling.check(request, 'login')
+        elapsed = time.perf_counter() - started
+        self.stdout.write(f'  {"check()":<22} {elapsed / total * 1e6:>8.2f}us per rejected request')
+
+    def _stack(self, total, name, path, data):
+        """The same through the test client: handler, middleware chain, 429 response"""
+        client = Client()
+        send = (lambda: client.post(path, data, content_type='application/json')) if data else \
+            (lambda: client.get(path))
+        while send().status_code != 429:
+            pass
+
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            for _ in range(total):
+                response = send()
+            elapsed = time.perf_counter() - started
+        assert response.status_code == 429, response.status_code
+        self.stdout.write(
+            f'  {name + " (full stack)":<22} {elapsed / total * 1e6:>8.2f}us per rejected request, '
+            f'{len(queries)} queries'
+        )
+
+    def _concurrent(self, total, threads, keys):
+        capacity, _ = throttling.parse_rate(RATES['search'])
+        per_thread = total // threads
+        admitted = []
+
+        def hammer(offset):
+            count = 0
+            for i in range(per_thread):
+                key = f'search:10.0.{(offset + i) % keys // 256}.{(offset + i) % keys % 256}'
+                count += not throttling.store.take(key, capacity, capacity / 3600)
+            admitted.append(count)
+
+        throttling.store.clear()
+        workers = [threading.Thread(target=hammer, args=(n * 7,)) for n in range(threads)]
+        started = time.perf_counter()
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        elapsed = time.perf_counter() - started
+
+        done = per_thread * threads
+        self.stdout.write(
+            f'  {threads} threads, {done} takes over {keys} keys: {done / elapsed:,.0f}/s, '
+            f'{elapsed / done * 1e6:.2f}us each'
+        )
+        # Without a lock a racing take can be lost; this shows how many slipped through
+        self.stdout.write(
+            f'  admitted {sum(admitted)} (exactly {min(done, keys * capacity)} with perfect accounting)'
+        )
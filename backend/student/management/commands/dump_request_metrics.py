@@ -0,0 +1,69 @@
+import glob
+import json
+import os
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from config import metrics
+
+
+class Command(BaseCommand):
+    help = 'Merge and print the per-route request histograms written by QueryInstrumentationMiddleware'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--minutes', type=int, default=15, help='Only include the last N minutes')
+        parser.add_argument('--sort', choices=['count', 'p50', 'p99', 'queries', 'sql'], default='p99')
+        parser.add_argument('--json', action='store_true', help='Print the merged stats as JSON')
+
+    def handle(self, *args, **options):
+        cutoff = time.time() - options['minutes'] * 60
+        routes = {}
+        files = glob.glob(os.path.join(settings.REQUEST_METRICS_DIR, 'metrics-*.json'))
+        for path in files:
+            try:
+                with open(path) as handle:
+                    data = json.load(handle)
+            except (OSError, ValueError):
+                continue
+            for route, minutes in data['routes'].items():
+                for minute, stats in minutes.items():
+                    if int(minute) >= cutoff:
+                        metrics.merge_stats(routes.setdefault(route, metrics.new_stats()), stats)
+
+        if not routes:
+            self.stdout.write(self.style.WARNING(
+                f'No request metrics in {settings.REQUEST_METRICS_DIR} for the last {options["minutes"]} minutes '
+                '(is REQUEST_METRICS_ENABLED on?)'
+            ))
+            return
+
+        rows = []
+        for route, stats in routes.items():
+            rows.append({
+                'route': route,
+                'count': stats['count'],
+                'p50': metrics.percentile(stats, 0.50),
+                'p99': metrics.percentile(stats, 0.99),
+                'max': stats['max_ms'],
+                'queries': stats['queries'] / stats['count'],
+                'max_queries': stats['max_queries'],
+                'sql': stats['sql_ms'] / stats['count'],
+            })
+        rows.sort(key=lambda row: row[options['sort']], reverse=True)
+
+        if options['json']:
+            self.stdout.write(json.dumps(rows, indent=2))
+            return
+
+        self.stdout.write(f'{len(files)} worker files, last {options["minutes"]} minutes')
+        self.stdout.write(
+            f'{"route":<45} {"count":>7} {"p50 ms":>8} {"p99 ms":>8} {"max ms":>8} '
+            f'{"queries":>8} {"max q":>6} {"sql ms":>8}'
+        )
+        for row in rows:
+            self.stdout.write(
+                f'{row["route"][:45]:<45} {row["count"]:>7} {row["p50"]:>8.1f} {row["p99"]:>8.1f} '
+                f'{row["max"]:>8.1f} {row["queries"]:>8.1f} {row["max_queries"]:>6} {row["sql"]:>8.2f}'
+            )
@@ -0,0 +1,59 @@
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models.functions import Lower
+
+from config.authentication import MultiFieldAuthBackend
+from student import search
+from student.models import StudentProfile
+
+
+class Command(BaseCommand):
+    help = 'Print the query plan of every hot query and flag full table scans'
+
+    def handle(self, *args, **options):
+        profiles = StudentProfile.objects.select_related('batch')
+
+        # (label, queryset, keyset) - keyset queries walk the primary key in
+        # order and stop at LIMIT, so SQLite's "SCAN" there is not a full scan
+        hot_queries = [
+            ('profile list (page)', profiles.order_by('-id')[:50], True),
+            ('profile list ?batch=', profiles.alias(batch_title_lower=Lower('batch__title')).filter(batch_title_lower='bba 1').order_by('-id')[:50], False),
+            ('profile list ?country=', profiles.filter(country_ref_id=1).order_by('-id')[:50], False),
+            ('profile list ?company=', profiles.filter(company_ref_id__in=[1, 2, 3]).order_by('-id')[:50], False),
+            ('profile list ?is_cr=', profiles.filter(is_cr=True).order_by('-id')[:50], False),
+            ('profile detail', profiles.filter(pk=1), False),
+            ('login (MultiFieldAuthBackend.find_user)', MultiFieldAuthBackend().user_queryset('24230115084')[:1], False),
+            ('verification queue', profiles.filter(is_verified=False).order_by('-id')[:50], False),
+        ]
+
+        scans = 0
+        for label, queryset, keyset in hot_queries:
+            scans += self._report(label, queryset.explain(), keyset)
+
+        if connection.vendor == 'sqlite' and search.is_available():
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f'EXPLAIN QUERY PLAN SELECT rowid FROM {search.INDEX_TABLE} '
+                    f'WHERE {search.INDEX_TABLE} MATCH %s', ['"rahim"']
+                )
+                plan = '\n'.join(str(row[-1]) for row in cursor.fetchall())
+            scans += self._report('search (trigram candidates)', plan)
+
+        if scans:
+            self.stdout.write(self.style.WARNING(f'\n{scans} quer{"y" if scans == 1 else "ies"} still scan a table'))
+        else:
+            self.stdout.write(self.style.SUCCESS('\nNo hot query scans a table'))
+
+    def _report(self, label, plan, keyset=False):
+        scan = not keyset and any(self._is_scan(line) for line in plan.splitlines())
+        style = self.style.WARNING if scan else self.style.SUCCESS
+        self.stdout.write(style(f'\n== {label}{"  [TABLE SCAN]" if scan else ""}'))
+        self.stdout.write(plan)
+        return int(scan)
+
+    def _is_scan(self, line):
+        if connection.vendor == 'sqlite':
+            # "SCAN student_studentprofile" without an index; FTS virtual
+            # table scans ("VIRTUAL TABLE INDEX") are fine
+            return 'SCAN ' in line and 'USING' not in line and 'VIRTUAL TABLE' not in line
+        return 'Seq Scan' in line
@@ -0,0 +1,33 @@
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from student import export
+from student.filters import filter_profiles
+from student.models import StudentProfile
+
+
+class Command(BaseCommand):
+    help = 'Stream the alumni directory as CSV or JSON Lines'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', choices=list(export.FORMATS), default='csv')
+        parser.add_argument('--file', help='Write to this file instead of stdout')
+        parser.add_argument('--chunk-size', type=int, default=settings.EXPORT_CHUNK_SIZE)
+        # Same filters as GET /api/v1/profile/
+        parser.add_argument('--batch')
+        parser.add_argument('--country')
+        parser.add_argument('--is-cr', dest='is_cr')
+        parser.add_argument('--company')
+        parser.add_argument('--position')
+
+    def handle(self, *args, **options):
+        profiles, _ = filter_profiles(StudentProfile.objects.all(), options)
+        chunks = export.stream(profiles, options['output'], chunk_size=options['chunk_size'])
+
+        if options['file']:
+            with open(options['file'], 'w', newline='', encoding='utf-8') as handle:
+                handle.writelines(chunks)
+        else:
+            sys.stdout.writelines(chunks)
@@ -0,0 +1,250 @@
+import csv
+import os
+import time
+from contextlib import nullcontext
+from itertools import islice
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction, IntegrityError
+from django.db.models import Q
+
+from apiv1.cache import bump_generation
+from config.hashing import hash_pool, make_passwords
+from student import dimensions, facets, search
+from student.search_index import rebuild_profile_index
+from student.models import Batch, StudentProfile
+
+
+# Accepted spellings of each column (same names as the registration API)
+COLUMNS = {
+    'uni_id': ('uni_id', 'username'),
+    'email': ('email',),
+    'password': ('password',),
+    'first_name': ('first_name',),
+    'last_name': ('last_name',),
+    'batch': ('batch',),
+    'bio': ('bio',),
+    'profile_pic': ('profile_pic',),
+    'country': ('country',),
+    'current_job_position': ('current_job_position', 'current_position'),
+    'current_company': ('current_company',),
+    'phone': ('phone',),
+    'linkedin': ('linkedin',),
+    'facebook': ('facebook',),
+    'instagram': ('instagram',),
+    'is_cr': ('is_cr',),
+}
+
+
+class Command(BaseCommand):
+    help = 'Bulk import alumni from a CSV or XLSX file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV or XLSX file with one alumnus per row')
+        parser.add_argument('--batch-size', type=int, default=500, help='Rows per bulk insert')
+        parser.add_argument('--hash-workers', type=int, default=os.cpu_count() or 1,
+                            help='Processes used to hash passwords (1 = inline)')
+        parser.add_argument('--rejects', help='Write rejected rows with the reason to this CSV file')
+        parser.add_argument('--verified', action='store_true', help='Mark imported profiles as verified')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        if not os.path.exists(path):
+            raise CommandError(f'File not found: {path}')
+
+        self.verified = options['verified']
+        self.batches = {title.lower(): batch_id for batch_id, title in Batch.objects.values_list('id', 'title')}
+        self.seen_uni_ids = set()
+        self.seen_emails = set()
+        self.created = 0
+        self.rejects = []
+
+        rows = self._read_xlsx(path) if path.lower().endswith('.xlsx') else self._read_csv(path)
+        pool = hash_pool(options['hash_workers']) if options['hash_workers'] > 1 else nullcontext()
+
+        started = time.perf_counter()
+        total = 0
+        with pool:
+            self.pool = pool if options['hash_workers'] > 1 else None
+            while True:
+                chunk = list(islice(rows, options['batch_size']))
+                if not chunk:
+                    break
+                total += len(chunk)
+                self._import_chunk(chunk)
+
+                elapsed = time.perf_counter() - started
+                self.stdout.write(
+                    f'{total} rows read, {self.created} created, {len(self.rejects)} rejected '
+                    f'({total / elapsed:.0f} rows/s)'
+                )
+
+        # bulk_create skips model signals, so refresh what they maintain
+        if self.created:
+            search.rebuild_index()
+            rebuild_profile_index()
+            dimensions.normalize_profiles()
+            facets.rebuild_facets()
+            bump_generation()
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'\nImported {self.created} of {total} rows in {elapsed:.1f}s '
+            f'({self.created / elapsed if elapsed else 0:.0f} profiles/s)'
+        ))
+
+        if self.rejects:
+            self.rejects.sort(key=lambda reject: reject[0])
+            self.stdout.write(self.style.WARNING(f'{len(self.rejects)} rows rejected'))
+            for line, reason, _ in self.rejects[:20]:
+                self.stdout.write(f'  line {line}: {reason}')
+            if options['rejects']:
+                self._write_rejects(options['rejects'])
+                self.stdout.write(f'All rejects written to {options["rejects"]}')
+
+    # ------------------------------------------------------------------
+    # Reading
+    # ------------------------------------------------------------------
+
+    def _read_csv(self, path):
+        with open(path, newline='', encoding='utf-8-sig') as handle:
+            reader = csv.DictReader(handle)
+            for line, row in enumerate(reader, start=2):
+                yield line, self._normalize(row)
+
+    def _read_xlsx(self, path):
+        try:
+            from openpyxl import load_workbook
+        except ImportError:
+            raise CommandError('Reading .xlsx files requires openpyxl (pip install openpyxl)')
+
+        workbook = load_workbook(path, read_only=True, data_only=True)
+        rows = workbook.active.iter_rows(values_only=True)
+        header = [str(cell or '').strip() for cell in next(rows, [])]
+        for line, values in enumerate(rows, start=2):
+            yield line, self._normalize(dict(zip(header, values)))
+        workbook.close()
+
+    def _normalize(self, row):
+        row = {str(key).strip().lower(): value for key, value in row.items() if key}
+        data = {}
+        for field, names in COLUMNS.items():
+            value = next((row[name] for name in names if row.get(name) not in (None, '')), None)
+            data[field] = str(value).strip() if value is not None else None
+        return data
+
+    # ------------------------------------------------------------------
+    # Loading
+    # ------------------------------------------------------------------
+
+    def _import_chunk(self, chunk):
+        valid = []
+        for line, data in chunk:
+            reason = self._validate(data)
+            if reason:
+                self.rejects.append((line, reason, data))
+            else:
+                valid.append((line, data))
+
+        # One lookup per chunk for identifiers that already exist
+        uni_ids = {data['uni_id'] for _, data in valid if data['uni_id']}
+        emails = {data['email'] for _, data in valid}
+        taken = set()
+        for uni_id, email in StudentProfile.objects.filter(
+            Q(uni_id__in=uni_ids) | Q(email__in=emails)
+        ).values_list('uni_id', 'email'):
+            taken.update((uni_id, email))
+        for username, email in User.objects.filter(
+            Q(username__in=uni_ids | emails) | Q(email__in=emails)
+        ).values_list('username', 'email'):
+            taken.update((username, email))
+        taken.discard('')
+
+        rows = []
+        for line, data in valid:
+            if data['uni_id'] in taken or data['email'] in taken:
+                self.rejects.append((line, 'uni_id or email already registered', data))
+                continue
+            rows.append((line, data))
+
+        if not rows:
+            return
+
+        passwords = make_passwords([data['password'] for _, data in rows], pool=self.pool)
+
+        try:
+            with transaction.atomic():
+                self._insert(rows, passwords)
+            self.created += len(rows)
+        except IntegrityError:
+            # Someone registered concurrently; fall back to row by row so
+            # only the conflicting rows are rejected
+            for row, password in zip(rows, passwords):
+                try:
+                    with transaction.atomic():
+                        self._insert([row], [password])
+                    self.created += 1
+                except IntegrityError as e:
+                    self.rejects.append((row[0], f'database rejected row: {e}', row[1]))
+
+    def _validate(self, data):
+        # StudentProfile.email is unique, so a blank one could only be stored once
+        for field in ('first_name', 'last_name', 'email', 'batch'):
+            if not data[field]:
+                return f'missing {field}'
+        if data['batch'].lower() not in self.batches:
+            return f"batch '{data['batch']}' does not exist"
+
+        # Registration falls back to the email when there is no uni_id
+        data['uni_id'] = data['uni_id'] or data['email']
+        if data['uni_id'] in self.seen_uni_ids:
+            return 'duplicate uni_id in file'
+        if data['email'] in self.seen_emails:
+            return 'duplicate email in file'
+        self.seen_uni_ids.add(data['uni_id'])
+        self.seen_emails.add(data['email'])
+        return None
+
+    def _insert(self, rows, passwords):
+        users = User.objects.bulk_create([
+            User(
+                username=data['uni_id'],
+                email=User.objects.normalize_email(data['email']),
+                first_name=data['first_name'],
+                last_name=data['last_name'],
+                password=password,
+            )
+            for (_, data), password in zip(rows, passwords)
+        ])
+
+        StudentProfile.objects.bulk_create([
+            StudentProfile(
+                user=user,
+                first_name=data['first_name'],
+                last_name=data['last_name'],
+                uni_id=data['uni_id'],
+                email=data['email'],
+                bio=data['bio'],
+                profile_pic=data['profile_pic'],
+                batch_id=self.batches[data['batch'].lower()],
+                country=data['country'] or 'Bangladesh',
+                current_job_position=data['current_job_position'],
+                current_company=data['current_company'],
+                phone=data['phone'],
+                linkedin=data['linkedin'],
+                facebook=data['facebook'],
+                instagram=data['instagram'],
+                is_cr=(data['is_cr'] or '').lower() in ('true', '1', 'yes'),
+                is_verified=self.verified,
+            )
+            for (_, data), user in zip(rows, users)
+        ])
+
+    def _write_rejects(self, path):
+        with open(path, 'w', newline='', encoding='utf-8') as handle:
+            writer = csv.writer(handle)
+            writer.writerow(['line', 'reason', *COLUMNS])
+            for line, reason, data in self.rejects:
+                row = {**data, 'password': ''}
+                writer.writerow([line, reason, *(row.get(field) or '' for field in COLUMNS)])
@@ -0,0 +1,44 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from student.models import StudentProfile
+
+
+class Command(BaseCommand):
+    help = 'Backfill StudentProfile.user for profiles created before the link existed'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+
+        # Read the (id, uni_id) pairs up front so the table isn't updated
+        # while a cursor is still open on it
+        unlinked = list(
+            StudentProfile.objects.filter(user__isnull=True).values_list('id', 'uni_id')
+        )
+
+        linked = 0
+        for start in range(0, len(unlinked), batch_size):
+            chunk = unlinked[start:start + batch_size]
+
+            # Registration stores the uni_id (or the email when there is
+            # none) as the username
+            user_ids = dict(
+                User.objects.filter(
+                    username__in=[uni_id for _, uni_id in chunk]
+                ).values_list('username', 'id')
+            )
+            profiles = [
+                StudentProfile(id=profile_id, user_id=user_ids[uni_id])
+                for profile_id, uni_id in chunk
+                if uni_id in user_ids
+            ]
+            StudentProfile.objects.bulk_update(profiles, ['user'])
+            linked += len(profiles)
+
+        self.stdout.write(self.style.SUCCESS(f'Linked {linked} profiles'))
+        if linked < len(unlinked):
+            self.stdout.write(
+                self.style.WARNING(f'{len(unlinked) - linked} profiles have no matching user')
+            )
@@ -0,0 +1,28 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from apiv1.cache import bump_generation
+from student import dimensions, facets
+
+
+class Command(BaseCommand):
+    help = (
+        'Resolve every profile\'s country and company to their canonical rows (student.dimensions) '
+        'and recompute the facet counts'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default='default')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        changed = dimensions.normalize_profiles(using=options['database'])
+        rows = facets.rebuild_facets(using=options['database'])
+        bump_generation()
+
+        for field, count in changed.items():
+            self.stdout.write(f'{field}: {count} profiles updated')
+        self.stdout.write(
+            self.style.SUCCESS(f'Normalized and rebuilt {rows} facet rows in {time.perf_counter() - started:.2f}s')
+        )
@@ -0,0 +1,31 @@
+import time
+
+from django.core.management.base import BaseCommand
+from student import search
+from student.search_index import rebuild_profile_index
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the full-text search index used by /api/v1/search'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=2000)
+        parser.add_argument('--database', default='default')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        total = search.rebuild_index(
+            chunk_size=options['chunk_size'],
+            using=options['database']
+        )
+        rebuild_profile_index(options['database'])
+
+        if not search.is_available(options['database']):
+            self.stdout.write(
+                self.style.WARNING('Full-text search is not supported on this database, nothing to do')
+            )
+            return
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Indexed {total} profiles in {time.perf_counter() - started:.2f}s')
+        )
@@ -0,0 +1,41 @@
+import logging
+import signal
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from config import tasks
+
+
+class Command(BaseCommand):
+    help = 'Run queued background tasks (config.tasks); use with TASKS_MODE=worker'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Run the tasks due now, then exit')
+        parser.add_argument('--batch', type=int, default=100, help='Tasks claimed per round trip')
+
+    def handle(self, *args, **options):
+        logging.getLogger('config.tasks').setLevel(logging.INFO)
+        self.stopping = False
+        signal.signal(signal.SIGTERM, self._stop)
+        signal.signal(signal.SIGINT, self._stop)
+
+        done = 0
+        while not self.stopping:
+            count = tasks.run_pending(limit=options['batch'])
+            done += count
+            if count:
+                self.stdout.write(f'{done} tasks run')
+                continue
+            if options['once']:
+                break
+            close_old_connections()
+            time.sleep(settings.TASK_POLL)
+
+        self.stdout.write(self.style.SUCCESS(f'Stopped after {done} tasks'))
+
+    def _stop(self, signum, frame):
+        # Finish the current batch first
+        self.stopping = True
@@ -0,0 +1,83 @@
+import json
+import os
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from config import warmup
+
+
+# Run in a fresh interpreter by --cold: load the app the way a web worker
+# does (config.wsgi runs config.warmup.startup) and time two requests
+COLD_START = '''
+import json, sys
+from time import perf_counter
+
+import config.wsgi
+from config.warmup import cold_start
+from django.test import Client
+
+client = Client()
+first = client.get(sys.argv[1])
+started = perf_counter()
+client.get(sys.argv[1])
+report = cold_start.report()
+report['status'] = first.status_code
+report['second_response_ms'] = round((perf_counter() - started) * 1000, 2)
+print(json.dumps(report))
+'''
+
+
+class Command(BaseCommand):
+    help = (
+        'Run the worker warm-up stages (config.warmup) and report how long each took; '
+        'with --cold, measure import, warm-up and first response time of a fresh process'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--stage', action='append', choices=list(warmup.STAGES),
+            help='Only run this stage (repeatable; default: all)'
+        )
+        parser.add_argument('--cold', action='store_true', help='Measure a freshly started process instead')
+        parser.add_argument('--path', default='/api/v1/profile/', help='First request of the --cold run')
+        parser.add_argument('--no-warm', action='store_true', help='--cold with WARMUP_ENABLED off, for comparison')
+        parser.add_argument('--json', action='store_true', help='Print the timings as one JSON object')
+
+    def handle(self, *args, **options):
+        if options['cold']:
+            report = self.cold(options['path'], warm=not options['no_warm'])
+        else:
+            stages = options['stage'] or list(warmup.STAGES)
+            timings = warmup.warm(stages)
+            report = {
+                'warm_ms': round(sum(timings.values()) * 1000, 2),
+                'stages_ms': {name: round(seconds * 1000, 2) for name, seconds in timings.items()},
+            }
+            failed = [name for name in stages if name not in timings]
+            if failed:
+                raise CommandError(f'Warm-up stages failed: {", ".join(failed)} (see the log above)')
+
+        if options['json']:
+            self.stdout.write(json.dumps(report))
+            return
+        for name, value in report.items():
+            if name == 'stages_ms':
+                for stage, ms in value.items():
+                    self.stdout.write(f'  {stage:<16} {ms:>9.2f} ms')
+            elif name.endswith('_ms'):
+                self.stdout.write(f'{name[:-3]:<18} {value:>9.2f} ms' if value is not None else f'{name[:-3]:<18} -')
+            else:
+                self.stdout.write(f'{name:<18} {value}')
+
+    def cold(self, path, warm=True):
+        env = {**os.environ, 'WARMUP_ENABLED': str(warm)}
+        result = subprocess.run(
+            [sys.executable, '-c', COLD_START, path],
+            cwd=settings.BASE_DIR, env=env, capture_output=True, text=True
+        )
+        if result.returncode:
+            raise CommandError(f'Cold start failed:\n{result.stderr}')
+        return json.loads(result.stdout.strip().splitlines()[-1])
@@ -1,19 +1,87 @@
+from django.contrib.auth.models import User
 from django.db import models
-
+from django.db.models import Q
+from django.db.models.functions import Lower
+from django.utils import timezone
 
 
 
 class Batch(models.Model):
     title = models.CharField(max_length=100)
     session =  models.CharField(max_length=20)
+    # Set on every save; GET /api/v1/sync pages on it (student.sync)
+    updated_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            # GET /profile/?batch= (case-insensitive title match, filtered on
+            # the same Lower('title') expression; iexact compiles to LIKE /
+            # UPPER() and can't use it)
+            models.Index(Lower('title'), name='batch_title_lower_idx'),
+            # GET /api/v1/sync
+            models.Index(fields=['updated_at', 'id'], name='batch_sync_idx'),
+        ]
 
     def __str__(self):
         return f"{self.title} ({self.session})"
+
+    def save(self, *args, **kwargs):
+        self.updated_at = timezone.now()
+        if kwargs.get('update_fields') is not None:
+            kwargs['update_fields'] = {*kwargs['update_fields'], 'updated_at'}
+        super().save(*args, **kwargs)
     
 
 
     
 
+class Country(models.Model):
+    """Canonical country; spellings map to it through CountryAlias (student.dimensions)"""
+    name = models.CharField(max_length=100)
+
+    class Meta:
+        verbose_name_plural = 'countries'
+
+    def __str__(self):
+        return self.name
+
+
+class CountryAlias(models.Model):
+    # Normalized spelling (student.dimensions.country_key)
+    key = models.CharField(max_length=100, unique=True)
+    country = models.ForeignKey(Country, on_delete=models.CASCADE, related_name='aliases')
+
+    class Meta:
+        verbose_name_plural = 'country aliases'
+
+    def __str__(self):
+        return f"{self.key} -> {self.country_id}"
+
+
+class Company(models.Model):
+    """Canonical company; spellings map to it through CompanyAlias (student.dimensions)"""
+    name = models.CharField(max_length=200)
+
+    class Meta:
+        verbose_name_plural = 'companies'
+
+    def __str__(self):
+        return self.name
+
+
+class CompanyAlias(models.Model):
+    # Normalized spelling (student.dimensions.company_key)
+    key = models.CharField(max_length=200, unique=True)
+    company = models.ForeignKey(Company, on_delete=models.CASCADE, related_name='aliases')
+
+    class Meta:
+        verbose_name_plural = 'company aliases'
+
+    def __str__(self):
+        return f"{self.key} -> {self.company_id}"
+
+
+
 class Role(models.Model):
     title = models.CharField(max_length=100)
 
@@ -23,17 +91,25 @@ class Role(models.Model):
 
 
 class StudentProfile(models.Model):
+    user = models.OneToOneField(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='student_profile')
     first_name = models.CharField(max_length=30)
     last_name = models.CharField(max_length=30)
-    uni_id = models.CharField(max_length=20)
+    uni_id = models.CharField(max_length=20, unique=True)
     bio = models.TextField(blank=True, null=True)
     profile_pic =  models.URLField(blank=True, null=True)
+    # SHA-256 of an uploaded picture; its variants are stored by student.pictures
+    profile_pic_hash = models.CharField(max_length=64, blank=True, null=True)
     batch = models.ForeignKey(Batch, on_delete=models.CASCADE, related_name='students') 
     country = models.CharField(max_length=100, blank=True, null=True, default='Bangladesh')
 
     current_job_position = models.CharField(max_length=200, blank=True, null=True)
     current_company = models.CharField(max_length=200, blank=True, null=True)
 
+    # `country` / `current_company` resolved to their canonical rows on save
+    # (student.dimensions); filters and facets use these
+    country_ref = models.ForeignKey(Country, on_delete=models.SET_NULL, null=True, blank=True, related_name='profiles')
+    company_ref = models.ForeignKey(Company, on_delete=models.SET_NULL, null=True, blank=True, related_name='profiles')
+
 
     #contact
     email = models.EmailField(unique=True)
@@ -45,8 +121,49 @@ class StudentProfile(models.Model):
     is_cr = models.BooleanField(default=False)
     is_verified = models.BooleanField(default=False)
 
+    # Bumped on every change; the profile's ETag (apiv1.conditional)
+    revision = models.PositiveIntegerField(default=1)
+    # Set with every revision; GET /api/v1/sync pages on it (student.sync)
+    updated_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            # GET /profile/?is_cr=true ordered by -id (CRs are a small slice;
+            # is_cr=false pages are served by the primary key)
+            models.Index(fields=['-id'], condition=Q(is_cr=True), name='profile_cr_idx'),
+            # Login by phone number (MultiFieldAuthBackend)
+            models.Index(fields=['phone'], name='profile_phone_idx'),
+            # Verification queue: only the unverified rows are indexed
+            models.Index(fields=['-id'], condition=Q(is_verified=False), name='profile_unverified_idx'),
+            # GET /api/v1/sync
+            models.Index(fields=['updated_at', 'id'], name='profile_sync_idx'),
+        ]
+
     def __str__(self):
         return f"{self.first_name} {self.last_name} - {self.batch.title}"
+
+    def save(self, *args, **kwargs):
+        # Every saved change is a new revision, including update_fields saves
+        self.updated_at = timezone.now()
+        if not self._state.adding:
+            self.revision += 1
+            deferred = self.get_deferred_fields()
+            if kwargs.get('update_fields') is None and deferred:
+                # Django would save only the loaded fields, without the refs
+                # the pre_save signal sets
+                kwargs['update_fields'] = [
+                    field.attname for field in self._meta.concrete_fields
+                    if not field.primary_key and field.attname not in deferred
+                ]
+            if kwargs.get('update_fields') is not None:
+                update_fields = {*kwargs['update_fields'], 'revision', 'updated_at'}
+                # Resolved again by the pre_save signal (student.dimensions)
+                if 'country' in update_fields:
+                    update_fields.add('country_ref')
+                if 'current_company' in update_fields:
+                    update_fields.add('company_ref')
+                kwargs['update_fields'] = update_fields
+        super().save(*args, **kwargs)
     
 
 
@@ -56,4 +173,47 @@ class StudentVerification(models.Model):
     student = models.OneToOneField(StudentProfile, on_delete=models.CASCADE, related_name='verification')
 
     def __str__(self):
-        return f"Verification for {self.student.first_name} {self.student.last_name}"
\ No newline at end of file
+        return f"Verification for {self.student.first_name} {self.student.last_name}"
+
+class DirectoryFacet(models.Model):
+    """
+    Materialized profile counts per facet value (student.facets)
+
+    One row per (dimension, value), e.g. ('country', 'Canada') or
+    ('batch', '<batch id>'). Kept current by the StudentProfile signals;
+    `manage.py rebuild_facets` recomputes it after bulk loads.
+    """
+    dimension = models.CharField(max_length=20)
+    value = models.CharField(max_length=200, blank=True)
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['dimension', 'value'], name='facet_dimension_value_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.dimension}={self.value}: {self.count}"
+
+
+class Tombstone(models.Model):
+    """
+    A deleted profile or batch, so GET /api/v1/sync can tell clients to drop
+    it (student.sync). Written by the post_delete signals; pruned after
+    SYNC_TOMBSTONE_DAYS.
+    """
+    PROFILE = 'profile'
+    BATCH = 'batch'
+    KINDS = [(PROFILE, 'Profile'), (BATCH, 'Batch')]
+
+    kind = models.CharField(max_length=10, choices=KINDS)
+    object_id = models.IntegerField()
+    deleted_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['deleted_at', 'id'], name='tombstone_sync_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} {self.object_id} deleted {self.deleted_at:%Y-%m-%d %H:%M}"
@@ -0,0 +1,139 @@
+"""
+Profile picture uploads (requires Pillow)
+
+POST /api/v1/profile/{pk}/picture/ hands the uploaded file to
+store_picture():
+
+- the upload is hashed (SHA-256) first; when that content has been stored
+  before, nothing is decoded and the existing files are reused
+- otherwise the image is decoded once (JPEGs straight at reduced scale via
+  draft mode), and each PROFILE_PIC_SIZES variant is cropped, resized and
+  encoded to WebP in a shared thread pool (Pillow releases the GIL while
+  resizing and encoding)
+- variants are written to default_storage under
+  avatars/<hash[:2]>/<hash>/<size>.webp. A path's content never changes,
+  so they're served with an immutable Cache-Control (serve_picture, or the
+  same header on the front-end web server)
+
+The profile keeps the hash in `profile_pic_hash`; serializers return the
+PROFILE_PIC_LIST_SIZE variant in place of `profile_pic`.
+"""
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+
+
+# Formats accepted for upload (Pillow format names)
+FORMATS = {'JPEG', 'PNG', 'WEBP', 'GIF'}
+
+_executor = None
+_lock = threading.Lock()
+
+
+class PictureError(ValueError):
+    """The upload isn't an acceptable image; the message is shown to the client"""
+
+
+def picture_path(digest, size):
+    return f'avatars/{digest[:2]}/{digest}/{size}.webp'
+
+
+def picture_url(digest, size=None):
+    """URL of a stored variant (the list size by default)"""
+    return settings.MEDIA_URL + picture_path(digest, size or settings.PROFILE_PIC_LIST_SIZE)
+
+
+def profile_pic(digest, url):
+    """What serializers return as `profile_pic`: the small stored variant, else the legacy URL"""
+    return picture_url(digest) if digest else url
+
+
+def _pool():
+    global _executor
+    if _executor is None:
+        with _lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=settings.PROFILE_PIC_WORKERS, thread_name_prefix='profile-pic'
+                )
+    return _executor
+
+
+def store_picture(upload):
+    """
+    Store an uploaded image file; returns its content hash. Raises
+    PictureError for files that are too large or not a supported image.
+    """
+    if upload.size > settings.PROFILE_PIC_MAX_BYTES:
+        raise PictureError(f'Images can be at most {settings.PROFILE_PIC_MAX_BYTES // (1024 * 1024)} MB.')
+
+    data = b''.join(upload.chunks())
+    digest = hashlib.sha256(data).hexdigest()
+
+    sizes = sorted(set(settings.PROFILE_PIC_SIZES))
+    missing = [size for size in sizes if not default_storage.exists(picture_path(digest, size))]
+    if not missing:
+        # Same image uploaded before (by anyone)
+        return digest
+
+    image = _decode(data, max(missing))
+    for size, encoded in zip(missing, _pool().map(lambda size: _encode(image, size), missing)):
+        path = picture_path(digest, size)
+        # A concurrent upload of the same image may have written it meanwhile
+        if not default_storage.exists(path):
+            default_storage.save(path, ContentFile(encoded))
+    return digest
+
+
+def _decode(data, largest):
+    from PIL import Image, ImageOps
+
+    try:
+        image = Image.open(BytesIO(data))
+        if image.format not in FORMATS:
+            raise PictureError(f'Unsupported image format, use one of: {", ".join(sorted(FORMATS))}.')
+        # From the header, before any pixel is decoded (Pillow's own check
+        # only raises at twice MAX_IMAGE_PIXELS)
+        width, height = image.size
+        if width * height > settings.PROFILE_PIC_MAX_PIXELS:
+            raise PictureError('Image dimensions are too large.')
+        # JPEGs decode directly at the smallest scale still >= the largest variant
+        image.draft('RGB', (largest, largest))
+        image = ImageOps.exif_transpose(image)
+        image = image.convert('RGBA' if 'A' in image.getbands() or 'transparency' in image.info else 'RGB')
+        # Decoded once here; the pool threads only read it
+        image.load()
+    except PictureError:
+        raise
+    except Image.DecompressionBombError:
+        raise PictureError('Image dimensions are too large.')
+    except (OSError, SyntaxError, ValueError):
+        raise PictureError('Upload a valid image.')
+    return image
+
+
+def _encode(image, size):
+    from PIL import Image, ImageOps
+
+    variant = ImageOps.fit(image, (size, size), method=Image.Resampling.LANCZOS)
+    buffer = BytesIO()
+    variant.save(buffer, 'WEBP', quality=settings.PROFILE_PIC_QUALITY, method=4)
+    return buffer.getvalue()
+
+
+def serve_picture(request, path):
+    """
+    Serve a stored variant with immutable caching (development server; in
+    production the web server should serve MEDIA_ROOT/avatars/ with
+    Cache-Control: public, max-age=31536000, immutable)
+    """
+    from django.views.static import serve
+
+    response = serve(request, f'avatars/{path}', document_root=settings.MEDIA_ROOT)
+    response['Cache-Control'] = 'public, max-age=31536000, immutable'
+    return response
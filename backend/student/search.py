@@ -0,0 +1,376 @@
+"""
+Full-text search over the alumni directory
+
+Backs GET /api/v1/search. Instead of OR-ing icontains across every column,
+candidate ids come from a maintained trigram index, which answers the same
+"contains" question (the whole term, case-insensitive, within any column):
+
+- SQLite:     FTS5 virtual table with the trigram tokenizer (SQLite 3.34+),
+              keyed by the profile rowid
+- PostgreSQL: the columns joined into one text column with a pg_trgm GIN
+              index (CREATE EXTENSION pg_trgm needs the privilege)
+
+Trigrams can't find terms shorter than three characters; those use the scan.
+
+The index table is created on `migrate` (post_migrate), recreated and refilled
+when it was built by an older version (word tokens), and kept in sync by
+the StudentProfile / Batch signals in student.signals. Only the bounded
+candidate set is then ranked with the relevance tiers, so search cost no
+longer grows with the size of the directory. Terms matching more than
+STUDENT_SEARCH_CANDIDATES profiles are ranked over every match with the
+scan, since the index's own order (bm25 / similarity) isn't the tiers'.
+
+Set STUDENT_SEARCH_BACKEND = 'orm' to fall back to the plain LIKE scan.
+With STUDENT_SEARCH_INMEMORY the name/id lookups are answered from the
+in-process index in student.search_index first, when its tiers alone fill
+the page.
+"""
+import logging
+import re
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import connections, router, DatabaseError
+from django.db.models import Q, Value, IntegerField, Case, When
+
+from .models import StudentProfile
+from .search_index import get_profile_index, needs_database, profile_index
+
+
+logger = logging.getLogger(__name__)
+
+INDEX_TABLE = 'student_profile_search'
+
+# (column, source field on StudentProfile, bm25 weight)
+INDEX_COLUMNS = [
+    ('first_name', 'first_name', 'A'),
+    ('last_name', 'last_name', 'A'),
+    ('uni_id', 'uni_id', 'A'),
+    ('email', 'email', 'B'),
+    ('phone', 'phone', 'B'),
+    ('batch_title', 'batch__title', 'C'),
+    ('batch_session', 'batch__session', 'C'),
+    ('country', 'country', 'C'),
+    ('current_company', 'current_company', 'C'),
+    ('current_job_position', 'current_job_position', 'C'),
+    ('bio', 'bio', 'D'),
+]
+
+# FTS5 bm25() column weights, same order as INDEX_COLUMNS
+BM25_WEIGHTS = {'A': 10.0, 'B': 5.0, 'C': 2.0, 'D': 1.0}
+
+# Separates the columns in the PostgreSQL document; never part of a match
+SEPARATOR = '\x1f'
+
+# Shortest term the trigram index can answer
+MIN_TERM = 3
+
+# Per-process cache of "does the index table exist" for each database alias
+_index_ready = {}
+
+
+def relevance(query):
+    """
+    Relevance tiers for a search term:
+    1. Exact matches in name/uni_id (highest priority)
+    2. Starts with matches in name
+    3. Contains matches in name
+    4. Matches in other fields
+    """
+    return Case(
+        # Exact match in uni_id (highest priority)
+        When(uni_id__iexact=query, then=Value(100)),
+        # Exact match in first or last name
+        When(Q(first_name__iexact=query) | Q(last_name__iexact=query), then=Value(90)),
+        # Starts with in first or last name
+        When(Q(first_name__istartswith=query) | Q(last_name__istartswith=query), then=Value(80)),
+        # Exact match in email
+        When(email__iexact=query, then=Value(70)),
+        # Exact match in phone
+        When(phone__iexact=query, then=Value(65)),
+        # Starts with in uni_id
+        When(uni_id__istartswith=query, then=Value(60)),
+        # Contains in name
+        When(Q(first_name__icontains=query) | Q(last_name__icontains=query), then=Value(50)),
+        # Batch match
+        When(batch__title__icontains=query, then=Value(40)),
+        # Country match
+        When(country__icontains=query, then=Value(35)),
+        # Company or position match
+        When(Q(current_company__icontains=query) | Q(current_job_position__icontains=query), then=Value(30)),
+        # Email or phone contains
+        When(Q(email__icontains=query) | Q(phone__icontains=query), then=Value(25)),
+        # Bio match (lowest priority)
+        When(bio__icontains=query, then=Value(10)),
+        default=Value(1),
+        output_field=IntegerField()
+    )
+
+
+def search_profiles(query, limit=50):
+    """
+    Return up to `limit` StudentProfile rows matching `query`, best first.
+
+    Uses the in-memory index (when enabled) or the trigram index when it
+    can answer and falls back to the icontains scan otherwise.
+    """
+    index = get_profile_index() if settings.STUDENT_SEARCH_INMEMORY else None
+    profiles = _memory_search(index, query, limit)
+    if profiles is None:
+        profiles = _database_search(query, limit)
+    return profiles
+
+
+async def asearch_profiles(query, limit=50):
+    """
+    search_profiles() for async views. The returned queryset is lazy; only
+    the candidate lookup (raw cursor) and building / syncing the in-memory
+    index run through sync_to_async.
+    """
+    index = None
+    if settings.STUDENT_SEARCH_INMEMORY:
+        # Building or syncing the index queries the database
+        index = await sync_to_async(get_profile_index)() if needs_database() else profile_index
+    profiles = _memory_search(index, query, limit)
+    if profiles is None:
+        profiles = await sync_to_async(_database_search)(query, limit)
+    return profiles
+
+
+def _memory_search(index, query, limit):
+    """
+    Ranked queryset from the in-memory index, None when it's off (no index)
+    or can't fill `limit`: the remaining rows would come from tiers over
+    fields it doesn't hold (batch, country, company, ...)
+    """
+    if index is None:
+        return None
+    ids = index.search(query, limit)
+    if len(ids) < limit:
+        return None
+    # One id__in query that keeps the index's ranking
+    ranking = Case(
+        *[When(id=profile_id, then=Value(position)) for position, profile_id in enumerate(ids)],
+        output_field=IntegerField()
+    )
+    return StudentProfile.objects.filter(id__in=ids).select_related('batch').order_by(ranking)
+
+
+def _database_search(query, limit):
+    ids = None
+    if settings.STUDENT_SEARCH_BACKEND == 'fulltext':
+        cap = settings.STUDENT_SEARCH_CANDIDATES
+        ids = candidate_ids(query, cap + 1, using=router.db_for_read(StudentProfile))
+        if ids is not None and len(ids) > cap:
+            # A broad term: the tiers may rank rows outside the index's top
+            # `cap` first (an exact uni_id or name), so rank every match
+            ids = None
+
+    if ids is None:
+        profiles = StudentProfile.objects.filter(_scan_filter(query))
+    else:
+        profiles = StudentProfile.objects.filter(id__in=ids)
+
+    return profiles.select_related('batch').annotate(
+        relevance=relevance(query)
+    ).order_by('-relevance', 'first_name', 'last_name')[:limit]
+
+
+def _scan_filter(query):
+    """The original OR'd icontains predicate over every searchable column"""
+    search_query = Q()
+    for _, field, _ in INDEX_COLUMNS:
+        search_query |= Q(**{f'{field}__icontains': query})
+    return search_query
+
+
+def _like_pattern(query):
+    """icontains pattern for `query` (LIKE wildcards escaped)"""
+    return '%' + re.sub(r'([\\%_])', r'\\\1', query) + '%'
+
+
+# ---------------------------------------------------------------------------
+# Index access
+# ---------------------------------------------------------------------------
+
+def is_available(using='default'):
+    """True when the index table exists on this database"""
+    if using not in _index_ready:
+        connection = connections[using]
+        if connection.vendor not in ('sqlite', 'postgresql'):
+            _index_ready[using] = False
+        else:
+            with connection.cursor() as cursor:
+                tables = connection.introspection.table_names(cursor)
+            _index_ready[using] = INDEX_TABLE in tables
+    return _index_ready[using]
+
+
+def candidate_ids(query, limit, using='default'):
+    """
+    Ids of the best `limit` profiles with a column containing `query`, or
+    None when the index can't answer (missing table or a term shorter than
+    MIN_TERM characters).
+    """
+    if len(query) < MIN_TERM or SEPARATOR in query or not is_available(using):
+        return None
+
+    connection = connections[using]
+    try:
+        with connection.cursor() as cursor:
+            if connection.vendor == 'sqlite':
+                # One phrase: with the trigram tokenizer it matches a substring
+                match = '"' + query.replace('"', '""') + '"'
+                weights = ', '.join(str(BM25_WEIGHTS[weight]) for _, _, weight in INDEX_COLUMNS)
+                cursor.execute(
+                    f'SELECT rowid FROM {INDEX_TABLE} WHERE {INDEX_TABLE} MATCH %s '
+                    f'ORDER BY bm25({INDEX_TABLE}, {weights}) LIMIT %s',
+                    [match, limit]
+                )
+            else:
+                cursor.execute(
+                    f'SELECT profile_id FROM {INDEX_TABLE} WHERE document ILIKE %s '
+                    f'ORDER BY similarity(document, %s) DESC LIMIT %s',
+                    [_like_pattern(query), query, limit]
+                )
+            return [row[0] for row in cursor.fetchall()]
+    except DatabaseError:
+        return None
+
+
+def _index_kind(connection, cursor):
+    """'trigram' for a current index table, 'words' for one built by an older version, None when missing"""
+    if connection.vendor == 'sqlite':
+        cursor.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = %s", [INDEX_TABLE])
+        row = cursor.fetchone()
+        return None if row is None else 'trigram' if 'trigram' in row[0].lower() else 'words'
+    cursor.execute(
+        'SELECT data_type FROM information_schema.columns '
+        "WHERE table_schema = current_schema() AND table_name = %s AND column_name = 'document'",
+        [INDEX_TABLE]
+    )
+    row = cursor.fetchone()
+    return None if row is None else 'trigram' if row[0] == 'text' else 'words'
+
+
+def create_index(using='default'):
+    """
+    Create the index table, replacing one built by an older version.
+    Returns True when a table was (re)created; rebuild_index() fills it.
+    """
+    connection = connections[using]
+    if connection.vendor not in ('sqlite', 'postgresql'):
+        return False
+    columns = [column for column, _, _ in INDEX_COLUMNS]
+
+    with connection.cursor() as cursor:
+        kind = _index_kind(connection, cursor)
+        if kind == 'trigram':
+            return False
+
+        if connection.vendor == 'sqlite':
+            if kind is not None:
+                cursor.execute(f'DROP TABLE {INDEX_TABLE}')
+            try:
+                cursor.execute(
+                    f'CREATE VIRTUAL TABLE {INDEX_TABLE} '
+                    f"USING fts5({', '.join(columns)}, tokenize='trigram')"
+                )
+            except DatabaseError:
+                # SQLite before 3.34 has no trigram tokenizer: search scans
+                logger.warning('SQLite %s lacks the FTS5 trigram tokenizer, search falls back to the scan',
+                               connection.Database.sqlite_version)
+                _index_ready.pop(using, None)
+                return False
+        else:
+            cursor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+            if kind is not None:
+                cursor.execute(f'DROP TABLE {INDEX_TABLE}')
+            cursor.execute(
+                f'CREATE TABLE {INDEX_TABLE} ('
+                f'profile_id bigint PRIMARY KEY, document text NOT NULL)'
+            )
+            cursor.execute(
+                f'CREATE INDEX {INDEX_TABLE}_document_trgm '
+                f'ON {INDEX_TABLE} USING gin (document gin_trgm_ops)'
+            )
+
+    _index_ready.pop(using, None)
+    return True
+
+
+def index_profiles(profile_ids, using='default'):
+    """(Re)index the given profiles; ids that no longer exist are dropped"""
+    if not profile_ids or not is_available(using):
+        return
+
+    profile_ids = list(profile_ids)
+    fields = [field for _, field, _ in INDEX_COLUMNS]
+    rows = StudentProfile.objects.using(using).filter(
+        id__in=profile_ids
+    ).values_list('id', *fields)
+
+    remove_profiles(profile_ids, using=using)
+    _write_rows(rows, using)
+
+
+def remove_profiles(profile_ids, using='default'):
+    """Delete index rows for the given profile ids"""
+    if not profile_ids or not is_available(using):
+        return
+
+    connection = connections[using]
+    key = 'rowid' if connection.vendor == 'sqlite' else 'profile_id'
+    placeholders = ', '.join(['%s'] * len(profile_ids))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {INDEX_TABLE} WHERE {key} IN ({placeholders})',
+            list(profile_ids)
+        )
+
+
+def rebuild_index(chunk_size=2000, using='default'):
+    """Drop every index row and reindex the whole directory. Returns the row count."""
+    create_index(using)
+    if not is_available(using):
+        return 0
+
+    with connections[using].cursor() as cursor:
+        cursor.execute(f'DELETE FROM {INDEX_TABLE}')
+
+    fields = [field for _, field, _ in INDEX_COLUMNS]
+    rows = StudentProfile.objects.using(using).order_by('id').values_list('id', *fields)
+
+    total = 0
+    chunk = []
+    for row in rows.iterator(chunk_size=chunk_size):
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            total += _write_rows(chunk, using)
+            chunk = []
+    total += _write_rows(chunk, using)
+    return total
+
+
+def _write_rows(rows, using):
+    rows = [tuple('' if value is None else value for value in row) for row in rows]
+    if not rows:
+        return 0
+
+    connection = connections[using]
+    columns = [column for column, _, _ in INDEX_COLUMNS]
+
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            placeholders = ', '.join(['%s'] * (len(columns) + 1))
+            cursor.executemany(
+                f'INSERT INTO {INDEX_TABLE} (rowid, {", ".join(columns)}) VALUES ({placeholders})',
+                rows
+            )
+        else:
+            cursor.executemany(
+                f'INSERT INTO {INDEX_TABLE} (profile_id, document) VALUES (%s, %s) '
+                f'ON CONFLICT (profile_id) DO UPDATE SET document = EXCLUDED.document',
+                [(row[0], SEPARATOR.join(str(value) for value in row[1:])) for row in rows]
+            )
+    return len(rows)
@@ -0,0 +1,311 @@
+"""
+In-process search-as-you-type index over names and contact ids
+
+Keeps first_name, last_name, uni_id, email and phone of every StudentProfile
+in memory as:
+
+- one sorted prefix array of (term, id) pairs per field, answered with bisect
+- a trigram posting list (trigram -> set of ids) for "contains" matches
+- a (first_name, last_name) rank per id for tie-breaking
+
+Hits are ranked with the same tiers as student.search.relevance, down to
+"contains in name": below it come batch, country and company matches, which
+aren't indexed. Tiers are filled from the top and evaluation stops as soon
+as `limit` ids are found, so a keystroke that fills a page costs a few
+bisect/set operations instead of a database query; fewer hits than that
+mean the lower tiers decide, and student.search asks the database instead.
+Rows are hydrated afterwards with a single id__in query.
+
+Enabled with STUDENT_SEARCH_INMEMORY = True. The index is built at worker
+start (config.warmup) or on first use and updated by the post_save /
+post_delete signals in student.signals. Changes made elsewhere (other
+workers, the task worker, bulk_create / queryset.update) are picked up
+incrementally: at most every STUDENT_SEARCH_INMEMORY_SYNC seconds, one
+query for profiles with a newer `updated_at` and one for new profile
+tombstones (the same feeds as GET /api/v1/sync, student.sync). Bulk paths
+in this process call rebuild_profile_index().
+"""
+import heapq
+import threading
+import time
+from bisect import bisect_left
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import StudentProfile, Tombstone
+
+
+INDEX_FIELDS = ('first_name', 'last_name', 'uni_id', 'email', 'phone')
+
+
+def trigrams(value):
+    return {value[i:i + 3] for i in range(len(value) - 2)}
+
+
+class _PrefixArray:
+    """Sorted (term, id) pairs kept as two parallel lists"""
+
+    def __init__(self, pairs=()):
+        pairs = sorted(pairs)
+        self.keys = [term for term, _ in pairs]
+        self.ids = [profile_id for _, profile_id in pairs]
+
+    def add(self, term, profile_id):
+        position = bisect_left(self.keys, term)
+        self.keys.insert(position, term)
+        self.ids.insert(position, profile_id)
+
+    def remove(self, term, profile_id):
+        position = bisect_left(self.keys, term)
+        while position < len(self.keys) and self.keys[position] == term:
+            if self.ids[position] == profile_id:
+                del self.keys[position]
+                del self.ids[position]
+                return
+            position += 1
+
+    def exact(self, term):
+        start = bisect_left(self.keys, term)
+        end = bisect_left(self.keys, term + '\x00', start)
+        return self.ids[start:end]
+
+    def prefix(self, term):
+        # Every key starting with `term` sorts between term and term + U+FFFF
+        start = bisect_left(self.keys, term)
+        end = bisect_left(self.keys, term + '\uffff', start)
+        return self.ids[start:end]
+
+
+class ProfileSearchIndex:
+    """Prefix arrays + trigram postings for the directory, safe to share between threads"""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._docs = {}
+        self._fields = {field: _PrefixArray() for field in INDEX_FIELDS}
+        self._trigrams = {}
+        self._order = []
+        self._rank = {}
+        self._sync_lock = threading.Lock()
+        # updated_at / deleted_at high-water mark and when it was taken
+        self._mark = None
+        self._synced = 0.0
+        self.ready = False
+
+    def __len__(self):
+        return len(self._docs)
+
+    def build(self, rows):
+        """Replace the whole index with `rows` of (id, first, last, uni_id, email, phone)"""
+        docs = {}
+        pairs = {field: [] for field in INDEX_FIELDS}
+        postings = {}
+        for row in rows:
+            profile_id, doc = row[0], self._document(row[1:])
+            docs[profile_id] = doc
+            for field, term in zip(INDEX_FIELDS, doc):
+                if not term:
+                    continue
+                pairs[field].append((term, profile_id))
+                for gram in trigrams(term):
+                    postings.setdefault(gram, set()).add(profile_id)
+
+        fields = {field: _PrefixArray(pairs[field]) for field in INDEX_FIELDS}
+        order = sorted((doc[0], doc[1], profile_id) for profile_id, doc in docs.items())
+
+        with self._lock:
+            self._docs = docs
+            self._fields = fields
+            self._trigrams = postings
+            self._order = order
+            self._renumber()
+            self.ready = True
+
+    def build_from_db(self, using='default'):
+        mark = timezone.now()
+        rows = StudentProfile.objects.using(using).values_list(
+            'id', *INDEX_FIELDS
+        ).iterator(chunk_size=5000)
+        self.build(rows)
+        self._mark, self._synced = mark, time.monotonic()
+
+    def sync_due(self):
+        return self.ready and time.monotonic() - self._synced >= settings.STUDENT_SEARCH_INMEMORY_SYNC
+
+    def sync(self, using='default'):
+        """
+        Apply profiles saved or deleted (by any process) since the last build
+        or sync. Rows stamped within SYNC_SETTLE seconds of the mark are read
+        again, since their transaction may have committed after it. A sync
+        already running in another thread is enough.
+        """
+        if not self._sync_lock.acquire(blocking=False):
+            return
+        try:
+            mark = timezone.now()
+            since = self._mark - timedelta(seconds=settings.SYNC_SETTLE)
+            saved = StudentProfile.objects.using(using).filter(updated_at__gte=since).values_list('id', *INDEX_FIELDS)
+            deleted = Tombstone.objects.using(using).filter(
+                kind=Tombstone.PROFILE, deleted_at__gte=since
+            ).values_list('object_id', flat=True)
+            for row in saved:
+                self.add(row[0], row[1:])
+            for profile_id in deleted:
+                self.remove(profile_id)
+            self._mark, self._synced = mark, time.monotonic()
+        finally:
+            self._sync_lock.release()
+
+    def add(self, profile_id, values):
+        """Insert or replace one profile; `values` follows INDEX_FIELDS"""
+        with self._lock:
+            self._remove(profile_id)
+            doc = self._document(values)
+            self._docs[profile_id] = doc
+            self._insert_rank(profile_id, doc)
+            for field, term in zip(INDEX_FIELDS, doc):
+                if not term:
+                    continue
+                self._fields[field].add(term, profile_id)
+                for gram in trigrams(term):
+                    self._trigrams.setdefault(gram, set()).add(profile_id)
+
+    def remove(self, profile_id):
+        with self._lock:
+            self._remove(profile_id)
+
+    def _remove(self, profile_id):
+        doc = self._docs.pop(profile_id, None)
+        if doc is None:
+            return
+
+        position = bisect_left(self._order, (doc[0], doc[1], profile_id))
+        del self._order[position]
+        del self._rank[profile_id]
+
+        grams = set()
+        for field, term in zip(INDEX_FIELDS, doc):
+            if term:
+                self._fields[field].remove(term, profile_id)
+                grams |= trigrams(term)
+        for gram in grams:
+            posting = self._trigrams.get(gram)
+            if posting is None:
+                continue
+            posting.discard(profile_id)
+            if not posting:
+                del self._trigrams[gram]
+
+    def _renumber(self):
+        self._rank = {profile_id: float(position) for position, (_, _, profile_id) in enumerate(self._order)}
+
+    def _insert_rank(self, profile_id, doc):
+        # New ids get the midpoint of their neighbours' ranks; everything is
+        # renumbered once float precision between two neighbours runs out
+        key = (doc[0], doc[1], profile_id)
+        position = bisect_left(self._order, key)
+        self._order.insert(position, key)
+        before = self._rank[self._order[position - 1][2]] if position > 0 else -1.0
+        after = self._rank[self._order[position + 1][2]] if position + 1 < len(self._order) else before + 2.0
+        rank = (before + after) / 2
+        if before < rank < after:
+            self._rank[profile_id] = rank
+        else:
+            self._renumber()
+
+    def search(self, query, limit=50):
+        """
+        Ids of the best `limit` matches for `query`, highest relevance first,
+        from the tiers the index answers in full. Fewer than `limit` ids
+        means profiles matching on other fields may rank next.
+        """
+        query = query.strip().lower()
+        if not query:
+            return []
+
+        results = []
+        seen = set()
+        with self._lock:
+            for tier in self._tiers(query):
+                tier = set(tier) - seen
+                if not tier:
+                    continue
+                seen |= tier
+                results.extend(self._first_by_name(tier, limit - len(results)))
+                if len(results) >= limit:
+                    break
+        return results
+
+    def _tiers(self, query):
+        """
+        Candidate ids for each relevance tier, best tier first: the tiers of
+        student.search.relevance that only look at indexed fields, which is
+        every tier above the batch match. Generated lazily so lower tiers are
+        only computed when the top ones run short.
+        """
+        fields = self._fields
+        docs = self._docs
+
+        # Exact match in uni_id
+        yield fields['uni_id'].exact(query)
+        # Exact match in first or last name
+        yield fields['first_name'].exact(query) + fields['last_name'].exact(query)
+        # Starts with in first or last name
+        yield fields['first_name'].prefix(query) + fields['last_name'].prefix(query)
+        # Exact match in email / phone
+        yield fields['email'].exact(query)
+        yield fields['phone'].exact(query)
+        # Starts with in uni_id
+        yield fields['uni_id'].prefix(query)
+
+        if len(query) < 3:
+            # Too short for trigrams: "contains in name" is left to the database
+            return
+
+        # Contains in name
+        yield (pid for pid in self._contains(query) if query in docs[pid][0] or query in docs[pid][1])
+
+    def _contains(self, query):
+        postings = [self._trigrams.get(gram) for gram in trigrams(query)]
+        if not all(postings):
+            return set()
+        postings.sort(key=len)
+        return set.intersection(*postings)
+
+    def _first_by_name(self, ids, count):
+        """The `count` ids of `ids` that come first in (first_name, last_name) order"""
+        rank = self._rank.__getitem__
+        if len(ids) <= count:
+            return sorted(ids, key=rank)
+        return heapq.nsmallest(count, ids, key=rank)
+
+    @staticmethod
+    def _document(values):
+        return tuple((value or '').lower() for value in values)
+
+
+profile_index = ProfileSearchIndex()
+
+
+def get_profile_index():
+    """The shared index, built from the database on first use and synced when due"""
+    if not profile_index.ready:
+        with profile_index._lock:
+            if not profile_index.ready:
+                profile_index.build_from_db()
+    elif profile_index.sync_due():
+        profile_index.sync()
+    return profile_index
+
+
+def needs_database():
+    """True when get_profile_index() would query (async callers run it in a thread then)"""
+    return not profile_index.ready or profile_index.sync_due()
+
+
+def rebuild_profile_index(using='default'):
+    """Rebuild this process's index after bulk writes, when it has been built"""
+    if profile_index.ready:
+        profile_index.build_from_db(using)
@@ -1,10 +1,15 @@
 from rest_framework import serializers
 from django.contrib.auth.models import User
 from student.models import StudentProfile, Batch
-from django.db import transaction
+from django.db import IntegrityError, transaction
+from django.db.models import Q, Value
+from config.hashing import make_password
+from student.batches import batch_cache
+from student.pictures import profile_pic
+from config.metrics import TimedSerializerMixin, timed
 
 
-class StudentRegistrationSerializer(serializers.Serializer):
+class StudentRegistrationSerializer(TimedSerializerMixin, serializers.Serializer):
     username = serializers.CharField(max_length=20, required=False)
     password = serializers.CharField(write_only=True, required=True)
     email = serializers.EmailField(required=False, allow_null=True, allow_blank=True)
@@ -18,30 +23,50 @@ class StudentRegistrationSerializer(serializers.Serializer):
     current_company = serializers.CharField(max_length=200, required=False, allow_null=True, allow_blank=True)
     is_cr = serializers.BooleanField(default=False)
 
-    def validate_username(self, value):
-        """Check if username (uni_id) already exists"""
-        if User.objects.filter(username=value).exists():
-            raise serializers.ValidationError("A user with this university ID already exists.")
-        if StudentProfile.objects.filter(uni_id=value).exists():
-            raise serializers.ValidationError("A student profile with this university ID already exists.")
-        return value
-
-    def validate_email(self, value):
-        """Check if email already exists (if provided)"""
-        if value:
-            if User.objects.filter(email=value).exists():
-                raise serializers.ValidationError("A user with this email already exists.")
-            if StudentProfile.objects.filter(email=value).exists():
-                raise serializers.ValidationError("A student profile with this email already exists.")
-        return value
-
     def validate_batch(self, value):
-        """Check if batch exists"""
-        if not Batch.objects.filter(title=value).exists():
+        """Check if batch exists (from the in-process map, see student.batches)"""
+        batch = batch_cache.get(value)
+        if batch is None:
             raise serializers.ValidationError(f"Batch '{value}' does not exist.")
-        return value
+        return batch
+
+    def validate(self, attrs):
+        """Check there is a university ID or email and both are free, in one query"""
+        if not attrs.get('username') and not attrs.get('email'):
+            # Either becomes the username (see create); a blank one would too
+            raise serializers.ValidationError({'username': ["A university ID or email is required."]})
+        errors = self.conflicts(attrs.get('username'), attrs.get('email'))
+        if errors:
+            raise serializers.ValidationError(errors)
+        return attrs
+
+    def conflicts(self, uni_id, email):
+        """
+        Field errors for a university ID / email already taken by a User or
+        StudentProfile, from a single UNION query. Without a uni_id the email
+        doubles as username and uni_id (see create), so it's checked as both.
+        """
+        identifier = uni_id or email
+        if not identifier:
+            return {}
+        users = User.objects.filter(
+            Q(username=identifier) | Q(email=email) if email else Q(username=identifier)
+        ).annotate(source=Value('user')).values_list('source', 'username', 'email')
+        profiles = StudentProfile.objects.filter(
+            Q(uni_id=identifier) | Q(email=email) if email else Q(uni_id=identifier)
+        ).annotate(source=Value('student profile')).values_list('source', 'uni_id', 'email')
+        rows = users.union(profiles, all=True)
+
+        id_field, id_label = ('username', 'university ID') if uni_id else ('email', 'email')
+        errors = {}
+        # Users are reported before profiles, like the old per-field checks
+        for source, taken_id, taken_email in sorted(rows, key=lambda row: row[0] != 'user'):
+            if taken_id == identifier:
+                errors.setdefault(id_field, [f"A {source} with this {id_label} already exists."])
+            if email and taken_email == email:
+                errors.setdefault('email', [f"A {source} with this email already exists."])
+        return errors
 
-    @transaction.atomic
     def create(self, validated_data):
         """Create User and StudentProfile"""
         
@@ -54,7 +79,7 @@ class StudentRegistrationSerializer(serializers.Serializer):
         last_name = validated_data['last_name']
         bio = validated_data.get('bio')
         profile_pic = validated_data.get('profile_pic')
-        batch_title = validated_data['batch']
+        batch = validated_data['batch']  # Batch instance (validate_batch)
         country = validated_data['country']
         current_position = validated_data.get('current_position')
         current_company = validated_data.get('current_company')
@@ -64,34 +89,49 @@ class StudentRegistrationSerializer(serializers.Serializer):
         # If uni_id is provided, use it; otherwise fallback to email
         username_for_user = uni_id if uni_id else email
 
-        # Get batch instance
-        batch = Batch.objects.get(title=batch_title)
-
-        # Create Django User
-        user = User.objects.create_user(
-            username=username_for_user,
-            email=email if email else '',
-            first_name=first_name,
-            last_name=last_name,
-            password=password  
-        )
-
-        # Create StudentProfile
-        # FIXED: Always store the actual uni_id, not email
-        student_profile = StudentProfile.objects.create(
-            first_name=first_name,
-            last_name=last_name,
-            email=email if email else '',
-            uni_id=uni_id if uni_id else email,  # Store actual uni_id
-            bio=bio,
-            profile_pic=profile_pic,
-            batch=batch,
-            country=country,
-            current_job_position=current_position,
-            current_company=current_company,
-            is_cr=is_cr,
-            is_verified=False  # Default to not verified
-        )
+        # Hashed (in the hash pool, if configured) before the transaction is
+        # opened, so no locks are held while it runs
+        password = make_password(password)
+
+        # validate() already checked uniqueness, but a concurrent signup can
+        # still take the same ID / email in between; the unique constraints
+        # catch that and it's reported like a failed validation
+        try:
+            with transaction.atomic():
+                user = User.objects.create(
+                    username=User.normalize_username(username_for_user),
+                    email=User.objects.normalize_email(email) if email else '',
+                    first_name=first_name,
+                    last_name=last_name,
+                    password=password
+                )
+
+                # Create StudentProfile
+                # FIXED: Always store the actual uni_id, not email
+                student_profile = StudentProfile.objects.create(
+                    user=user,
+                    first_name=first_name,
+                    last_name=last_name,
+                    email=email if email else '',
+                    uni_id=uni_id if uni_id else email,  # Store actual uni_id
+                    bio=bio,
+                    profile_pic=profile_pic,
+                    batch=batch,
+                    country=country,
+                    current_job_position=current_position,
+                    current_company=current_company,
+                    is_cr=is_cr,
+                    is_verified=False  # Default to not verified
+                )
+        except IntegrityError:
+            errors = self.conflicts(uni_id, email)
+            if not errors:
+                # Otherwise the batch was deleted since this process cached it
+                batch_cache.clear()
+                if batch_cache.get(batch.title) is not None:
+                    raise
+                errors = {'batch': [f"Batch '{batch.title}' does not exist."]}
+            raise serializers.ValidationError(errors)
 
         return {
             'user': user,
@@ -124,7 +164,7 @@ class StudentRegistrationSerializer(serializers.Serializer):
         }
 
 
-class StudentProfileSerializer(serializers.ModelSerializer):
+class StudentProfileSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     batch = serializers.CharField(source='batch.title')
     
     class Meta:
@@ -135,4 +175,73 @@ class StudentProfileSerializer(serializers.ModelSerializer):
             'email', 'phone', 'linkedin', 'facebook', 'instagram',
             'is_cr', 'is_verified'
         ]
-        read_only_fields = ['is_verified']
\ No newline at end of file
+        read_only_fields = ['is_verified']
+
+    def to_internal_value(self, data):
+        # A PUT echoing back the uploaded picture's URL keeps the picture
+        if self.instance is not None and getattr(self.instance, 'profile_pic_hash', None) and hasattr(data, 'get') \
+                and data.get('profile_pic') == profile_pic(self.instance.profile_pic_hash, None):
+            data = {key: value for key, value in data.items() if key != 'profile_pic'}
+        return super().to_internal_value(data)
+
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        if 'profile_pic' in data:
+            # The small uploaded variant instead of the full-size image
+            data['profile_pic'] = profile_pic(instance.profile_pic_hash, data['profile_pic'])
+        return data
+
+class StudentProfileReadSerializer:
+    """
+    Read-only fast path for StudentProfileSerializer
+
+    Builds response dicts straight from `.values()` rows (batch title joined
+    in as `batch__title`) instead of going through DRF field machinery.
+    Output is identical to StudentProfileSerializer; student/tests.py keeps
+    the two in sync.
+
+    `fields` restricts the output to a subset (sparse fieldsets, ?fields=);
+    unknown names are ignored.
+    """
+    # Output field -> queryset lookup
+    lookups = {
+        field: 'batch__title' if field == 'batch' else field
+        for field in StudentProfileSerializer.Meta.fields
+    }
+
+    def __init__(self, fields=None):
+        self.fields = [
+            field for field in self.lookups if not fields or field in fields
+        ] or list(self.lookups)
+        self.pairs = [(field, self.lookups[field]) for field in self.fields]
+
+    @classmethod
+    def from_request(cls, request):
+        """Serializer for the ?fields=a,b,c of a request"""
+        fields = request.GET.get('fields')
+        return cls([field.strip() for field in fields.split(',')] if fields else None)
+
+    def values(self, queryset, *extra):
+        """The queryset as dict rows carrying every lookup this serializer reads (and `extra`)"""
+        lookups = {lookup for _, lookup in self.pairs}
+        lookups.update(extra)
+        # Pagination keys on id, so always fetch it
+        lookups.add('id')
+        if 'profile_pic' in lookups:
+            lookups.add('profile_pic_hash')
+        return queryset.values(*lookups)
+
+    def serialize(self, rows):
+        """Serialize `.values()` rows (see values()) or a queryset of profiles"""
+        if hasattr(rows, 'values') and hasattr(rows, 'model'):
+            # Run the query here so it isn't counted as serialization time
+            rows = list(self.values(rows))
+        pairs = self.pairs
+        with timed('serialize'):
+            results = [{field: row[lookup] for field, lookup in pairs} for row in rows]
+            if 'profile_pic' in self.fields:
+                # Uploaded pictures: the small variant (see StudentProfileSerializer)
+                for result, row in zip(results, rows):
+                    if row['profile_pic_hash']:
+                        result['profile_pic'] = profile_pic(row['profile_pic_hash'], None)
+            return results
@@ -0,0 +1,160 @@
+from django.conf import settings
+from django.db.models import F, Q
+from django.db.models.signals import post_init, pre_save, post_save, pre_delete, post_delete
+from django.dispatch import receiver
+
+from config.tasks import enqueue
+
+from . import dimensions, facets, search, sync, tasks  # tasks: registers the handlers
+from .batches import batch_cache
+from .models import Batch, Company, CompanyAlias, Country, CountryAlias, StudentProfile, Tombstone
+from .search_index import profile_index, INDEX_FIELDS
+
+
+# StudentProfile fields that feed the full-text document
+SEARCHABLE_FIELDS = {field.split('__')[0] for _, field, _ in search.INDEX_COLUMNS}
+
+
+def create_search_index(sender, using='default', **kwargs):
+    """post_migrate hook: make sure the search index table exists and is current"""
+    if search.create_index(using):
+        # New, or replaced an outdated one: fill it from the existing rows
+        search.rebuild_index(using=using)
+
+
+def backfill_dimensions(sender, using='default', **kwargs):
+    """
+    post_migrate hook: link profiles saved before country_ref / company_ref
+    existed to their canonical rows, else the country / company filters
+    miss them
+    """
+    profiles = StudentProfile.objects.using(using)
+    unlinked = profiles.filter(
+        Q(country_ref__isnull=True) & ~Q(country__isnull=True) & ~Q(country='')
+        | Q(company_ref__isnull=True) & ~Q(current_company__isnull=True) & ~Q(current_company='')
+    )
+    if unlinked.exists():
+        dimensions.normalize_profiles(using=using)
+        facets.rebuild_facets(using=using)
+
+
+@receiver(post_save, sender=StudentProfile)
+def index_profile(sender, instance, raw=False, using='default', update_fields=None, **kwargs):
+    if raw:
+        return
+    # e.g. save(update_fields=['is_verified']) touches nothing searchable
+    if update_fields is not None and not update_fields & SEARCHABLE_FIELDS:
+        return
+    # Deferred (config.tasks); several saves before it runs index once
+    enqueue('student.index_profiles', dedupe_key=f'index-profile:{instance.pk}', profile_ids=[instance.pk])
+
+    # Only maintain the in-memory index once it has been built
+    if settings.STUDENT_SEARCH_INMEMORY and profile_index.ready:
+        profile_index.add(instance.pk, [getattr(instance, field) for field in INDEX_FIELDS])
+
+
+@receiver(post_delete, sender=StudentProfile)
+def unindex_profile(sender, instance, using='default', **kwargs):
+    search.remove_profiles([instance.pk], using=using)
+
+    if settings.STUDENT_SEARCH_INMEMORY and profile_index.ready:
+        profile_index.remove(instance.pk)
+
+
+@receiver(post_save, sender=Batch)
+def reindex_batch(sender, instance, created=False, raw=False, using='default', **kwargs):
+    # Batch title/session are part of every student's document
+    if raw or created:
+        return
+    enqueue('student.index_batch', dedupe_key=f'index-batch:{instance.pk}', batch_id=instance.pk)
+    # The batch title is part of each profile's representation (ETag and sync feed)
+    instance.students.update(revision=F('revision') + 1, updated_at=instance.updated_at)
+
+
+@receiver(pre_save, sender=StudentProfile)
+def resolve_dimensions(sender, instance, raw=False, using='default', update_fields=None, **kwargs):
+    # Canonical country / company for the free-text fields (student.dimensions)
+    if raw:
+        return
+    for field, (attname, index) in dimensions.DIMENSIONS.items():
+        if field in instance.__dict__ and (update_fields is None or field in update_fields):
+            setattr(instance, attname, index.resolve(instance.__dict__[field], using=using))
+
+
+# Registration's in-memory title map (student.batches)
+post_save.connect(batch_cache.clear, sender=Batch, dispatch_uid='batch_cache_save')
+post_delete.connect(batch_cache.clear, sender=Batch, dispatch_uid='batch_cache_delete')
+
+# In-memory alias maps (student.dimensions)
+for _model, _index in ((Country, dimensions.countries), (CountryAlias, dimensions.countries),
+                       (Company, dimensions.companies), (CompanyAlias, dimensions.companies)):
+    post_save.connect(_index.clear_on_commit, sender=_model, dispatch_uid=f'dimensions_{_model.__name__}_save')
+    post_delete.connect(_index.clear_on_commit, sender=_model, dispatch_uid=f'dimensions_{_model.__name__}_delete')
+
+
+# ---------------------------------------------------------------------------
+# Facet counts (student.facets)
+# ---------------------------------------------------------------------------
+
+def _facet_values(instance):
+    """The facet fields currently loaded on a profile"""
+    return {field: instance.__dict__[field] for field in facets.FACET_FIELDS.values() if field in instance.__dict__}
+
+
+@receiver(post_init, sender=StudentProfile)
+def snapshot_facets(sender, instance, **kwargs):
+    # Remember the facet values as loaded. Deferred fields (.only/.defer)
+    # are missing and get looked up by pre_save / pre_delete instead
+    instance._facet_values = _facet_values(instance)
+
+
+def _complete_facet_snapshot(instance, using):
+    if len(instance._facet_values) < len(facets.FACET_FIELDS):
+        instance._facet_values = StudentProfile.objects.using(using).filter(pk=instance.pk).values(
+            *facets.FACET_FIELDS.values()
+        ).first() or {}
+
+
+@receiver(pre_save, sender=StudentProfile)
+def load_facets_before_save(sender, instance, raw=False, using='default', **kwargs):
+    if not raw and not instance._state.adding:
+        _complete_facet_snapshot(instance, using)
+
+
+@receiver(post_save, sender=StudentProfile)
+def count_facets(sender, instance, created=False, raw=False, using='default', **kwargs):
+    if raw:
+        return
+    old_values = instance._facet_values
+    new_values = {**old_values, **_facet_values(instance)}
+    old_pairs = [] if created or not old_values else facets.facet_pairs(old_values)
+    new_pairs = facets.facet_pairs(new_values)
+    if old_pairs != new_pairs:
+        # Deferred (config.tasks); counts catch up once it has run
+        enqueue('student.apply_facet_changes', old_pairs=old_pairs, new_pairs=new_pairs)
+    instance._facet_values = new_values
+
+
+@receiver(pre_delete, sender=StudentProfile)
+def load_facets_before_delete(sender, instance, using='default', **kwargs):
+    _complete_facet_snapshot(instance, using)
+
+
+@receiver(post_delete, sender=StudentProfile)
+def uncount_facets(sender, instance, using='default', **kwargs):
+    if instance._facet_values:
+        facets.apply_changes(facets.facet_pairs(instance._facet_values), [], using=using)
+
+
+# ---------------------------------------------------------------------------
+# Deletions for the sync feed (student.sync)
+# ---------------------------------------------------------------------------
+
+@receiver(post_delete, sender=StudentProfile)
+def record_profile_deletion(sender, instance, using='default', **kwargs):
+    sync.record_deletion(Tombstone.PROFILE, instance.pk, using=using)
+
+
+@receiver(post_delete, sender=Batch)
+def record_batch_deletion(sender, instance, using='default', **kwargs):
+    sync.record_deletion(Tombstone.BATCH, instance.pk, using=using)
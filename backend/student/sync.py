@@ -0,0 +1,162 @@
+"""
+Incremental directory sync (GET /api/v1/sync)
+
+Clients keeping an offline copy of the directory send back the cursor of
+their last sync and get only what changed since, in pages:
+
+- profiles and batches saved since then (StudentProfile / Batch
+  `updated_at`, set by every save, update and batch rename)
+- ids of profiles and batches deleted since then (Tombstone rows written by
+  the post_delete signals)
+
+Each of the three streams is read in (timestamp, id) order from its own
+index, so a sync costs three range scans no matter how large the directory
+is. The cursor is an opaque token holding the position in each stream; no
+cursor starts a full download.
+
+Timestamps are taken before the writing transaction commits, so a row can
+become visible after rows with later timestamps. Once a stream is caught
+up its cursor is set to `now - SYNC_SETTLE`: rows changed within the last
+SYNC_SETTLE seconds are sent again on the next sync. Clients should apply
+rows as upserts, then the deletions, ignoring ids they don't have.
+
+Tombstones are kept for SYNC_TOMBSTONE_DAYS; an older cursor could miss
+deletions and is refused (CursorExpired), the client downloads again.
+"""
+import base64
+import json
+import threading
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Batch, StudentProfile, Tombstone
+
+
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+# Cursor key -> stream ordering field
+STREAMS = {'p': 'updated_at', 'b': 'updated_at', 'd': 'deleted_at'}
+
+BATCH_FIELDS = ['id', 'title', 'session']
+
+_pruned = 0.0
+_prune_lock = threading.Lock()
+
+
+class InvalidCursor(ValueError):
+    """The cursor wasn't issued by this endpoint"""
+
+
+class CursorExpired(Exception):
+    """The cursor is older than the tombstones kept"""
+
+
+def _micros(moment):
+    return (moment - EPOCH) // timedelta(microseconds=1)
+
+
+def _moment(micros):
+    return EPOCH + timedelta(microseconds=micros)
+
+
+def encode_cursor(positions):
+    """{'p': (datetime, id), ...} -> opaque token"""
+    raw = json.dumps({key: [_micros(moment), pk] for key, (moment, pk) in positions.items()}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """Opaque token -> {'p': (datetime, id), ...}; raises InvalidCursor"""
+    try:
+        raw = json.loads(base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)))
+        return {key: (_moment(int(raw[key][0])), int(raw[key][1])) for key in STREAMS}
+    except (ValueError, TypeError, KeyError, IndexError, OverflowError):
+        raise InvalidCursor('Invalid cursor')
+
+
+def _after(queryset, field, position):
+    """Rows past `position` in (field, id) order"""
+    moment, pk = position
+    queryset = queryset.filter(Q(**{f'{field}__gt': moment}) | Q(**{field: moment, 'id__gt': pk}))
+    return queryset.order_by(field, 'id')
+
+
+def _page(rows, page_size, field, position, horizon):
+    """(rows of this page, next position, more to come)"""
+    more = len(rows) > page_size
+    rows = rows[:page_size]
+    if more:
+        position = (rows[-1][field], rows[-1]['id'])
+    else:
+        # Caught up: continue from the settled horizon (see the module
+        # docstring). Also moves idle streams along, so their cursors
+        # don't expire
+        position = (horizon, 0)
+    return rows, position, more
+
+
+def changes(serializer, cursor=None, page_size=None):
+    """
+    One page of changes since `cursor` (None for a full download), serialized
+    with `serializer` (a StudentProfileReadSerializer). Returns the response
+    dict; raises InvalidCursor / CursorExpired.
+    """
+    page_size = page_size or settings.SYNC_PAGE_SIZE
+    now = timezone.now()
+    horizon = now - timedelta(seconds=settings.SYNC_SETTLE)
+
+    if cursor:
+        positions = decode_cursor(cursor)
+        if positions['d'][0] < now - timedelta(days=settings.SYNC_TOMBSTONE_DAYS):
+            raise CursorExpired('Cursor expired, sync again without a cursor')
+    else:
+        # A full download has nothing to delete yet: deletions committed
+        # before the horizon aren't in the profile / batch streams either
+        positions = {'p': (EPOCH, 0), 'b': (EPOCH, 0), 'd': (horizon, 0)}
+
+    profiles = list(serializer.values(
+        _after(StudentProfile.objects.all(), 'updated_at', positions['p']), 'updated_at'
+    )[:page_size + 1])
+    profiles, positions['p'], more_profiles = _page(profiles, page_size, 'updated_at', positions['p'], horizon)
+
+    batches = list(
+        _after(Batch.objects.all(), 'updated_at', positions['b']).values(*BATCH_FIELDS, 'updated_at')[:page_size + 1]
+    )
+    batches, positions['b'], more_batches = _page(batches, page_size, 'updated_at', positions['b'], horizon)
+
+    deleted = list(
+        _after(Tombstone.objects.all(), 'deleted_at', positions['d']).values(
+            'id', 'kind', 'object_id', 'deleted_at'
+        )[:page_size + 1]
+    )
+    deleted, positions['d'], more_deleted = _page(deleted, page_size, 'deleted_at', positions['d'], horizon)
+
+    return {
+        'profiles': serializer.serialize(profiles),
+        'batches': [{field: row[field] for field in BATCH_FIELDS} for row in batches],
+        'deleted': {
+            'profiles': [row['object_id'] for row in deleted if row['kind'] == Tombstone.PROFILE],
+            'batches': [row['object_id'] for row in deleted if row['kind'] == Tombstone.BATCH],
+        },
+        'cursor': encode_cursor(positions),
+        'has_more': more_profiles or more_batches or more_deleted,
+    }
+
+
+def record_deletion(kind, object_id, using='default'):
+    """Write a tombstone (post_delete); prunes expired ones at most hourly"""
+    global _pruned
+    Tombstone.objects.using(using).create(kind=kind, object_id=object_id)
+
+    if time.monotonic() - _pruned > 3600 and _prune_lock.acquire(blocking=False):
+        try:
+            _pruned = time.monotonic()
+            Tombstone.objects.using(using).filter(
+                deleted_at__lt=timezone.now() - timedelta(days=settings.SYNC_TOMBSTONE_DAYS)
+            ).delete()
+        finally:
+            _prune_lock.release()
@@ -0,0 +1,99 @@
+"""
+Synthetic alumni directories for benchmarks
+
+Generates realistic-looking StudentProfile rows spread across the
+setup_data batches and inserts them with bulk_create, so directories of
+100k+ profiles can be seeded in seconds.
+"""
+import random
+from contextlib import contextmanager
+
+from django.db import connections
+
+from .models import Batch, StudentProfile
+from .management.commands.setup_data import BATCHES
+
+
+FIRST_NAMES = [
+    'Abdullah', 'Rahim', 'Karim', 'Nusrat', 'Farhana', 'Tanvir', 'Sadia', 'Mehedi',
+    'Ayesha', 'Rafi', 'Tasnim', 'Imran', 'Sumaiya', 'Arif', 'Nabila', 'Shakil',
+    'Jannat', 'Fahim', 'Mahmud', 'Riya', 'Sabbir', 'Lamia', 'Towhid', 'Anika',
+]
+LAST_NAMES = [
+    'Sami', 'Hossain', 'Rahman', 'Ahmed', 'Islam', 'Chowdhury', 'Khan', 'Akter',
+    'Uddin', 'Haque', 'Karim', 'Sultana', 'Alam', 'Sarker', 'Biswas', 'Mia',
+]
+COUNTRIES = ['Bangladesh', 'Bangladesh', 'Bangladesh', 'Canada', 'USA', 'UK', 'Germany', 'Australia']
+COMPANIES = [
+    'Google', 'Grameenphone', 'BRAC Bank', 'Unilever', 'Robi Axiata', 'bKash',
+    'Pathao', 'Standard Chartered', 'Microsoft', 'Summit Group', None,
+]
+POSITIONS = [
+    'Software Engineer', 'Brand Manager', 'Analyst', 'Relationship Manager',
+    'Product Manager', 'Consultant', 'Lecturer', None,
+]
+
+
+def ensure_batches(using='default'):
+    """Create the setup_data batches if missing and return them"""
+    batches = []
+    for batch_data in BATCHES:
+        batch, _ = Batch.objects.using(using).get_or_create(**batch_data)
+        batches.append(batch)
+    return batches
+
+
+def synthetic_rows(count, start=0, seed=0):
+    """Yield `count` dicts of StudentProfile field values with unique uni_id/email"""
+    rng = random.Random(seed + start)
+    for number in range(start, start + count):
+        first_name = rng.choice(FIRST_NAMES)
+        last_name = rng.choice(LAST_NAMES)
+        yield {
+            'first_name': first_name,
+            'last_name': last_name,
+            'uni_id': f'{2009 + number % 16}{number:08d}',
+            'email': f'{first_name.lower()}.{last_name.lower()}{number}@example.com',
+            'phone': f'01{rng.randint(300000000, 999999999)}',
+            'country': rng.choice(COUNTRIES),
+            'current_company': rng.choice(COMPANIES),
+            'current_job_position': rng.choice(POSITIONS),
+            'bio': f'{first_name} works in {rng.choice(COUNTRIES)}.',
+            'is_cr': number % 40 == 0,
+            'is_verified': number % 3 != 0,
+        }
+
+
+def seed_directory(count, batch_size=5000, seed=0, using='default'):
+    """
+    Top the directory up to `count` synthetic profiles with bulk_create.
+    Signals don't fire, so callers rebuild any derived index afterwards.
+    Returns the number of rows inserted.
+    """
+    batches = ensure_batches(using)
+    existing = StudentProfile.objects.using(using).count()
+    missing = count - existing
+    if missing <= 0:
+        return 0
+
+    chunk = []
+    for number, row in enumerate(synthetic_rows(missing, start=existing, seed=seed)):
+        chunk.append(StudentProfile(batch=batches[number % len(batches)], **row))
+        if len(chunk) >= batch_size:
+            StudentProfile.objects.using(using).bulk_create(chunk)
+            chunk = []
+    if chunk:
+        StudentProfile.objects.using(using).bulk_create(chunk)
+    return missing
+
+
+@contextmanager
+def scratch_database(using='default'):
+    """Run the block against a throwaway test database so benchmarks never touch real data"""
+    connection = connections[using]
+    old_name = connection.settings_dict['NAME']
+    connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
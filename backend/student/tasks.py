@@ -0,0 +1,34 @@
+"""
+Deferred directory maintenance (config.tasks handlers)
+
+Queued by the StudentProfile / Batch signals in student.signals instead of
+running inside the request that saved the profile. The request's own cache
+bump happens before these run, so each handler invalidates the cached
+search / stats responses again once its writes are committed.
+"""
+from django.db import transaction
+
+from apiv1.cache import bump_generation
+from config.tasks import handler
+
+from . import facets, search
+from .models import StudentProfile
+
+
+@handler('student.index_profiles')
+def index_profiles(profile_ids):
+    search.index_profiles(profile_ids)
+    transaction.on_commit(bump_generation)
+
+
+@handler('student.index_batch')
+def index_batch(batch_id):
+    # Batch title/session are part of every student's document
+    search.index_profiles(list(StudentProfile.objects.filter(batch_id=batch_id).values_list('id', flat=True)))
+    transaction.on_commit(bump_generation)
+
+
+@handler('student.apply_facet_changes')
+def apply_facet_changes(old_pairs, new_pairs):
+    facets.apply_changes([tuple(pair) for pair in old_pairs], [tuple(pair) for pair in new_pairs])
+    transaction.on_commit(bump_generation)
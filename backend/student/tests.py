@@ -1,3 +1,390 @@
-from django.test import TestCase
+import csv
+import io
+import os
+import shutil
+import tempfile
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import CharField
+from django.test import AsyncClient, TestCase, override_settings
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from config import tasks
+
+from . import dimensions, facets, search, signals
+from .filters import filter_profiles
+from .models import Batch, Company, Country, DirectoryFacet, StudentProfile, Tombstone
+from .search_index import get_profile_index, profile_index
+from .serializers import StudentProfileSerializer, StudentProfileReadSerializer
+
+
+@override_settings(DIRECTORY_CACHE_ENABLED=False)
+class ReadSerializerParityTests(TestCase):
+    """StudentProfileReadSerializer must render byte-for-byte like StudentProfileSerializer"""
+
+    @classmethod
+    def setUpTestData(cls):
+        dimensions.clear()
+        batch = Batch.objects.create(title='BBA 1', session='2009-10')
+        StudentProfile.objects.create(
+            first_name='John', last_name='Doe', uni_id='24230115084', email='john@example.com',
+            batch=batch, bio='Héllo "world"', phone='01700000000', linkedin='https://linkedin.com/in/john',
+            current_company='Acme', current_job_position='Analyst', is_cr=True, is_verified=True
+        )
+        # Nullable fields left empty
+        StudentProfile.objects.create(
+            first_name='Jane', last_name='Roe', uni_id='24230115085', email='jane@example.com',
+            batch=batch, country=None
+        )
+
+    def render(self, data):
+        return JSONRenderer().render(data)
+
+    def test_output_matches_drf_serializer(self):
+        profiles = StudentProfile.objects.select_related('batch').order_by('id')
+        self.assertEqual(
+            self.render(StudentProfileReadSerializer().serialize(profiles)),
+            self.render(StudentProfileSerializer(profiles, many=True).data)
+        )
+
+    def test_sparse_fields(self):
+        rows = StudentProfileReadSerializer(['first_name', 'batch', 'nope']).serialize(
+            StudentProfile.objects.order_by('id')
+        )
+        self.assertEqual(rows[0], {'first_name': 'John', 'batch': 'BBA 1'})
+
+    def test_list_endpoints_match_drf_serializer(self):
+        client = APIClient()
+        expected = self.render(StudentProfileSerializer(
+            StudentProfile.objects.select_related('batch').order_by('-id'), many=True
+        ).data)
+
+        response = client.get('/api/v1/profile/')
+        self.assertEqual(self.render(response.data['results']), expected)
+
+        response = client.get('/api/v1/profile/', {'page_size': 10})
+        self.assertEqual(self.render(response.data['results']), expected)
+
+        response = client.get('/api/v1/profile/', {'fields': 'uni_id,id'})
+        self.assertEqual(
+            [list(row.items()) for row in response.data['results']],
+            [[('id', profile.id), ('uni_id', profile.uni_id)]
+             for profile in StudentProfile.objects.order_by('-id')]
+        )
+
+
+@override_settings(DIRECTORY_CACHE_ENABLED=False, TASKS_MODE='sync')
+class DimensionTests(TestCase):
+    """Spellings of a country / company resolve to one canonical row (student.dimensions)"""
+
+    def setUp(self):
+        dimensions.clear()
+        self.client = APIClient()
+        self.batch = Batch.objects.create(title='BBA 1', session='2009-10')
+        # Committed, as far as the alias maps go
+        with self.captureOnCommitCallbacks(execute=True):
+            for n, (country, company) in enumerate([
+                ('USA', 'Google'), ('United States of America', 'google inc'), ('the United States', 'Google LLC.'),
+                ('Bangladesh', 'Grameenphone Ltd'), ('bangladesh', None),
+            ]):
+                StudentProfile.objects.create(
+                    first_name=f'First{n}', last_name='Doe', uni_id=f'U{n}', email=f'u{n}@example.com',
+                    batch=self.batch, country=country, current_company=company
+                )
+
+    def test_spellings_share_a_canonical_row(self):
+        self.assertEqual(Company.objects.count(), 2)
+        self.assertEqual(Country.objects.count(), 2)
+        self.assertEqual(dimensions.company_key('AT&T Inc.'), 'at and t')
+
+    def test_filters_use_foreign_keys(self):
+        response = self.client.get('/api/v1/profile/', {'country': 'US'})
+        self.assertEqual(len(response.data['results']), 3)
+        response = self.client.get('/api/v1/profile/', {'company': 'goog'})
+        self.assertEqual(len(response.data['results']), 3)
+        response = self.client.get('/api/v1/profile/', {'country': 'Atlantis'})
+        self.assertEqual(response.data['results'], [])
+
+    def test_batch_filter_uses_the_title_index(self):
+        response = self.client.get('/api/v1/profile/', {'batch': 'bba 1'})
+        self.assertEqual(len(response.data['results']), 5)
+        profiles, _ = filter_profiles(StudentProfile.objects.all(), {'batch': 'bba 1'})
+        self.assertIn('batch_title_lower_idx', profiles.explain())
+        # No project-wide `__lower` lookup needed for it
+        self.assertNotIn('lower', CharField.get_lookups())
+
+    async def test_async_filters_on_cold_alias_maps(self):
+        client = AsyncClient()
+        for params in ({'country': 'US'}, {'company': 'goog'}):
+            # Cold, as in a new worker or after DIMENSION_CACHE_TTL
+            dimensions.clear()
+            with self.subTest(**params):
+                response = await client.get('/api/v1/async/profile/', params)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(len(response.json()['results']), 3)
+
+    def test_facets_add_up_spellings(self):
+        counts = self.client.get('/api/v1/stats').data
+        self.assertEqual(counts['company'][0], {'company': 'Google', 'count': 3})
+        self.assertEqual(counts['country'], [
+            {'country': 'United States', 'count': 3}, {'country': 'Bangladesh', 'count': 2},
+        ])
+
+    def test_migrate_links_existing_profiles(self):
+        # Rows saved before country_ref / company_ref existed
+        StudentProfile.objects.update(country_ref=None, company_ref=None)
+        self.assertEqual(self.client.get('/api/v1/profile/', {'country': 'US'}).data['results'], [])
+
+        signals.backfill_dimensions(sender=None)
+        response = self.client.get('/api/v1/profile/', {'country': 'US'})
+        self.assertEqual(len(response.data['results']), 3)
+        self.assertEqual(StudentProfile.objects.filter(company_ref__name='Google').count(), 3)
+
+    def test_refs_saved_with_deferred_fields(self):
+        profile = StudentProfile.objects.only('id', 'current_company').get(uni_id='U3')
+        profile.current_company = 'Google'
+        profile.save()
+        profile = StudentProfile.objects.get(uni_id='U3')
+        self.assertEqual(profile.company_ref.name, 'Google')
+        self.assertEqual(profile.country_ref.name, 'Bangladesh')
+
+    def test_normalize_after_bulk_create(self):
+        StudentProfile.objects.bulk_create([StudentProfile(
+            first_name='Bulk', last_name='Doe', uni_id='U9', email='u9@example.com',
+            batch=self.batch, country='U.S.A.', current_company='GOOGLE'
+        )])
+        self.assertEqual(dimensions.normalize_profiles(), {'country': 1, 'current_company': 1})
+        profile = StudentProfile.objects.get(uni_id='U9')
+        self.assertEqual(profile.company_ref.name, 'Google')
+        self.assertEqual(profile.country_ref.name, 'United States')
+        # Nothing left to do on a rerun
+        self.assertEqual(dimensions.normalize_profiles(), {'country': 0, 'current_company': 0})
+
+
+
+@override_settings(DIRECTORY_CACHE_ENABLED=False, THROTTLE_ENABLED=False, TASKS_MODE='worker')
+class FacetMaintenanceTests(TestCase):
+    """Counts kept up by the StudentProfile signals match a rebuild_facets() from scratch"""
+
+    def setUp(self):
+        dimensions.clear()
+        self.bba1 = Batch.objects.create(title='BBA 1', session='2009-10')
+        self.bba2 = Batch.objects.create(title='BBA 2', session='2010-11')
+        for n, (country, company, is_cr) in enumerate([
+            ('USA', 'Google', True), ('Bangladesh', 'google inc', False),
+            ('Bangladesh', None, False), (None, 'Grameenphone Ltd', True),
+        ]):
+            StudentProfile.objects.create(
+                first_name=f'First{n}', last_name='Doe', uni_id=f'U{n}', email=f'u{n}@example.com',
+                batch=self.bba1, country=country, current_company=company, is_cr=is_cr
+            )
+        self.assertCounted()
+
+    def counts(self):
+        return set(DirectoryFacet.objects.filter(count__gt=0).values_list('dimension', 'value', 'count'))
+
+    def assertCounted(self):
+        tasks.run_pending()
+        maintained = self.counts()
+        facets.rebuild_facets()
+        self.assertEqual(maintained, self.counts())
+
+    def test_saves_and_deletes(self):
+        profile = StudentProfile.objects.get(uni_id='U0')
+        profile.batch = self.bba2
+        profile.country = 'Bangladesh'
+        profile.current_company = 'Grameenphone'
+        profile.is_cr = False
+        profile.save()
+        self.assertCounted()
+
+        # Loaded with deferred facet fields
+        profile = StudentProfile.objects.only('id', 'first_name').get(uni_id='U1')
+        profile.first_name = 'Renamed'
+        profile.save()
+        profile.current_company = None
+        profile.save()
+        self.assertCounted()
+
+        StudentProfile.objects.get(uni_id='U2').delete()
+        StudentProfile.objects.only('id').get(uni_id='U3').delete()
+        self.assertCounted()
+
+    def test_conditional_updates(self):
+        client = APIClient()
+        client.force_authenticate(User.objects.create_user('admin', 'admin@example.com', 'secret-pass'))
+        for uni_id, data in [
+            ('U0', {'batch': 'BBA 2'}),
+            ('U1', {'country': 'United States', 'current_company': 'Google LLC'}),
+            ('U2', {'country': 'Canada', 'is_cr': True}),
+            ('U3', {'current_company': ''}),
+        ]:
+            profile = StudentProfile.objects.get(uni_id=uni_id)
+            response = client.patch(f'/api/v1/profile/{profile.id}/', data, format='json', HTTP_IF_MATCH='*')
+            self.assertEqual(response.status_code, 200)
+        self.assertCounted()
+
+@override_settings(TASKS_MODE='sync')
+class SearchBackendParityTests(TestCase):
+    """The trigram index finds what the icontains scan finds, ranked the same"""
+
+    QUERIES = ['0115', '2345', 'ohn', 'mud', 'JOHN', 'john doe', 'jo', '@example', 'BBA', 'acme', '50%', 'nobody']
+
+    @classmethod
+    def setUpTestData(cls):
+        dimensions.clear()
+        batch = Batch.objects.create(title='BBA 1', session='2009-10')
+        for first, last, uni_id, phone, company in [
+            ('John', 'Doe', '24230115084', '01712345678', 'Acme Ltd'),
+            ('Johnny', 'Mudassir', '24230115085', None, None),
+            ('Ahmud', 'Khan', '19230299001', '01812345000', '50% Solutions'),
+            ('Sara', 'Ohno', '19230299002', None, 'Acme'),
+        ]:
+            StudentProfile.objects.create(
+                first_name=first, last_name=last, uni_id=uni_id, email=f'{uni_id}@example.com',
+                batch=batch, phone=phone, current_company=company
+            )
+
+    def results(self, query, backend):
+        with self.settings(STUDENT_SEARCH_BACKEND=backend):
+            return [(profile.id, profile.relevance) for profile in search.search_profiles(query)]
+
+    def test_index_matches_scan(self):
+        self.assertIsNotNone(search.candidate_ids('ohn', 10))
+        for query in self.QUERIES:
+            with self.subTest(query=query):
+                self.assertEqual(self.results(query, 'fulltext'), self.results(query, 'orm'))
+        self.assertEqual(len(self.results('0115', 'fulltext')), 2)
+        self.assertEqual(len(self.results('mud', 'fulltext')), 2)
+
+    @override_settings(STUDENT_SEARCH_CANDIDATES=2)
+    def test_broad_terms_rank_every_match(self):
+        # More rows contain 'example' than the index hands over, and the exact
+        # email match isn't necessarily among its top hits
+        StudentProfile.objects.create(
+            first_name='Example', last_name='Person', uni_id='19230299003', email='example@example.com',
+            batch=Batch.objects.get(), bio='example example example'
+        )
+        for query in ['example', 'example@example.com', '2423', 'acme']:
+            with self.subTest(query=query):
+                self.assertEqual(self.results(query, 'fulltext'), self.results(query, 'orm'))
+        self.assertEqual(len(self.results('example', 'fulltext')), 5)
+
+    def test_outdated_index_is_replaced(self):
+        from django.db import connection
+
+        with connection.cursor() as cursor:
+            cursor.execute(f'DROP TABLE {search.INDEX_TABLE}')
+            cursor.execute(f'CREATE VIRTUAL TABLE {search.INDEX_TABLE} USING fts5(first_name)')
+        self.assertTrue(search.create_index())
+        self.assertFalse(search.create_index())
+        self.assertEqual(search.rebuild_index(), 4)
+        self.assertEqual(self.results('ohn', 'fulltext'), self.results('ohn', 'orm'))
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class ImportAlumniTests(TestCase):
+    """manage.py import_alumni"""
+
+    def setUp(self):
+        dimensions.clear()
+        Batch.objects.create(title='BBA 1', session='2009-10')
+
+    def run_import(self, rows):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, 'alumni.csv')
+        with open(path, 'w', newline='') as handle:
+            writer = csv.writer(handle)
+            writer.writerow(['uni_id', 'email', 'password', 'first_name', 'last_name', 'batch'])
+            writer.writerows(rows)
+        rejects = os.path.join(directory, 'rejects.csv')
+        call_command('import_alumni', path, '--hash-workers', '1', '--rejects', rejects, stdout=io.StringIO())
+        if not os.path.exists(rejects):
+            return []
+        with open(rejects, newline='') as handle:
+            return [(row['line'], row['reason']) for row in csv.DictReader(handle)]
+
+    def test_rows_need_an_email(self):
+        rejects = self.run_import([
+            ['U1', 'u1@example.com', 'pass-1', 'Ann', 'One', 'BBA 1'],
+            ['U2', '', 'pass-2', 'Bob', 'Two', 'BBA 1'],
+            ['U3', 'u3@example.com', 'pass-3', 'Cat', 'Three', 'bba 1'],
+            ['U4', '', 'pass-4', 'Dan', 'Four', 'BBA 1'],
+        ])
+        # Rejected up front, not by the unique email constraint
+        self.assertEqual(rejects, [('3', 'missing email'), ('5', 'missing email')])
+        self.assertEqual(
+            list(StudentProfile.objects.order_by('uni_id').values_list('uni_id', 'email')),
+            [('U1', 'u1@example.com'), ('U3', 'u3@example.com')]
+        )
+        self.assertTrue(User.objects.get(username='U3').check_password('pass-3'))
+
+
+@override_settings(STUDENT_SEARCH_INMEMORY=True, STUDENT_SEARCH_INMEMORY_SYNC=0, TASKS_MODE='sync')
+class InMemoryIndexSyncTests(TestCase):
+    """student.search_index picks up changes made without this process's signals"""
+
+    def setUp(self):
+        dimensions.clear()
+        profile_index.ready = False
+        self.addCleanup(setattr, profile_index, 'ready', False)
+        self.batch = Batch.objects.create(title='BBA 1', session='2009-10')
+        self.john = StudentProfile.objects.create(
+            first_name='John', last_name='Doe', uni_id='U1', email='u1@example.com', batch=self.batch
+        )
+        get_profile_index()
+
+    def test_changes_from_elsewhere_are_synced(self):
+        # Another process: bulk_create and .update() send no signals here
+        [jane] = StudentProfile.objects.bulk_create([StudentProfile(
+            first_name='Jane', last_name='Roe', uni_id='U2', email='u2@example.com', batch=self.batch
+        )])
+        StudentProfile.objects.filter(pk=self.john.pk).update(first_name='Jonathan', updated_at=timezone.now())
+        self.assertEqual(get_profile_index().search('jane'), [jane.pk])
+        self.assertEqual(get_profile_index().search('jonathan'), [self.john.pk])
+        self.assertEqual(get_profile_index().search('john'), [])
+
+        with connection.cursor() as cursor:
+            cursor.execute('DELETE FROM student_studentprofile WHERE id = %s', [jane.pk])
+        Tombstone.objects.create(kind=Tombstone.PROFILE, object_id=jane.pk)
+        self.assertEqual(get_profile_index().search('jane'), [])
+
+    def test_results_match_the_database_search(self):
+        for first, last, uni_id, email, company, country in [
+            ('Ann', 'Google', 'U2', 'ann@google.com', None, 'Bangladesh'),
+            ('Bob', 'Smith', 'U3', 'bob@google.com', None, 'Bangladesh'),
+            ('Cat', 'Jones', 'U4', 'cat@example.com', 'Google', 'Bangladesh'),
+            ('Dan', 'Brown', 'U5', 'dan@example.com', 'Acme', 'Canada'),
+            ('Googleina', 'Ray', 'U6', 'gr@example.com', None, 'Canada'),
+        ]:
+            StudentProfile.objects.create(
+                first_name=first, last_name=last, uni_id=uni_id, email=email,
+                batch=self.batch, current_company=company, country=country
+            )
+
+        def results(query, limit, inmemory):
+            with self.settings(STUDENT_SEARCH_INMEMORY=inmemory, STUDENT_SEARCH_BACKEND='orm'):
+                return [profile.id for profile in search.search_profiles(query, limit)]
+
+        # Company, batch and country matches rank above email contains
+        for query in ['google', 'bba', 'canada', 'bangla', 'u', 'jo', 'john']:
+            for limit in (1, 2, 50):
+                with self.subTest(query=query, limit=limit):
+                    self.assertEqual(results(query, limit, True), results(query, limit, False))
+        self.assertIn(StudentProfile.objects.get(uni_id='U4').pk, results('google', 50, True))
+        # A page the index fills on its own only loads its rows
+        with self.settings(STUDENT_SEARCH_INMEMORY_SYNC=3600), self.assertNumQueries(1):
+            self.assertEqual(len(results('google', 2, True)), 2)
+
+    @override_settings(STUDENT_SEARCH_INMEMORY_SYNC=3600)
+    def test_sync_waits_for_its_interval(self):
+        StudentProfile.objects.bulk_create([StudentProfile(
+            first_name='Jane', last_name='Roe', uni_id='U2', email='u2@example.com', batch=self.batch
+        )])
+        with self.assertNumQueries(0):
+            self.assertEqual(get_profile_index().search('jane'), [])